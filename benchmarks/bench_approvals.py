@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+list_approvals() latency over approvals logs of growing size (synthetic, seeded).
+Logs hold ~2 records per dry_run_id (pending then approved/denied), like real traffic.
+Then completes `pending` approvals one by one (require_approval) and as one complete_approvals batch.
+Examples:
+  python benchmarks/bench_approvals.py --quick
+  python benchmarks/bench_approvals.py --sizes 1000,1000000,10000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from harness import SEED, emit, latency_result, measure, throughput_result
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_SIZES = [1_000, 10_000]
+PENDING = 10_000
+QUICK_PENDING = 1_000
+
+
+def write_log(path: str, n: int, seed: int = SEED) -> None:
+    rng = random.Random(seed)
+    base_ts = 1_700_000_000
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            did = f"dry-{i // 2}"
+            status = "pending" if i % 2 == 0 else rng.choice(["approved", "denied"])
+            f.write(json.dumps({"status": status, "dry_run_id": did, "approval_id": f"{i:032x}", "ts": base_ts + i}) + "\n")
+
+
+def run(sizes: List[int], pending: int = PENDING) -> List[Dict[str, Any]]:
+    from src.app.approvals import list_approvals
+
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        for n in sizes:
+            path = os.path.join(d, f"approvals-{n}.log")
+            write_log(path, n)
+            stats = measure(lambda: list_approvals(path), min_time=0.2, repeat=3 if n >= 100_000 else 5)
+            results.append(latency_result("approvals.list_approvals", {"lines": n}, stats))
+            os.remove(path)
+        results.extend(run_completion(d, pending))
+    return results
+
+
+def run_completion(d: str, n: int) -> List[Dict[str, Any]]:
+    import mcp_server
+
+    results = []
+    ids = [f"dry-{i}" for i in range(n)]
+    os.environ["AUDIT_PATH"] = os.path.join(d, "audit.log")
+    os.environ["APPROVAL_CODE"] = "123456"
+    for mode in ("single", "batch"):
+        path = os.environ["APPROVALS_PATH"] = os.path.join(d, f"approvals-{mode}.log")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps({"status": "pending", "dry_run_id": did, "approval_id": f"{i:032x}", "ts": 0}) + "\n"
+                         for i, did in enumerate(ids))
+        t0 = time.perf_counter()
+        if mode == "single":
+            for did in ids:
+                mcp_server.require_approval(did, approval_code="123456")
+        else:
+            mcp_server.complete_approvals(ids, approval_code="123456")
+        results.append(throughput_result(f"approvals.complete.{mode}", {"pending": n}, n, time.perf_counter() - t0))
+    return results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--sizes", default=None, help="comma-separated line counts (10^3..10^7)")
+    ap.add_argument("--pending", type=int, default=None, help="pending approvals to complete (default 10000)")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",")] if args.sizes else (QUICK_SIZES if args.quick else SIZES)
+    emit(run(sizes, args.pending or (QUICK_PENDING if args.quick else PENDING)), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Audit analytics: the same group-by ("pending amount per refunds.* tool, last 7 days")
+answered by parsing the JSONL log (archive.scan_jsonl) vs over the columnar archive
+(archive.query on npz, and Parquet when pyarrow is installed). Needs numpy.
+Examples:
+  python benchmarks/bench_archive.py --quick
+  python benchmarks/bench_archive.py --sizes 100000,1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+from harness import SEED, emit, latency_result, measure
+
+SIZES = [100_000, 1_000_000]
+QUICK_SIZES = [20_000]
+NOW = 1_700_000_000
+QUERY: Dict[str, Any] = {"group_by": ["tool"], "where": {"status": "pending", "tool": "refunds.*"}, "since": NOW - 7 * 86400}
+
+
+def write_log(path: str, n: int, seed: int = SEED) -> None:
+    rng = random.Random(seed)
+    tools = ["refunds.create", "refunds.void", "payments.charge", "admin.drop"] + [f"tool.{i}" for i in range(100)]
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(n):
+            status = rng.choice(["allowed"] * 8 + ["pending", "blocked"])
+            f.write(json.dumps({
+                "action": "enforce", "ok": status == "allowed", "tool": rng.choice(tools), "op": rng.choice([None, "refund"]),
+                "amount_cents": rng.randrange(10_000), "status": status, "ts": NOW - rng.randrange(30 * 86400),
+                "trace_id": f"{rng.getrandbits(128):032x}",
+            }) + "\n")
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    try:
+        from src.app import archive
+    except ImportError:
+        sys.stderr.write("skipping audit.query benchmarks: numpy is not installed\n")
+        return []
+
+    formats = ["npz"] + (["parquet"] if archive._have_pyarrow() else [])
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        for n in sizes:
+            path = os.path.join(d, f"audit-{n}.log")
+            write_log(path, n)
+            stats = measure(lambda: archive.scan_jsonl(path, **QUERY), min_time=0.5, repeat=3)
+            results.append(latency_result("audit.query.jsonl", {"records": n}, stats))
+            for fmt in formats:
+                out = os.path.join(d, f"archive-{n}-{fmt}")
+                archive.archive(path, out, fmt=fmt, max_rows=250_000)
+                stats = measure(lambda: archive.query(out, **QUERY), min_time=0.5, repeat=3)
+                size = sum(os.path.getsize(os.path.join(out, f)) for f in os.listdir(out))
+                results.append(latency_result(f"audit.query.{fmt}", {"records": n, "bytes_per_record": round(size / n, 2)}, stats))
+            os.remove(path)
+    return results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--sizes", default=None, help="comma-separated record counts")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",")] if args.sizes else (QUICK_SIZES if args.quick else SIZES)
+    emit(run(sizes), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+audit.write throughput: one writer, concurrent writers (group commit), batched appends
+and the AUDIT_MODE=sample/aggregate reductions (params report bytes written per event).
+Writes go to a temporary AUDIT_PATH.
+Examples:
+  python benchmarks/bench_audit.py --quick
+  python benchmarks/bench_audit.py --events 50000 --threads 16
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from harness import emit, throughput_result
+
+EVENT = {"action": "enforce", "ok": True, "tool": "refunds.refund", "op": "refund", "amount_cents": 1200, "status": "allowed"}
+
+
+def run(events: int, threads: int, batch: int) -> List[Dict[str, Any]]:
+    from src.app import audit
+
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["AUDIT_PATH"] = os.path.join(d, "audit.log")
+
+        t0 = time.perf_counter()
+        for _ in range(events):
+            audit.write(EVENT)
+        results.append(throughput_result("audit.write.sequential", {"events": events}, events, time.perf_counter() - t0))
+
+        per_thread = events // threads
+        with ThreadPoolExecutor(threads) as pool:
+            t0 = time.perf_counter()
+            list(pool.map(lambda _: [audit.write(EVENT) for _ in range(per_thread)], range(threads)))
+            elapsed = time.perf_counter() - t0
+        results.append(throughput_result("audit.write.concurrent", {"events": per_thread * threads, "threads": threads}, per_thread * threads, elapsed))
+
+        t0 = time.perf_counter()
+        futures = [audit.submit_many([EVENT] * batch)[1] for _ in range(events // batch)]
+        for f in futures:
+            f.result()
+        results.append(throughput_result("audit.submit_many", {"events": events // batch * batch, "batch": batch}, events // batch * batch, time.perf_counter() - t0))
+
+        for mode in ("sample", "aggregate"):
+            path = os.environ["AUDIT_PATH"] = os.path.join(d, f"audit-{mode}.log")
+            os.environ["AUDIT_MODE"] = mode
+            try:
+                t0 = time.perf_counter()
+                for _ in range(events):
+                    audit.write(EVENT)
+                audit.flush_rollups().result()
+                elapsed = time.perf_counter() - t0
+            finally:
+                del os.environ["AUDIT_MODE"]
+            per_event = round(os.path.getsize(path) / events, 2)
+            results.append(throughput_result(f"audit.write.{mode}", {"events": events, "bytes_per_event": per_event}, events, elapsed))
+    return results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--events", type=int, default=None)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--batch", type=int, default=100)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    events = args.events or (2_000 if args.quick else 20_000)
+    emit(run(events, args.threads, args.batch), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+End-to-end /guard/enforce and /guard/check through an in-process ASGI transport
+(httpx.ASGITransport — no sockets), sequential latency and concurrent throughput.
+Examples:
+  python benchmarks/bench_http.py --quick
+  python benchmarks/bench_http.py --requests 5000 --concurrency 128
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from harness import emit, latency_result, throughput_result
+
+BODY = {"tool": "refunds.refund", "amount_cents": 1200, "op": "refund"}
+
+
+async def _run(requests: int, concurrency: int) -> List[Dict[str, Any]]:
+    import httpx
+
+    from src.app.main import create_app
+
+    results = []
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/guard/check", "/guard/enforce"):
+            for _ in range(20):  # warm-up
+                await client.post(path, json=BODY)
+            samples = []
+            for _ in range(requests):
+                t0 = time.perf_counter()
+                await client.post(path, json=BODY)
+                samples.append(time.perf_counter() - t0)
+            samples.sort()
+            stats = {
+                "number": requests,
+                "repeat": 1,
+                "min_us": round(samples[0] * 1e6, 1),
+                "median_us": round(samples[len(samples) // 2] * 1e6, 1),
+                "p99_us": round(samples[int(len(samples) * 0.99)] * 1e6, 1),
+                "ops_per_sec": round(len(samples) / sum(samples), 1),
+            }
+            res = latency_result(f"http{path.replace('/', '.')}.sequential", {"requests": requests}, stats)
+            res["value"] = stats["median_us"]  # median is the stable statistic for request latency
+            results.append(res)
+
+            sem = asyncio.Semaphore(concurrency)
+
+            async def one() -> None:
+                async with sem:
+                    await client.post(path, json=BODY)
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            results.append(throughput_result(f"http{path.replace('/', '.')}.concurrent", {"requests": requests, "concurrency": concurrency}, requests, time.perf_counter() - t0))
+    return results
+
+
+def run(requests: int, concurrency: int) -> List[Dict[str, Any]]:
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["AUDIT_PATH"] = os.path.join(d, "audit.log")
+        os.environ["APPROVALS_PATH"] = os.path.join(d, "approvals.log")
+        return asyncio.run(_run(requests, concurrency))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--requests", type=int, default=None)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    emit(run(args.requests or (300 if args.quick else 2000), args.concurrency), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
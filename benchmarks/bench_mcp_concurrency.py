@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Pipelined load test for the MCP tools through the FastMCP in-memory client.
+Keeps --concurrency firewall_enforce calls in flight on one session and reports
+throughput as JSON. Audit/approval logs go to a temp dir.
+Examples:
+  python benchmarks/bench_mcp_concurrency.py
+  python benchmarks/bench_mcp_concurrency.py --calls 5000 --concurrency 1,16,128
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+async def _run(calls: int, concurrency: int) -> Dict[str, Any]:
+    from fastmcp import Client
+
+    import mcp_server
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async with Client(mcp_server.mcp) as client:
+        async def one(i: int) -> None:
+            async with sem:
+                amount = 12000 if i % 4 else 20000
+                await client.call_tool("firewall_enforce", {"tool": "refunds.refund", "amount_cents": amount, "op": "refund"})
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(calls)))
+        elapsed = time.perf_counter() - t0
+    return {"concurrency": concurrency, "calls": calls, "seconds": round(elapsed, 4), "calls_per_sec": round(calls / elapsed, 1)}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=1000)
+    ap.add_argument("--concurrency", default="1,8,64", help="comma-separated in-flight limits")
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["AUDIT_PATH"] = os.path.join(d, "audit.log")
+        os.environ["APPROVALS_PATH"] = os.path.join(d, "approvals.log")
+        for c in (int(x) for x in args.concurrency.split(",")):
+            results.append(asyncio.run(_run(args.calls, c)))
+    sys.stdout.write(json.dumps({"benchmark": "mcp_concurrency", "results": results}, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
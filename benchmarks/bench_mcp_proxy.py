@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Latency overhead of mcp_proxy.py versus talking to the upstream directly.
+Runs the same allowed tools/call sequentially against stub_upstream_server.py,
+once directly and once through the proxy, and reports p50/p95 per path as JSON.
+Examples:
+  python benchmarks/bench_mcp_proxy.py
+  python benchmarks/bench_mcp_proxy.py --calls 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _pct(samples: List[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+async def _measure(command: List[str], calls: int, env: Dict[str, str]) -> Dict[str, float]:
+    from fastmcp import Client
+    from fastmcp.client.transports import StdioTransport
+
+    transport = StdioTransport(command=command[0], args=command[1:], env=env, cwd=str(ROOT))
+    samples: List[float] = []
+    async with Client(transport) as client:
+        args = {"amount_cents": 1000, "op": "refund"}
+        for _ in range(20):  # warm-up
+            await client.call_tool("refunds.refund", args)
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            await client.call_tool("refunds.refund", args)
+            samples.append((time.perf_counter() - t0) * 1e6)
+    return {
+        "p50_us": round(_pct(samples, 0.50), 1),
+        "p95_us": round(_pct(samples, 0.95), 1),
+        "mean_us": round(statistics.fmean(samples), 1),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=500)
+    args = ap.parse_args()
+
+    upstream = [sys.executable, "stub_upstream_server.py"]
+    with tempfile.TemporaryDirectory() as d:
+        env = dict(os.environ)
+        env.update({
+            "AUDIT_PATH": os.path.join(d, "audit.log"),
+            "APPROVALS_PATH": os.path.join(d, "approvals.log"),
+            "PYTHONPATH": str(ROOT),
+        })
+        direct = asyncio.run(_measure(upstream, args.calls, env))
+        proxied = asyncio.run(_measure([sys.executable, "mcp_proxy.py", "--", *upstream], args.calls, env))
+    report = {
+        "benchmark": "mcp_proxy_overhead",
+        "calls": args.calls,
+        "direct": direct,
+        "proxied": proxied,
+        "overhead_p50_us": round(proxied["p50_us"] - direct["p50_us"], 1),
+    }
+    sys.stdout.write(json.dumps(report, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
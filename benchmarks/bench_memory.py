@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Resident bytes per record for audit and approval records held in memory, before (one
+dict per parsed JSON line) and after (records.ApprovalRecord / AuditRecord with
+__slots__ and interned strings). Allocations are counted with tracemalloc.
+Examples:
+  python benchmarks/bench_memory.py --quick
+  python benchmarks/bench_memory.py --records 1000000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from harness import SEED, emit, memory_result
+
+RECORDS = 200_000
+QUICK_RECORDS = 20_000
+TOOLS = ["refunds.refund", "refunds.void", "payments.charge", "admin.drop"] + [f"tool.{i}" for i in range(50)]
+
+
+def _held(fn: Callable[[], Any]) -> int:
+    """Bytes still allocated by what fn() returns."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = fn()
+        nbytes = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return nbytes
+
+
+def audit_lines(n: int, seed: int = SEED) -> List[bytes]:
+    from src.app.ids import new_id
+
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        status = rng.choice(["allowed", "allowed", "pending", "blocked"])
+        lines.append(json.dumps({
+            "action": "enforce", "ok": status == "allowed", "tool": rng.choice(TOOLS), "op": "refund",
+            "amount_cents": rng.randrange(100, 500_000), "status": status, "reasons": ["Auto-approved refunds under $150"],
+            "rule_id": "r-refund-small", "meta": {"ticket": i % 97}, "ts": 1_700_000_000 + i, "ts_ms": 1_700_000_000_000 + i,
+            "trace_id": new_id(), "chain": f"{rng.getrandbits(128):032x}",
+        }).encode())
+    return lines
+
+
+def run(n: int) -> List[Dict[str, Any]]:
+    import bench_approvals
+
+    from src.app.approvals import read_approval_records
+    from src.app.records import AuditRecord
+
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "approvals.log")
+        bench_approvals.write_log(path, n)
+
+        def as_dicts() -> List[Dict[str, Any]]:
+            with open(path, "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+        results.append(memory_result("memory.approvals.dict", {"records": n}, n, _held(as_dicts)))
+        results.append(memory_result("memory.approvals.slots", {"records": n}, n, _held(lambda: read_approval_records(path))))
+
+    lines = audit_lines(n)
+    results.append(memory_result("memory.audit.dict", {"records": n}, n, _held(lambda: [json.loads(x) for x in lines])))
+    results.append(memory_result("memory.audit.slots", {"records": n}, n,
+                                 _held(lambda: [AuditRecord.from_dict(json.loads(x)) for x in lines])))
+    # what the archive buffers per row: slotted fields only
+    results.append(memory_result("memory.audit.slots_only", {"records": n}, n,
+                                 _held(lambda: [AuditRecord.from_dict(json.loads(x), keep_extra=False) for x in lines])))
+    return results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--records", type=int, default=None)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    emit(run(args.records or (QUICK_RECORDS if args.quick else RECORDS)), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Policy evaluation cost vs. rule count (v2 compiled/dict, v1 allow lists), and
+tool-name matching with mixed match types: the combined matcher (cold and memoized)
+vs. a per-rule fnmatch loop, and decisions through N `when:` rules (one per tenant),
+which should stay flat as N grows. policy.evaluate.tenants times guard.evaluate
+round-robin over T per-tenant policy files (POLICY_DIR, all resident in the LRU)
+against the same call on the single default policy. policy.window.reserve times a
+window_cap_cents check-and-add after N earlier spends in the window (flat in N).
+The target tool only matches the catch-all, so every rule is scanned (worst case).
+Examples:
+  python benchmarks/bench_policy.py --quick
+  python benchmarks/bench_policy.py --sizes 10,1000,100000 --tenants 1000
+"""
+import argparse
+import fnmatch
+import itertools
+import os
+import random
+import re
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from harness import SEED, emit, latency_result, measure
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+QUICK_SIZES = [10, 100, 1_000]
+TENANTS = [1_000]
+QUICK_TENANTS = [100]
+TENANT_RULES = 20
+WINDOW_HISTORY = [1_000, 1_000_000]
+QUICK_WINDOW_HISTORY = [1_000]
+
+
+def synthetic_v2(n: int, seed: int = SEED) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    rules: List[Dict[str, Any]] = []
+    for i in range(n - 1):
+        kind = rng.random()
+        if kind < 0.6:
+            rules.append({"match": f"team{i}.tool*", "decision": "allow", "cap_cents": rng.randrange(1000, 50000), "ops": ["refund"]})
+        elif kind < 0.9:
+            rules.append({"match": f"team{i}.admin.*", "decision": "deny", "reason": f"rule {i}"})
+        else:
+            rules.append({"match": f"svc{i}.export", "decision": "review"})
+    rules.append({"match": "*", "decision": "review", "reason": "fallback"})
+    return {"version": 2, "rules": rules}
+
+
+def synthetic_mixed(n: int, seed: int = SEED) -> Dict[str, Any]:
+    """Rules of every match type; globs have inner wildcards so they need a regex."""
+    rng = random.Random(seed)
+    rules: List[Dict[str, Any]] = []
+    for i in range(n - 1):
+        kind = rng.random()
+        if kind < 0.4:
+            rules.append({"match": f"team{i}.*.tool?", "decision": "allow"})
+        elif kind < 0.6:
+            rules.append({"match": f"svc{i}.export", "match_type": "exact", "decision": "review"})
+        elif kind < 0.8:
+            rules.append({"match": f"ns{i}.", "match_type": "prefix", "decision": "deny"})
+        else:
+            rules.append({"match": f"team{i}\\.(read|list)_[a-z]+", "match_type": "regex", "decision": "allow"})
+    rules.append({"match": "*", "decision": "review", "reason": "fallback"})
+    return {"version": 2, "rules": rules}
+
+
+def fnmatch_loop(rules: List[Dict[str, Any]], tool: str) -> Optional[int]:
+    """Reference matcher: the per-rule loop the engine used before rules were indexed."""
+    for i, r in enumerate(rules):
+        kind = r.get("match_type")
+        if kind == "exact":
+            hit = tool == r["match"]
+        elif kind == "prefix":
+            hit = tool.startswith(r["match"])
+        elif kind == "regex":
+            hit = re.fullmatch(r["match"], tool) is not None
+        else:
+            hit = fnmatch.fnmatch(tool, r["match"])
+        if hit:
+            return i
+    return None
+
+
+def synthetic_when(n: int) -> Dict[str, Any]:
+    """One conditional rule per tenant on the same tool namespace, plus a catch-all."""
+    rules: List[Dict[str, Any]] = [
+        {"match": "refunds.*", "decision": "allow", "cap_cents": 10_000 + i, "when": {"tenant": f"t{i}", "tier": {"in": ["gold", "plat"]}}}
+        for i in range(n - 1)
+    ]
+    rules.append({"match": "*", "decision": "review", "reason": "fallback"})
+    return {"version": 2, "rules": rules}
+
+
+def synthetic_v1(n: int) -> Dict[str, Any]:
+    return {
+        "max_refund_cents": 15000,
+        "max_payment_link_cents": 25000,
+        "allow_tools": [f"team{i}.tool*" for i in range(n)],
+        "deny_tools": [],
+    }
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    from src.app.engine_v2 import compile_v2, evaluate_v2
+    from src.app.guard import evaluate_v1
+
+    results = []
+    tool = "unlisted.tool"
+    for n in sizes:
+        policy = synthetic_v2(n)
+        compiled = compile_v2(policy)
+        results.append(latency_result("policy.evaluate_v2.compiled", {"rules": n}, measure(lambda: compiled.evaluate(tool, 1000, "refund"))))
+        results.append(latency_result("policy.evaluate_v2.dict", {"rules": n}, measure(lambda: evaluate_v2(policy, tool, 1000, "refund"), min_time=0.1, repeat=3)))
+        results.append(latency_result("policy.compile_v2", {"rules": n}, measure(lambda: compile_v2(policy), min_time=0.1, repeat=3)))
+        mixed = synthetic_mixed(n)
+        combined = compile_v2(mixed)
+        combined.first_match(tool)  # build the alternation outside the timed loop
+        results.append(latency_result("policy.match.fnmatch_loop", {"rules": n}, measure(lambda: fnmatch_loop(mixed["rules"], tool), min_time=0.1, repeat=3)))
+        results.append(latency_result("policy.match.combined.cold", {"rules": n}, measure(lambda: combined._lookup(tool))))
+        results.append(latency_result("policy.match.combined", {"rules": n}, measure(lambda: combined.first_match(tool))))
+        conditional = compile_v2(synthetic_when(n))
+        meta = {"tenant": f"t{n // 2}", "tier": "gold"}
+        results.append(latency_result("policy.evaluate_v2.when", {"rules": n}, measure(lambda: conditional.evaluate("refunds.create", 1000, "refund", meta))))
+        v1 = synthetic_v1(n)
+        results.append(latency_result("policy.evaluate_v1", {"rules": n}, measure(lambda: evaluate_v1(v1, tool, 1000, "refund"), min_time=0.1, repeat=3)))
+    return results
+
+
+def run_tenants(counts: List[int]) -> List[Dict[str, Any]]:
+    import yaml
+
+    from src.app import policy as policy_mod
+    from src.app.guard import evaluate
+
+    results = []
+    saved = {k: os.environ.get(k) for k in ("POLICY_PATH", "POLICY_DIR")}
+    try:
+        for t in counts:
+            with tempfile.TemporaryDirectory() as d:
+                text = yaml.dump(synthetic_v2(TENANT_RULES), Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper))
+                names = [f"tenant{i:05d}" for i in range(t)]
+                for name in names + ["default"]:
+                    with open(os.path.join(d, name + ".yml"), "w", encoding="utf-8") as f:
+                        f.write(text)
+                os.environ["POLICY_PATH"] = os.path.join(d, "default.yml")
+                os.environ["POLICY_DIR"] = d
+                policy_mod._COMPILED.clear()
+                metas = [{"tenant": name} for name in names]
+                for meta in metas:  # load every tenant outside the timed loop
+                    evaluate("unlisted.tool", 1000, "refund", meta)
+                it = itertools.cycle(metas)
+                results.append(latency_result("policy.evaluate.default", {"tenants": t, "rules": TENANT_RULES},
+                                              measure(lambda: evaluate("unlisted.tool", 1000, "refund"))))
+                results.append(latency_result("policy.evaluate.tenants", {"tenants": t, "rules": TENANT_RULES},
+                                              measure(lambda: evaluate("unlisted.tool", 1000, "refund", next(it)))))
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        policy_mod._COMPILED.clear()
+    return results
+
+
+def run_windows(history: List[int]) -> List[Dict[str, Any]]:
+    from src.app import windows
+
+    results = []
+    for n in history:
+        windows._WINDOWS.clear()
+        key = (None, "refunds", 86400, "refunds.create", "bench")
+        t0 = 1_000_000.0
+        for i in range(n):  # n spends spread over the last 23h
+            windows.reserve(key, 1, 10**12, now=t0 + i * 82800 / n)
+        now = t0 + 82800
+        results.append(latency_result("policy.window.reserve", {"history": n}, measure(lambda: windows.reserve(key, 1, 10**12, now=now))))
+    windows._WINDOWS.clear()
+    return results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--sizes", default=None, help="comma-separated rule counts")
+    ap.add_argument("--tenants", default=None, help="comma-separated tenant counts")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",")] if args.sizes else (QUICK_SIZES if args.quick else SIZES)
+    tenants = [int(x) for x in args.tenants.split(",")] if args.tenants else (QUICK_TENANTS if args.quick else TENANTS)
+    emit(run(sizes) + run_tenants(tenants) + run_windows(QUICK_WINDOW_HISTORY if args.quick else WINDOW_HISTORY), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
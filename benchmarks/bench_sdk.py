@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead of the embedded guard SDK versus POST /guard/enforce.
+Both run in-process (the HTTP path through FastAPI's TestClient, i.e. without
+any network), so the gap is a lower bound on what the SDK saves. JSON output.
+Examples:
+  python benchmarks/bench_sdk.py
+  python benchmarks/bench_sdk.py --calls 50000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=5000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["AUDIT_PATH"] = os.path.join(d, "audit.log")
+        os.environ["APPROVALS_PATH"] = os.path.join(d, "approvals.log")
+        from fastapi.testclient import TestClient
+
+        from src.app.main import app
+        from src.app.sdk import Guard
+
+        http = TestClient(app)
+        guard = Guard(client=http, background=False, batch_size=1000)
+
+        t0 = time.perf_counter()
+        for _ in range(args.calls):
+            guard.check("refunds.refund", amount_cents=1000, op="refund")
+        guard.flush()
+        sdk_us = (time.perf_counter() - t0) / args.calls * 1e6
+
+        n_http = max(1, args.calls // 10)
+        t0 = time.perf_counter()
+        for _ in range(n_http):
+            http.post("/guard/enforce", json={"tool": "refunds.refund", "amount_cents": 1000, "op": "refund"})
+        http_us = (time.perf_counter() - t0) / n_http * 1e6
+
+    report = {
+        "benchmark": "sdk_overhead",
+        "sdk_check_us": round(sdk_us, 2),
+        "http_enforce_us": round(http_us, 2),
+        "speedup": round(http_us / sdk_us, 1),
+    }
+    sys.stdout.write(json.dumps(report, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark based on `python -X importtime`.
+Spawns fresh interpreters, records the cumulative import time of each entry
+module and prints a JSON report. Exits 1 if a --budget-ms is exceeded.
+Examples:
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --runs 10 --budget-ms 600
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ENTRY_MODULES = ["src.app.main", "mcp_server"]
+
+
+def import_time_us(module: str) -> Dict[str, int]:
+    """Import `module` in a fresh interpreter; return {module: cumulative_us} for everything it loaded."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(ROOT),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    out: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1].strip())
+        except ValueError:
+            continue  # header line
+        out[parts[2].strip()] = cumulative
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=None, help="fail if any median exceeds this")
+    args = ap.parse_args()
+
+    report: Dict[str, Dict[str, float]] = {}
+    failed = False
+    for module in ENTRY_MODULES:
+        samples: List[int] = []
+        for _ in range(args.runs):
+            samples.append(import_time_us(module).get(module, 0))
+        median_ms = statistics.median(samples) / 1000.0
+        report[module] = {"median_ms": round(median_ms, 2), "min_ms": round(min(samples) / 1000.0, 2)}
+        if args.budget_ms is not None and median_ms > args.budget_ms:
+            failed = True
+    sys.stdout.write(json.dumps({"benchmark": "startup", "runs": args.runs, "results": report}, indent=2) + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
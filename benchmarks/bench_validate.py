@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Policy file validation cost vs. rule count: YAML parsing (pure-Python SafeLoader vs
+libyaml CSafeLoader) and schema validation (whole-document PolicyV2 vs chunked
+validate_v2, serial and with a process pool), plus a cold load of the compiled
+policy from YAML vs from a `cli.py compile` artifact, and the reload after one of
+FRAGMENTS included files changes (only that fragment is re-parsed).
+The pure-Python loader is only timed up to --pure-max rules (it takes ~25s at 100k).
+Examples:
+  python benchmarks/bench_validate.py --quick
+  python benchmarks/bench_validate.py --sizes 100000 --jobs 8
+"""
+import argparse
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from bench_policy import synthetic_v2
+from harness import emit, latency_result, measure
+
+SIZES = [1_000, 10_000, 100_000]
+FRAGMENTS = 50
+QUICK_SIZES = [1_000]
+
+
+def run(sizes: List[int], jobs: Optional[int] = None, pure_max: int = 10_000) -> List[Dict[str, Any]]:
+    import yaml
+
+    from src.app import policy as policy_mod
+    from src.app.policy import load_yaml
+    from src.app.policy_v2 import PolicyV2, validate_v2
+
+    jobs = jobs or os.cpu_count() or 1
+    results = []
+    for n in sizes:
+        policy = synthetic_v2(n)
+        text = yaml.dump(policy, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper))
+        once = {"min_time": 0.0, "repeat": 1} if n >= 10_000 else {"min_time": 0.2, "repeat": 3}
+        if n <= pure_max:
+            results.append(latency_result("validate.yaml_load.pure", {"rules": n}, measure(lambda: yaml.load(text, Loader=yaml.SafeLoader), **once)))
+        results.append(latency_result("validate.yaml_load", {"rules": n, "libyaml": yaml.__with_libyaml__}, measure(lambda: load_yaml(text), **once)))
+        results.append(latency_result("validate.model_validate", {"rules": n}, measure(lambda: PolicyV2.model_validate(policy), **once)))
+        results.append(latency_result("validate.validate_v2", {"rules": n, "jobs": 1}, measure(lambda: validate_v2(policy, jobs=1), **once)))
+        if jobs > 1:
+            results.append(latency_result("validate.validate_v2", {"rules": n, "jobs": jobs}, measure(lambda: validate_v2(policy, jobs=jobs), **once)))
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "policy.yml")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+
+            def cold_load() -> None:
+                policy_mod._COMPILED.clear()
+                policy_mod.load_compiled_policy(path)
+
+            results.append(latency_result("policy.load.yaml", {"rules": n}, measure(cold_load, **once)))
+            policy_mod.write_artifact(path)
+            results.append(latency_result("policy.load.artifact", {"rules": n}, measure(cold_load, **once)))
+
+            # Same rules split over FRAGMENTS included files; edit one between reloads
+            rules = policy["rules"]
+            step = -(-len(rules) // FRAGMENTS)
+            names = []
+            for i in range(0, len(rules), step):
+                names.append(os.path.join(d, f"team{i // step:03d}.yml"))
+                with open(names[-1], "w", encoding="utf-8") as f:
+                    f.write(yaml.dump({"rules": rules[i:i + step]}, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper)))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("version: 2\ninclude: ['team*.yml']\nrules: []\n")
+            policy_mod.load_compiled_policy(path)
+            edits = [0]
+
+            def reload_one_fragment() -> None:
+                edits[0] += 1
+                with open(names[0], "a", encoding="utf-8") as f:
+                    f.write(f"# edit {edits[0]}\n")
+                policy_mod.load_compiled_policy(path)
+
+            results.append(latency_result("policy.reload.fragment", {"rules": n, "fragments": len(names)}, measure(reload_one_fragment, **once)))
+    return results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true")
+    ap.add_argument("--sizes", default=None, help="comma-separated rule counts")
+    ap.add_argument("--jobs", type=int, default=None, help="process pool size for the parallel run (default: CPU count)")
+    ap.add_argument("--pure-max", type=int, default=10_000, help="largest size to time the pure-Python loader at")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",")] if args.sizes else (QUICK_SIZES if args.quick else SIZES)
+    emit(run(sizes, jobs=args.jobs, pure_max=args.pure_max), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
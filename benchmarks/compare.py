@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark reports (from run_all.py or any bench_*.py --out).
+Prints per-scenario change and exits 1 if any scenario regressed by more than
+--threshold (default 0.20 = 20%). Scenarios present in only one report are listed
+but never fail the comparison.
+Examples:
+  python benchmarks/compare.py bench-base.json bench-head.json
+  python benchmarks/compare.py base.json head.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from harness import scenario_key
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Return (rows, regressed scenario keys). `change` > 0 always means "worse"."""
+    base_by = {scenario_key(r): r for r in base.get("results", [])}
+    rows: List[Dict[str, Any]] = []
+    regressed: List[str] = []
+    for r in head.get("results", []):
+        key = scenario_key(r)
+        b = base_by.pop(key, None)
+        if b is None or not b.get("value"):
+            rows.append({"scenario": key, "base": None, "head": r["value"], "unit": r["unit"], "change": None})
+            continue
+        ratio = r["value"] / b["value"]
+        change = (1.0 / ratio - 1.0) if r.get("higher_is_better") else (ratio - 1.0)
+        rows.append({"scenario": key, "base": b["value"], "head": r["value"], "unit": r["unit"], "change": round(change, 4)})
+        if change > threshold:
+            regressed.append(key)
+    for key, b in base_by.items():
+        rows.append({"scenario": key, "base": b["value"], "head": None, "unit": b["unit"], "change": None})
+    return rows, regressed
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("base")
+    ap.add_argument("head")
+    ap.add_argument("--threshold", type=float, default=0.20)
+    args = ap.parse_args()
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    head = json.loads(Path(args.head).read_text(encoding="utf-8"))
+    rows, regressed = compare(base, head, args.threshold)
+    for row in rows:
+        change = "n/a" if row["change"] is None else f"{row['change'] * 100:+.1f}%"
+        flag = "  REGRESSION" if row["scenario"] in regressed else ""
+        sys.stdout.write(f"{row['scenario']:<70} {row['base']!s:>12} -> {row['head']!s:>12} {row['unit']:<6} {change}{flag}\n")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
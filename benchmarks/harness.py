@@ -0,0 +1,103 @@
+"""
+Shared helpers for the benchmark suite: adaptive timing, a common result record
+and the JSON report envelope that benchmarks/compare.py understands.
+
+Every result is {"name", "params", "unit", "value", "higher_is_better", ...stats};
+`name` + `params` identify a scenario across runs so reports from two commits
+can be diffed automatically.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+SEED = 1234  # synthetic data generators use this so runs are reproducible
+
+
+def measure(fn: Callable[[], Any], min_time: float = 0.2, repeat: int = 5, max_number: int = 1_000_000) -> Dict[str, float]:
+    """Time fn() like timeit: calibrate a loop count to ~min_time, then take `repeat` samples."""
+    number = 1
+    while number < max_number:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - t0 >= min_time / repeat:
+            break
+        number *= 4
+    per_call: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - t0) / number)
+    best = min(per_call)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_us": round(best * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "ops_per_sec": round(1.0 / best, 1) if best > 0 else float("inf"),
+    }
+
+
+def latency_result(name: str, params: Dict[str, Any], stats: Dict[str, float]) -> Dict[str, Any]:
+    return {"name": name, "params": params, "unit": "us", "value": stats["min_us"], "higher_is_better": False, **stats}
+
+
+def memory_result(name: str, params: Dict[str, Any], count: int, nbytes: int) -> Dict[str, Any]:
+    return {"name": name, "params": params, "unit": "bytes/record", "value": round(nbytes / count, 1),
+            "higher_is_better": False, "count": count, "bytes": nbytes}
+
+
+def throughput_result(name: str, params: Dict[str, Any], count: int, seconds: float) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "params": params,
+        "unit": "ops/s",
+        "value": round(count / seconds, 1) if seconds > 0 else float("inf"),
+        "higher_is_better": True,
+        "count": count,
+        "seconds": round(seconds, 4),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=str(ROOT), capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def report(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ts": int(time.time()),
+        },
+        "results": results,
+    }
+
+
+def emit(results: List[Dict[str, Any]], out: Optional[str] = None) -> None:
+    text = json.dumps(report(results), indent=2) + "\n"
+    if out:
+        Path(out).write_text(text, encoding="utf-8")
+    else:
+        sys.stdout.write(text)
+
+
+def scenario_key(result: Dict[str, Any]) -> str:
+    return result["name"] + json.dumps(result.get("params") or {}, sort_keys=True)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite and write one JSON report (see harness.report()).
+Examples:
+  python benchmarks/run_all.py --quick --out bench-head.json
+  python benchmarks/run_all.py --only policy,http
+  python benchmarks/compare.py bench-base.json bench-head.json
+"""
+import argparse
+import sys
+from typing import Any, Callable, Dict, List
+
+import bench_approvals
+import bench_archive
+import bench_audit
+import bench_http
+import bench_memory
+import bench_policy
+import bench_validate
+from harness import emit
+
+SUITES: Dict[str, Callable[[bool], List[Dict[str, Any]]]] = {
+    "policy": lambda quick: bench_policy.run(bench_policy.QUICK_SIZES if quick else bench_policy.SIZES),
+    "validate": lambda quick: bench_validate.run(bench_validate.QUICK_SIZES if quick else bench_validate.SIZES),
+    "audit": lambda quick: bench_audit.run(2_000 if quick else 20_000, threads=8, batch=100),
+    "archive": lambda quick: bench_archive.run(bench_archive.QUICK_SIZES if quick else bench_archive.SIZES),
+    "approvals": lambda quick: bench_approvals.run(bench_approvals.QUICK_SIZES if quick else bench_approvals.SIZES,
+                                                   bench_approvals.QUICK_PENDING if quick else bench_approvals.PENDING),
+    "memory": lambda quick: bench_memory.run(bench_memory.QUICK_RECORDS if quick else bench_memory.RECORDS),
+    "http": lambda quick: bench_http.run(300 if quick else 2000, concurrency=32),
+}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true", help="small sizes (CI smoke)")
+    ap.add_argument("--only", default=",".join(SUITES), help="comma-separated: " + ",".join(SUITES))
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    for name in args.only.split(","):
+        if name not in SUITES:
+            sys.stderr.write(f"unknown suite {name!r}\n")
+            return 2
+        sys.stderr.write(f"running {name}...\n")
+        results.extend(SUITES[name](args.quick))
+    emit(results, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
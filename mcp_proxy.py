@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Transparent MCP firewall proxy (stdio).
+
+Sits between an MCP client and an upstream MCP stdio server:
+  client <-> mcp_proxy.py <-> upstream
+Every message is forwarded byte-for-byte except `tools/call` requests, which are
+first run through the enforcer in-process (policy + audit + pending approval).
+Allowed calls go upstream unchanged; blocked/pending calls are answered directly
+with an `isError` tool result carrying the decision. Requests are pipelined: the
+proxy never waits for one response before forwarding the next message.
+
+Tool-call mapping: tool = params.name, amount_cents/op = params.arguments.*,
+meta = params._meta.
+
+Examples:
+  python mcp_proxy.py -- python stub_upstream_server.py
+  MCP_UPSTREAM_CMD="python my_server.py" python mcp_proxy.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import sys
+from typing import Any, Dict, List, Optional
+
+from src.app.audit import config as _audit_config
+from src.app.enforcer import enforce_async as _enforce_async
+from src.app.policy import load_compiled_policy
+
+# MCP messages can be large (tool results, resources); lift StreamReader's 64 KiB line cap
+LINE_LIMIT = 16 * 1024 * 1024
+_TOOLS_CALL = b'"tools/call"'
+# Without a backslash a JSON line can only spell "tools/call" as those exact bytes; a line
+# with one may hide it behind an escape ("tools\/call", "tools\u002fcall"), so it is parsed.
+_ESCAPE = b"\\"
+# From this protocol revision on, requests carry their version in _meta and results must
+# carry `resultType`; clients on older revisions reject unknown keys, so only add it then.
+_META_PROTOCOL_VERSION = "io.modelcontextprotocol/protocolVersion"
+_RESULT_TYPE_SINCE = "2026-07-28"
+
+
+def _tool_result_error(msg_id: Any, decision: Dict[str, Any], protocol_version: str = "") -> bytes:
+    result: Dict[str, Any] = {"content": [{"type": "text", "text": json.dumps(decision)}], "isError": True}
+    if protocol_version >= _RESULT_TYPE_SINCE:
+        result["resultType"] = "complete"
+    return (json.dumps({"jsonrpc": "2.0", "id": msg_id, "result": result}) + "\n").encode("utf-8")
+
+
+def _rpc_error(msg_id: Any, code: int, message: str) -> bytes:
+    return (json.dumps({"jsonrpc": "2.0", "id": msg_id, "error": {"code": code, "message": message}}) + "\n").encode("utf-8")
+
+
+def _unique_keys(pairs: List[Any]) -> Dict[str, Any]:
+    # A repeated key ({"method": "tools/call", "method": "ping"}) decodes to its last value
+    # here but may decode to the first upstream; refuse it instead of guessing.
+    d = dict(pairs)
+    if len(d) != len(pairs):
+        raise ValueError("duplicate key in object")
+    return d
+
+
+def _is_call(msg: Any) -> bool:
+    return isinstance(msg, dict) and msg.get("method") == "tools/call"
+
+
+async def _enforce_call(params: Dict[str, Any]) -> Dict[str, Any]:
+    args = params.get("arguments") or {}
+    amount = args.get("amount_cents")
+    op = args.get("op")
+    meta = params.get("_meta")
+    return await _enforce_async(
+        str(params.get("name", "")),
+        amount_cents=amount if isinstance(amount, int) and not isinstance(amount, bool) else None,
+        op=op if isinstance(op, str) else None,
+        meta=meta if isinstance(meta, dict) else None,
+    )
+
+
+class EnforcingProxy:
+    """Pumps messages between a client and an upstream process, enforcing tools/call inline."""
+
+    def __init__(self, client_out: asyncio.StreamWriter, upstream_in: asyncio.StreamWriter) -> None:
+        self.client_out = client_out
+        self.upstream_in = upstream_in
+        self._inflight: "set[asyncio.Task[None]]" = set()
+
+    async def _handle_call(self, line: bytes, msg: Dict[str, Any]) -> None:
+        msg_id = msg.get("id")
+        params = msg.get("params") or {}
+        try:
+            decision = await _enforce_call(params)
+        except Exception as e:  # fail closed: never forward a call we could not decide on
+            self.client_out.write(_rpc_error(msg_id, -32603, f"firewall enforcement failed: {e}"))
+            return
+        if decision.get("status") == "allowed":
+            self.upstream_in.write(line)
+        else:
+            version = (params.get("_meta") or {}).get(_META_PROTOCOL_VERSION)
+            self.client_out.write(_tool_result_error(msg_id, decision, version if isinstance(version, str) else ""))
+
+    def on_client_line(self, line: bytes) -> None:
+        # Cheap byte check first: only lines that can carry a tools/call are ever parsed
+        if _TOOLS_CALL not in line and _ESCAPE not in line:
+            self.upstream_in.write(line)
+            return
+        try:
+            msg = json.loads(line, object_pairs_hook=_unique_keys)
+        except ValueError as e:
+            # Fail closed: upstream's parser might read a method out of what ours rejected
+            self.client_out.write(_rpc_error(None, -32700, f"parse error: {e}"))
+            return
+        if isinstance(msg, list):
+            # JSON-RPC batches are not part of current MCP stdio; refuse rather than forward unchecked calls
+            if any(_is_call(m) for m in msg):
+                self.client_out.write(_rpc_error(None, -32600, "batched tools/call is not supported by the firewall proxy"))
+            else:
+                self.upstream_in.write(line)
+            return
+        if not _is_call(msg):
+            self.upstream_in.write(line)
+            return
+        task = asyncio.create_task(self._handle_call(line, msg))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def pump_client(self, client_in: asyncio.StreamReader) -> None:
+        while True:
+            line = await client_in.readline()
+            if not line:
+                break
+            self.on_client_line(line)
+            await self.upstream_in.drain()
+        if self._inflight:
+            await asyncio.gather(*self._inflight)
+        self.upstream_in.close()
+
+    async def pump_upstream(self, upstream_out: asyncio.StreamReader) -> None:
+        while True:
+            line = await upstream_out.readline()
+            if not line:
+                break
+            self.client_out.write(line)
+            await self.client_out.drain()
+
+
+async def serve(upstream_argv: List[str], client_in: asyncio.StreamReader, client_out: asyncio.StreamWriter) -> int:
+    """Run the proxy until the client closes its input and the upstream exits."""
+    proc = await asyncio.create_subprocess_exec(
+        *upstream_argv,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        limit=LINE_LIMIT,
+    )
+    assert proc.stdin is not None and proc.stdout is not None
+    proxy = EnforcingProxy(client_out, proc.stdin)
+    await asyncio.gather(proxy.pump_client(client_in), proxy.pump_upstream(proc.stdout))
+    return await proc.wait()
+
+
+async def _stdio_streams() -> "tuple[asyncio.StreamReader, asyncio.StreamWriter]":
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+    writer = asyncio.StreamWriter(transport, protocol, None, loop)
+    return reader, writer
+
+
+async def _main(upstream_argv: List[str]) -> int:
+    reader, writer = await _stdio_streams()
+    return await serve(upstream_argv, reader, writer)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("upstream", nargs=argparse.REMAINDER, help="upstream MCP server command (after --)")
+    args = ap.parse_args(argv)
+    upstream = args.upstream[1:] if args.upstream[:1] == ["--"] else args.upstream
+    upstream = upstream or shlex.split(os.environ.get("MCP_UPSTREAM_CMD", ""))
+    if not upstream:
+        sys.stderr.write("Usage: mcp_proxy.py -- <upstream command...>  (or set MCP_UPSTREAM_CMD)\n")
+        return 2
+    try:
+        _audit_config()
+    except ValueError as e:
+        sys.stderr.write(f"{e}\n")
+        return 2
+    # Pre-compile the policy before serving so the first tool call is warm
+    load_compiled_policy()
+    return asyncio.run(_main(upstream))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
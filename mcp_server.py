@@ -1,32 +1,82 @@
-import json
 import os
-import time
-import uuid
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from fastmcp import FastMCP
 
+from src.app.approvals import submit_approval, submit_completions
+from src.app.audit import config as _audit_config
+from src.app.audit import submit as _audit_submit
+from src.app.audit import submit_many as _audit_submit_many
 from src.app.audit import write as _audit_write
+from src.app.audit import write_async as _audit_write_async
 from src.app.enforcer import enforce as _enforce
+from src.app.enforcer import enforce_async as _enforce_async
 from src.app.guard import evaluate as _guard_evaluate
-from src.app.policy import load_policy
+from src.app.ids import new_id
+from src.app.policy import load_compiled_policy, load_policy
+from src.app.windows import rebuild as rebuild_windows
+from src.app.writer import wait as _wait
 
 # Read approval code on each call fallback to default; we also keep a module-level
 # default but do not cache file paths (fixes test isolation).
 DEFAULT_APPROVAL_CODE = "123456"
 
 
-def _approvals_path() -> str:
-    return os.environ.get("APPROVALS_PATH", "approvals.log")
+def _plan_approval(dry_run_id: str, approval_code: Optional[str]) -> Tuple[dict, Optional[dict]]:
+    """Decide the approval record (and audit event, on success) for require_approval."""
+    provided = approval_code if approval_code is not None else ""
+    correct_code = os.environ.get("APPROVAL_CODE", DEFAULT_APPROVAL_CODE)
+    approval_id = new_id()
 
+    if not provided:
+        # Phase 1: create pending record
+        return {"status": "pending", "dry_run_id": dry_run_id, "approval_id": approval_id}, None
+    if provided == correct_code:
+        # Approved
+        return (
+            {"status": "approved", "dry_run_id": dry_run_id, "approval_id": approval_id},
+            {"action": "approval", "ok": True, "note": f"dry_run_id={dry_run_id}"},
+        )
+    # Wrong code → denied
+    return {"status": "denied", "dry_run_id": dry_run_id, "approval_id": approval_id}, None
 
-def _append_approval(entry: dict) -> dict:
-    rec = dict(entry)
-    rec["ts"] = int(time.time())
-    path = _approvals_path()
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(rec) + "\n")
-    return rec
+
+def _approval_result(rec: dict, audit: Optional[dict]) -> dict:
+    if rec["status"] == "pending":
+        return {
+            "ok": False,
+            "status": "pending",
+            "approval_required": True,
+            "approval_id": rec["approval_id"],
+            "hint": "Call require_approval again with approval_code.",
+            "code_set": False,
+        }
+    if rec["status"] == "approved" and audit is not None:
+        out = {"ok": True, "status": rec["status"], "approval_id": rec["approval_id"]}
+        out.update({"trace_id": audit.get("trace_id"), "audit_path": audit.get("path")})
+        return out
+    return {"ok": False, "status": rec["status"], "approval_id": rec["approval_id"]}
+
+
+def _check_batch(approval_code: str, decision: str) -> Optional[dict]:
+    """Why a bulk completion must be refused as a whole, if it must."""
+    if decision not in ("approved", "denied"):
+        return {"ok": False, "error": "decision must be 'approved' or 'denied'", "completed": [], "skipped": []}
+    if approval_code != os.environ.get("APPROVAL_CODE", DEFAULT_APPROVAL_CODE):
+        # Unlike require_approval, a wrong code does not deny: it would deny the whole batch
+        return {"ok": False, "error": "invalid approval_code; nothing was completed", "completed": [], "skipped": []}
+    return None
+
+
+def _submit_batch(dry_run_ids: List[str], decision: str) -> Tuple[dict, list]:
+    recs, skipped, fut = submit_completions(dry_run_ids, decision)
+    events = [{"action": "approval", "ok": True, "note": f"dry_run_id={r['dry_run_id']}", "approval_id": r["approval_id"]}
+              for r in recs] if decision == "approved" else []
+    trace_ids, afut = _audit_submit_many(events)
+    completed = [{"dry_run_id": r["dry_run_id"], "approval_id": r["approval_id"]} for r in recs]
+    for c, trace_id in zip(completed, trace_ids):
+        c["trace_id"] = trace_id
+    return {"ok": True, "status": decision, "completed": completed, "skipped": skipped}, [fut, afut]
 
 # ---- Core functions (also exposed as MCP tools) ----
 
@@ -46,63 +96,102 @@ def require_approval(dry_run_id: str, approval_code: Optional[str] = None) -> di
     - Call without approval_code → records a PENDING approval and returns approval_required.
     - Call with correct code → records an APPROVED entry and returns ok=True.
     """
-    provided = approval_code if approval_code is not None else ""
-    correct_code = os.environ.get("APPROVAL_CODE", DEFAULT_APPROVAL_CODE)
+    entry, event = _plan_approval(dry_run_id, approval_code)
+    rec, fut = submit_approval(entry)
+    fut.result()
+    audit = _audit_write(event) if event is not None else None
+    return _approval_result(rec, audit)
 
-    if not provided:
-        # Phase 1: create pending record
-        approval_id = str(uuid.uuid4())
-        _append_approval({"status": "pending", "dry_run_id": dry_run_id, "approval_id": approval_id})
-        return {
-            "ok": False,
-            "status": "pending",
-            "approval_required": True,
-            "approval_id": approval_id,
-            "hint": "Call require_approval again with approval_code.",
-            "code_set": False,
-        }
-
-    if provided == correct_code:
-        # Approved
-        approval_id = str(uuid.uuid4())
-        rec = _append_approval({"status": "approved", "dry_run_id": dry_run_id, "approval_id": approval_id})
-        audit = _audit_write({
-            "action": "approval",
-            "ok": True,
-            "note": f"dry_run_id={dry_run_id}",
-        })
-        out = {"ok": True, "status": rec["status"], "approval_id": approval_id}
-        out.update({"trace_id": audit.get("trace_id"), "audit_path": audit.get("path")})
-        return out
-
-    # Wrong code → denied
-    approval_id = str(uuid.uuid4())
-    rec = _append_approval({"status": "denied", "dry_run_id": dry_run_id, "approval_id": approval_id})
-    return {"ok": False, "status": rec["status"], "approval_id": approval_id}
 
-def guard_check(tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None) -> dict:
+def complete_approvals(dry_run_ids: List[str], approval_code: str, decision: str = "approved") -> dict:
+    """Approve (or deny) many pending dry_run_ids in one call.
+    Ids that are not pending are returned under `skipped`; the approval records and
+    audit events of the rest are each written as one grouped append.
+    """
+    error = _check_batch(approval_code, decision)
+    if error is not None:
+        return error
+    out, futures = _submit_batch(dry_run_ids, decision)
+    for f in futures:
+        f.result()
+    return out
+
+def guard_check(tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None, meta: Optional[dict] = None) -> dict:
     """Policy decision for a prospective tool call."""
-    return _guard_evaluate(tool, amount_cents=amount_cents, op=op)
+    return _guard_evaluate(tool, amount_cents=amount_cents, op=op, meta=meta)
 
 
 def firewall_enforce(tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None, meta: Optional[dict] = None) -> dict:
     return _enforce(tool, amount_cents=amount_cents, op=op, meta=meta)
 
 
+# ---- Async variants (registered as the MCP tools) ----
+# Enforce decisions run in a worker thread (see enforcer.enforce_async); audit/approval
+# appends go to the background writer, so many tool calls can be in flight at once.
+
+async def audit_write_async(action: str, tool: Optional[str] = None, ok: Optional[bool] = None, note: Optional[str] = None) -> dict:
+    """Append an audit event; returns {ok, trace_id, path}."""
+    info = await _audit_write_async({"action": action, "tool": tool, "ok": ok, "note": note})
+    return {"ok": True, **info}
+
+
+async def require_approval_async(dry_run_id: str, approval_code: Optional[str] = None) -> dict:
+    """Two-phase approval simulation.
+    - Call without approval_code → records a PENDING approval and returns approval_required.
+    - Call with correct code → records an APPROVED entry and returns ok=True.
+    """
+    entry, event = _plan_approval(dry_run_id, approval_code)
+    rec, fut = submit_approval(entry)
+    futures = [fut]
+    audit = None
+    if event is not None:
+        audit, afut = _audit_submit(event)
+        futures.append(afut)
+    await _wait(*futures)
+    return _approval_result(rec, audit)
+
+
+async def complete_approvals_async(dry_run_ids: List[str], approval_code: str, decision: str = "approved") -> dict:
+    """Approve (or deny) many pending dry_run_ids in one call.
+    Ids that are not pending are returned under `skipped`; the rest are written as one grouped append.
+    """
+    error = _check_batch(approval_code, decision)
+    if error is not None:
+        return error
+    out, futures = _submit_batch(dry_run_ids, decision)
+    await _wait(*futures)
+    return out
+
+
+async def guard_check_async(tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None, meta: Optional[dict] = None) -> dict:
+    """Policy decision for a prospective tool call."""
+    return _guard_evaluate(tool, amount_cents=amount_cents, op=op, meta=meta)
+
+
+async def firewall_enforce_async(tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None, meta: Optional[dict] = None) -> dict:
+    """Unified decision: policy evaluation + audit + pending approval when required."""
+    return await _enforce_async(tool, amount_cents=amount_cents, op=op, meta=meta)
+
+
 # ---- Create MCP server and register tools ----
 mcp = FastMCP(
     "mcp-firewall",
     version="0.2.0",
-    instructions="Guard tools for MCP: policy_get, audit_write, require_approval, guard_check, firewall_enforce",
+    instructions="Guard tools for MCP: policy_get, audit_write, require_approval, complete_approvals, guard_check, firewall_enforce",
 )
 
 mcp.tool(policy_get)
-mcp.tool(audit_write)
-mcp.tool(require_approval)
-mcp.tool(guard_check)
-mcp.tool(firewall_enforce)
+mcp.tool(audit_write_async, name="audit_write")
+mcp.tool(require_approval_async, name="require_approval")
+mcp.tool(complete_approvals_async, name="complete_approvals")
+mcp.tool(guard_check_async, name="guard_check")
+mcp.tool(firewall_enforce_async, name="firewall_enforce")
 
 
 if __name__ == "__main__":
+    _audit_config()  # bad AUDIT_* settings fail here, not on the first tool call
+    # Pre-compile the policy before serving so the first tool call is warm
+    load_compiled_policy()
+    rebuild_windows()  # window_cap_cents totals from the audit log
     # Run as an MCP stdio server
-    mcp.run()
\ No newline at end of file
+    mcp.run()
@@ -0,0 +1,161 @@
+"""
+Admission control for enforce traffic (/guard/enforce, /forward/*).
+
+At most `max_inflight` decisions run at once; up to `max_queue` more wait, each for at
+most `queue_timeout_s`, and are admitted first come, first served as slots free up.
+Anything beyond that is shed at once with a fail-closed decision ('blocked', or
+'pending' with no approval created) marked `shed: true`, so a stalled audit disk or a
+traffic spike degrades into fast refusals instead of requests hanging until timeouts.
+Shed calls are not audited (the audit path is what is likely saturated); they are
+counted in stats() instead, along with queue-wait times.
+
+Configured from the environment when the app is built:
+  ADMISSION_MAX_INFLIGHT (256), ADMISSION_MAX_QUEUE (512),
+  ADMISSION_QUEUE_TIMEOUT_MS (250), ADMISSION_SHED_STATUS (blocked | pending)
+
+Slots are tracked under a thread lock and handed to waiters with
+call_soon_threadsafe, so one gate works across event loops (e.g. test clients).
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+SHED_STATUSES = ("blocked", "pending")
+# Upper bounds (ms) of the queue-wait histogram buckets; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_Waiter = Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]
+
+
+def _grant(fut: "asyncio.Future[None]") -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class Admission:
+    def __init__(self, max_inflight: int = 256, max_queue: int = 512, queue_timeout_s: float = 0.25, shed_status: str = "blocked") -> None:
+        if shed_status not in SHED_STATUSES:
+            raise ValueError(f"shed_status must be one of {SHED_STATUSES}, got {shed_status!r}")
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.shed_status = shed_status
+        self.inflight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.queued = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.wait_hist: List[int] = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    @classmethod
+    def from_env(cls) -> "Admission":
+        return cls(
+            max_inflight=int(os.environ.get("ADMISSION_MAX_INFLIGHT") or 256),
+            max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE") or 512),
+            queue_timeout_s=int(os.environ.get("ADMISSION_QUEUE_TIMEOUT_MS") or 250) / 1000,
+            shed_status=os.environ.get("ADMISSION_SHED_STATUS") or "blocked",
+        )
+
+    async def acquire(self) -> bool:
+        """Take a slot, queueing if needed; False means the call was shed (no slot held)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.inflight < self.max_inflight and not self._waiters:
+                self.inflight += 1
+                self.admitted += 1
+                return True
+            if len(self._waiters) >= self.max_queue:
+                self.shed_queue_full += 1
+                return False
+            entry: _Waiter = (loop, loop.create_future())
+            self._waiters.append(entry)
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(entry[1], self.queue_timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                try:
+                    self._waiters.remove(entry)
+                except ValueError:  # a slot was handed over just as we gave up; we hold it
+                    owned = True
+                else:
+                    owned = False
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.shed_timeout += 1
+            if isinstance(e, asyncio.CancelledError):
+                if owned:
+                    self.release()
+                raise
+            if not owned:
+                return False
+        self._record_wait(time.perf_counter() - t0)
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                loop, fut = self._waiters.popleft()  # the slot passes straight to the oldest waiter
+                loop.call_soon_threadsafe(_grant, fut)
+            else:
+                self.inflight -= 1
+
+    def _record_wait(self, wait_s: float) -> None:
+        ms = wait_s * 1000
+        i = 0
+        while i < len(WAIT_BUCKETS_MS) and ms > WAIT_BUCKETS_MS[i]:
+            i += 1
+        with self._lock:
+            self.admitted += 1
+            self.queued += 1
+            self.wait_total_s += wait_s
+            self.wait_max_s = max(self.wait_max_s, wait_s)
+            self.wait_hist[i] += 1
+
+    def shed_result(self) -> Dict[str, Any]:
+        """The fail-closed decision returned for a shed call (EnforceResult shape)."""
+        return {
+            "allowed": False,
+            "approval_required": self.shed_status == "pending",
+            "status": self.shed_status,
+            "reasons": ["Server overloaded; request shed without evaluation (fail-closed)"],
+            "shed": True,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"le_{b}ms" for b in WAIT_BUCKETS_MS] + ["gt_%dms" % WAIT_BUCKETS_MS[-1]]
+            return {
+                "max_inflight": self.max_inflight,
+                "max_queue": self.max_queue,
+                "queue_timeout_ms": round(self.queue_timeout_s * 1000),
+                "shed_status": self.shed_status,
+                "inflight": self.inflight,
+                "waiting": len(self._waiters),
+                "admitted": self.admitted,
+                "shed": {"queue_full": self.shed_queue_full, "timeout": self.shed_timeout},
+                "queue_wait_ms": {
+                    "count": self.queued,
+                    "mean": round(self.wait_total_s * 1000 / self.queued, 3) if self.queued else 0.0,
+                    "max": round(self.wait_max_s * 1000, 3),
+                    "histogram": dict(zip(labels, self.wait_hist)),
+                },
+            }
+
+
+async def admitted(gate: Optional[Admission], call: Any) -> Dict[str, Any]:
+    """Await `call()` (an enforce coroutine factory) under `gate`; shed calls get gate.shed_result()."""
+    if gate is None:
+        return await call()
+    if not await gate.acquire():
+        return gate.shed_result()
+    try:
+        return await call()
+    finally:
+        gate.release()
@@ -1,12 +1,88 @@
 import json
 import os
-from typing import Dict, List, Optional
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .ids import find_line, stamp
+from .records import ApprovalRecord
+from .writer import append_lines
+
+# Which dry_run_ids are pending, per approvals log, kept in memory for bulk completion.
+# Each use reads only the lines appended since the last one (by any process); a log
+# that shrank (rotated or replaced) is read again from the start. Only pending ids are
+# held, plus the last RECENT_DONE completed ones so a repeated batch can say why it
+# skipped them; memory follows the approvals still open, not the log's history.
+RECENT_DONE = 10_000
+
+
+class _StatusIndex:
+    __slots__ = ("offset", "pending", "done")
+
+    def __init__(self) -> None:
+        self.offset = 0
+        self.pending: Set[str] = set()
+        self.done: "OrderedDict[str, str]" = OrderedDict()  # dry_run_id -> status, oldest first
+
+    def set(self, did: str, status: Any) -> None:
+        if status == "pending":
+            self.pending.add(did)
+            self.done.pop(did, None)
+            return
+        self.pending.discard(did)
+        self.done[did] = sys.intern(status) if isinstance(status, str) else str(status)
+        self.done.move_to_end(did)
+        if len(self.done) > RECENT_DONE:
+            self.done.popitem(last=False)
+
+    def status(self, did: str) -> Optional[str]:
+        return "pending" if did in self.pending else self.done.get(did)
+
+
+_STATUS: Dict[str, _StatusIndex] = {}  # path -> index
+_STATUS_LOCK = threading.Lock()
 
 
 def _approvals_path() -> str:
     return os.environ.get("APPROVALS_PATH", "approvals.log")
 
 
+def submit_approval(entry: Dict[str, Any]) -> Tuple[Dict[str, Any], "Future[int]"]:
+    """Stamp an approval record and queue it on the background writer."""
+    rec = dict(entry)
+    ms = time.time_ns() // 1_000_000
+    rec["ts"] = ms // 1000
+    rec["ts_ms"] = ms
+    return rec, append_lines(_approvals_path(), [json.dumps(rec) + "\n"])
+
+
+def append_approval(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Append an approval record to APPROVALS_PATH (resolved at call time)."""
+    rec, fut = submit_approval(entry)
+    fut.result()
+    return rec
+
+
+def iter_approvals(path: Optional[str] = None) -> Iterator[ApprovalRecord]:
+    p = path or _approvals_path()
+    if not os.path.exists(p):
+        return
+    with open(p, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = ApprovalRecord.from_dict(json.loads(line))
+            except Exception:
+                # Skip malformed lines
+                continue
+            yield rec
+
+
 def read_approvals(path: Optional[str] = None) -> List[Dict]:
     p = path or _approvals_path()
     records: List[Dict] = []
@@ -26,8 +102,19 @@ def read_approvals(path: Optional[str] = None) -> List[Dict]:
     return records
 
 
-def _summarize_by_dry_run_id(records: List[Dict]) -> List[Dict]:
-    by_id: Dict[str, Dict] = {}
+def read_approval_records(path: Optional[str] = None) -> List[ApprovalRecord]:
+    """Like read_approvals(), but as compact ApprovalRecords for callers holding many lines."""
+    return list(iter_approvals(path))
+
+
+def find_approval(approval_id: str, path: Optional[str] = None) -> Optional[Dict]:
+    """The approval record with this approval_id; binary-searches the log by the ID's timestamp."""
+    line = find_line(path or _approvals_path(), "approval_id", approval_id)
+    return json.loads(line) if line is not None else None
+
+
+def _summarize_by_dry_run_id(records: Iterable[ApprovalRecord]) -> List[ApprovalRecord]:
+    by_id: Dict[str, ApprovalRecord] = {}
     for r in records:
         did = r.get("dry_run_id")
         if not did:
@@ -39,11 +126,73 @@ def _summarize_by_dry_run_id(records: List[Dict]) -> List[Dict]:
 
 
 def list_approvals(path: Optional[str] = None) -> List[Dict]:
-    return _summarize_by_dry_run_id(read_approvals(path))
+    # Streamed: superseded records are dropped as the log is read, never all held at once
+    return [r.to_dict() for r in _summarize_by_dry_run_id(iter_approvals(path))]
 
 
 def list_pending(path: Optional[str] = None) -> List[Dict]:
-    return [r for r in list_approvals(path) if r.get("status") == "pending"]
+    return [r.to_dict() for r in _summarize_by_dry_run_id(iter_approvals(path)) if r.get("status") == "pending"]
+
+
+def _statuses(path: str) -> _StatusIndex:
+    index = _STATUS.get(path)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if index is None or size < index.offset:
+        index = _STATUS[path] = _StatusIndex()
+    if size > index.offset:
+        with open(path, "rb") as f:
+            f.seek(index.offset)
+            data = f.read(size - index.offset)
+        end = data.rfind(b"\n") + 1  # a line still being written waits for the next read
+        for line in data[:end].splitlines():
+            try:
+                rec = json.loads(line)
+                did = rec.get("dry_run_id")
+            except Exception:
+                continue
+            if did and isinstance(did, str):
+                index.set(did, rec.get("status"))
+        index.offset += end
+    return index
+
+
+def _restore_pending(index: _StatusIndex, dids: List[str], fut: "Future[int]") -> None:
+    # The grouped append failed: those ids were never completed, so they are pending again.
+    # Every one is restored, including ids a batch over RECENT_DONE already pushed out of
+    # `done`; none can have been claimed since, as only pending ids are completed.
+    if fut.exception() is None:
+        return
+    with _STATUS_LOCK:
+        for did in dids:
+            if did not in index.pending:
+                index.set(did, "pending")
+
+
+def submit_completions(dry_run_ids: Iterable[str], status: str, path: Optional[str] = None) -> Tuple[List[Dict], List[Dict], "Future[int]"]:
+    """Record `status` (approved/denied) for every dry_run_id that is still pending, as one
+    grouped append. Returns (records, skipped [{dry_run_id, reason}], future)."""
+    p = path or _approvals_path()
+    records: List[Dict] = []
+    skipped: List[Dict] = []
+    with _STATUS_LOCK:  # two batches racing for the same ids: only the first completes them
+        index = _statuses(p)
+        for did in dict.fromkeys(dry_run_ids):
+            current = index.status(did)
+            if current != "pending":
+                skipped.append({"dry_run_id": did, "reason": f"already {current}" if current else "unknown dry_run_id"})
+                continue
+            approval_id, ms = stamp()
+            records.append({"status": status, "dry_run_id": did, "approval_id": approval_id, "ts": ms // 1000, "ts_ms": ms})
+            index.set(did, status)
+        if records:
+            fut = append_lines(p, [json.dumps(r) + "\n" for r in records])
+        else:
+            fut = Future()
+            fut.set_result(0)
+    if records:  # outside the lock: the callback takes it, and may run right here
+        dids = [r["dry_run_id"] for r in records]
+        fut.add_done_callback(lambda f: _restore_pending(index, dids, f))
+    return records, skipped, fut
 
 
 def complete_approval(dry_run_id: str, code: str) -> Dict:
@@ -51,4 +200,10 @@ def complete_approval(dry_run_id: str, code: str) -> Dict:
     Returns a dict with keys including ok, status, approval_id (and possibly trace info).
     """
     from mcp_server import require_approval  # local import to avoid cycles
-    return require_approval(dry_run_id, approval_code=code)
\ No newline at end of file
+    return require_approval(dry_run_id, approval_code=code)
+
+
+def complete_approvals(dry_run_ids: List[str], code: str, decision: str = "approved") -> Dict:
+    """Approve or deny many pending approvals at once via mcp_server.complete_approvals."""
+    from mcp_server import complete_approvals  # local import to avoid cycles
+    return complete_approvals(dry_run_ids, approval_code=code, decision=decision)
@@ -0,0 +1,367 @@
+"""
+Columnar audit archive and vectorized analytics over it.
+
+archive() converts the closed part of audit.log (every complete line past the offset
+archived last time) into segment files under an archive directory:
+
+    manifest.json                        source, archived offset, segment list + ts ranges
+    seg-<start>-<end>.npz | .parquet     one per MAX_SEGMENT_ROWS records
+
+Each segment holds typed columns: ts (int64), amount_cents (int64, the total amount the
+record stands for, 0 when absent), amount_valid (bool), calls (int64, see
+audit.calls_in) and dictionary-encoded action/tool/op/status/tenant columns (int32
+codes, -1 for null, plus the distinct values). Segments are .npz (NumPy) or, when
+pyarrow is installed, Parquet with dictionary columns.
+
+query() runs a group-by over the archive: segments outside the time range are skipped
+via the manifest, filters are resolved against each segment's dictionary once and
+applied as code masks, and groups are summed with sort + reduceat, so no JSON is
+parsed at query time. scan_jsonl() computes the same result from the raw log.
+
+Requires numpy; pyarrow is optional.
+"""
+import fnmatch
+import json
+import math
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .audit import calls_in
+from .logscan import closed_end
+from .records import AuditRecord
+
+DICT_COLUMNS = ("action", "tool", "op", "status", "tenant")
+MAX_SEGMENT_ROWS = 1_000_000
+MANIFEST = "manifest.json"
+FORMATS = ("auto", "npz", "parquet")
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_AGO_RE = re.compile(r"([0-9]+)([smhdw])\Z")
+
+Segment = Dict[str, np.ndarray]
+
+
+def parse_time(text: Optional[str], now: Optional[float] = None) -> Optional[int]:
+    """Epoch seconds, or a span back from now ('7d', '12h', '2w'); None passes through."""
+    if text is None:
+        return None
+    m = _AGO_RE.match(text)
+    if m is not None:
+        now = time.time() if now is None else now
+        return int(now) - int(m.group(1)) * _UNITS[m.group(2)]
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"expected epoch seconds or a span like 7d, got {text!r}") from None
+
+
+def _have_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ---- Writing ----
+
+def _rows(path: str, start: int, end: int) -> Iterator[Tuple[int, AuditRecord]]:
+    """(offset after the line, record) for each audit record in [start, end).
+    Records keep only the slotted fields: a segment buffers up to max_rows of them."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(rec, dict) and isinstance(rec.get("action"), str):
+                yield pos, AuditRecord.from_dict(rec, keep_extra=False)
+
+
+def _encode(recs: List[AuditRecord]) -> Segment:
+    n = len(recs)
+    ts = np.zeros(n, dtype=np.int64)
+    amount = np.zeros(n, dtype=np.int64)
+    valid = np.zeros(n, dtype=bool)
+    calls = np.zeros(n, dtype=np.int64)
+    codes = {c: np.full(n, -1, dtype=np.int32) for c in DICT_COLUMNS}
+    lookups: Dict[str, Dict[str, int]] = {c: {} for c in DICT_COLUMNS}
+    for i, rec in enumerate(recs):
+        t = rec.get("ts")
+        if isinstance(t, int):
+            ts[i] = t
+        weight = calls_in(rec)
+        calls[i] = weight or 1
+        a = rec.get("amount_cents_sum") if rec["action"] == "enforce_rollup" else rec.get("amount_cents")
+        if isinstance(a, int) and not isinstance(a, bool):
+            amount[i] = a * weight if rec["action"] == "enforce" else a
+            valid[i] = True
+        for c in DICT_COLUMNS:
+            v = rec.get(c)
+            if v is None:
+                continue
+            if not isinstance(v, str):
+                v = json.dumps(v, sort_keys=True)
+            lookup = lookups[c]
+            code = lookup.get(v)
+            if code is None:
+                code = lookup[v] = len(lookup)
+            codes[c][i] = code
+    seg: Segment = {"ts": ts, "amount_cents": amount, "amount_valid": valid, "calls": calls}
+    for c in DICT_COLUMNS:
+        seg[f"{c}.codes"] = codes[c]
+        seg[f"{c}.values"] = np.array(list(lookups[c]), dtype=str)
+    return seg
+
+
+def _save(seg: Segment, path: str) -> None:
+    if path.endswith(".npz"):
+        np.savez_compressed(path, **seg)
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cols: Dict[str, Any] = {
+        "ts": pa.array(seg["ts"]),
+        "amount_cents": pa.array(seg["amount_cents"], mask=~seg["amount_valid"]),
+        "calls": pa.array(seg["calls"]),
+    }
+    for c in DICT_COLUMNS:
+        codes = seg[f"{c}.codes"]
+        indices = pa.array(codes, mask=codes < 0)
+        cols[c] = pa.DictionaryArray.from_arrays(indices, pa.array(seg[f"{c}.values"].tolist(), pa.string()))
+    pq.write_table(pa.table(cols), path)
+
+
+def _load(path: str, columns: Optional[List[str]] = None) -> Segment:
+    """Read a segment; `columns` (ts, amount_cents, calls or a DICT_COLUMNS name) limits what is decoded."""
+    if path.endswith(".npz"):
+        with np.load(path) as z:
+            if columns is None:
+                return {k: z[k] for k in z.files}
+            keys = [k for c in columns for k in ((f"{c}.codes", f"{c}.values") if c in DICT_COLUMNS else (c,))]
+            return {k: z[k] for k in keys}
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=columns)
+    seg: Segment = {}
+    for c in table.column_names:
+        col = table.column(c).combine_chunks()
+        if c in DICT_COLUMNS:
+            seg[f"{c}.codes"] = col.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int32)
+            seg[f"{c}.values"] = np.array(col.dictionary.to_pylist(), dtype=str)
+        elif c == "amount_cents":
+            seg[c] = col.fill_null(0).to_numpy()
+            seg["amount_valid"] = col.is_valid().to_numpy(zero_copy_only=False)
+        else:
+            seg[c] = col.to_numpy()
+    return seg
+
+
+def _read_manifest(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"source": None, "offset": 0, "segments": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def archive(audit_path: str, out_dir: str, fmt: str = "auto", max_rows: int = MAX_SEGMENT_ROWS) -> Dict[str, Any]:
+    """Append the audit log's complete lines past the last archived offset as new segments.
+    Returns {segments: [new segment entries], rows, offset}."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    if fmt == "auto":
+        fmt = "parquet" if _have_pyarrow() else "npz"
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _read_manifest(out_dir)
+    source = os.path.abspath(audit_path)
+    if manifest["source"] not in (None, source):
+        raise ValueError(f"{out_dir} archives {manifest['source']}, not {source}")
+    start = manifest["offset"]
+    if os.path.getsize(audit_path) < start:
+        raise ValueError(f"{audit_path} is shorter than the archived offset {start}; was it rotated? Use a new archive directory")
+    end = closed_end(audit_path, start)  # a line still being appended stays for next time
+
+    added: List[Dict[str, Any]] = []
+    recs: List[AuditRecord] = []
+    seg_start = start
+
+    def _flush(seg_end: int) -> None:
+        if not recs:
+            return
+        seg = _encode(recs)
+        name = f"seg-{seg_start:012d}-{seg_end:012d}.{'npz' if fmt == 'npz' else 'parquet'}"
+        _save(seg, os.path.join(out_dir, name))
+        added.append({"file": name, "start": seg_start, "end": seg_end, "rows": len(recs),
+                      "ts_min": int(seg["ts"].min()), "ts_max": int(seg["ts"].max())})
+        recs.clear()
+
+    for pos, rec in _rows(audit_path, start, end):
+        recs.append(rec)
+        if len(recs) >= max_rows:
+            _flush(pos)
+            seg_start = pos
+    _flush(end)
+
+    manifest.update(source=source, offset=end, segments=manifest["segments"] + added)
+    tmp = os.path.join(out_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))  # segments first, then the manifest that names them
+    return {"segments": added, "rows": sum(s["rows"] for s in added), "offset": end}
+
+
+# ---- Querying ----
+
+def _check_columns(group_by: List[str], where: Dict[str, str]) -> None:
+    for c in list(group_by) + list(where):
+        if c not in DICT_COLUMNS:
+            raise ValueError(f"unknown column {c!r}; choose from {', '.join(DICT_COLUMNS)}")
+
+
+def _matching(values: np.ndarray, pattern: str) -> np.ndarray:
+    """Codes whose value equals `pattern`, or matches it when it is a glob."""
+    if any(ch in pattern for ch in "*?["):
+        hits = [i for i, v in enumerate(values.tolist()) if fnmatch.fnmatchcase(v, pattern)]
+    else:
+        hits = [i for i, v in enumerate(values.tolist()) if v == pattern]
+    return np.array(hits, dtype=np.int32)
+
+
+def _select(seg: Segment, where: Dict[str, str], since: Optional[int], until: Optional[int]) -> np.ndarray:
+    mask = np.ones(len(seg["ts"]), dtype=bool)
+    if since is not None:
+        mask &= seg["ts"] >= since
+    if until is not None:
+        mask &= seg["ts"] < until
+    for c, pattern in where.items():
+        mask &= np.isin(seg[f"{c}.codes"], _matching(seg[f"{c}.values"], pattern))
+    return mask
+
+
+def _ordered(rows: List[Dict[str, Any]], group_by: List[str]) -> List[Dict[str, Any]]:
+    rows.sort(key=lambda r: (-r["calls"], [(r[c] is not None, r[c] or "") for c in group_by]))
+    return rows
+
+
+def query(
+    out_dir: str,
+    group_by: List[str],
+    where: Optional[Dict[str, str]] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Group archived records by `group_by` columns and return, per group, records,
+    calls and amount_cents (sum), largest calls first. `where` maps columns to values
+    or globs; since/until bound ts as [since, until)."""
+    where = where or {}
+    _check_columns(group_by, where)
+    manifest = _read_manifest(out_dir)
+    needed = ["ts", "calls", "amount_cents"] + sorted(set(group_by) | set(where))
+    dicts: Dict[str, Tuple[List[str], Dict[str, int]]] = {c: ([], {}) for c in group_by}
+    parts: Dict[str, List[np.ndarray]] = {k: [] for k in ["calls", "amount_cents"] + list(group_by)}
+    for s in manifest["segments"]:
+        if (since is not None and s["ts_max"] < since) or (until is not None and s["ts_min"] >= until):
+            continue
+        seg = _load(os.path.join(out_dir, s["file"]), needed)
+        mask = _select(seg, where, since, until)
+        if not mask.any():
+            continue
+        parts["calls"].append(seg["calls"][mask])
+        parts["amount_cents"].append(seg["amount_cents"][mask])
+        for c in group_by:
+            # Re-code the segment dictionary into the query-wide one; index -1 (null) maps to -1
+            values, index = dicts[c]
+            lut = np.empty(len(seg[f"{c}.values"]) + 1, dtype=np.int64)
+            for i, v in enumerate(seg[f"{c}.values"].tolist()):
+                code = index.get(v)
+                if code is None:
+                    code = index[v] = len(values)
+                    values.append(v)
+                lut[i] = code
+            lut[-1] = -1
+            parts[c].append(lut[seg[f"{c}.codes"][mask]])
+    if not parts["calls"]:
+        return []
+    calls = np.concatenate(parts["calls"])
+    amount = np.concatenate(parts["amount_cents"])
+
+    # Group on the (code + 1) of each column, so null is its own group
+    radices = [len(dicts[c][0]) + 1 for c in group_by]
+    key, decode = _group_ids([np.concatenate(parts[c]) + 1 for c in group_by], radices, len(calls))
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    counts = np.diff(np.r_[starts, len(key)])
+    call_sums = np.add.reduceat(calls[order], starts)
+    amount_sums = np.add.reduceat(amount[order], starts)
+
+    rows = []
+    for k, n, nc, amt in zip(key[starts].tolist(), counts.tolist(), call_sums.tolist(), amount_sums.tolist()):
+        row: Dict[str, Any] = {c: dicts[c][0][code - 1] if code else None for c, code in zip(group_by, decode(k))}
+        rows.append({**row, "records": n, "calls": nc, "amount_cents": amt})
+    return _ordered(rows, group_by)
+
+
+def _group_ids(codes: List[np.ndarray], radices: List[int], n: int) -> Tuple[np.ndarray, Callable[[int], List[int]]]:
+    """One int64 id per row for its combination of codes (each below its radix), and a
+    decoder from id back to codes. The id is a mixed-radix number while the product of
+    the radices fits in int64; past that it would wrap and merge groups, so the distinct
+    code rows are numbered with np.unique instead."""
+    if math.prod(radices) <= np.iinfo(np.int64).max:
+        key = np.zeros(n, dtype=np.int64)
+        for col, radix in zip(codes, radices):
+            key = key * radix + col
+
+        def mixed_radix(k: int) -> List[int]:
+            out = []
+            for radix in reversed(radices):
+                k, code = divmod(k, radix)
+                out.append(code)
+            return out[::-1]
+        return key, mixed_radix
+    combos, inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+    rows = combos.tolist()
+    return inverse.reshape(-1).astype(np.int64), lambda k: rows[k]
+
+
+def scan_jsonl(
+    audit_path: str,
+    group_by: List[str],
+    where: Optional[Dict[str, str]] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """query() computed by parsing the raw JSONL log line by line (reference and baseline)."""
+    where = where or {}
+    _check_columns(group_by, where)
+    acc: Dict[Tuple[Any, ...], List[int]] = {}
+    for _, rec in _rows(audit_path, 0, os.path.getsize(audit_path)):
+        ts = rec.get("ts")
+        ts = ts if isinstance(ts, int) else 0
+        if (since is not None and ts < since) or (until is not None and ts >= until):
+            continue
+        vals = {c: (v if isinstance(v, str) or v is None else json.dumps(v, sort_keys=True))
+                for c, v in ((c, rec.get(c)) for c in DICT_COLUMNS)}
+        if any(vals[c] is None or not fnmatch.fnmatchcase(str(vals[c]), p) for c, p in where.items()):
+            continue
+        weight = calls_in(rec)
+        a = rec.get("amount_cents_sum") if rec["action"] == "enforce_rollup" else rec.get("amount_cents")
+        amount = (a * weight if rec["action"] == "enforce" else a) if isinstance(a, int) and not isinstance(a, bool) else 0
+        g = acc.setdefault(tuple(vals[c] for c in group_by), [0, 0, 0])
+        g[0] += 1
+        g[1] += weight or 1
+        g[2] += amount
+    rows = [{**dict(zip(group_by, k)), "records": n, "calls": nc, "amount_cents": amt} for k, (n, nc, amt) in acc.items()]
+    return _ordered(rows, group_by)
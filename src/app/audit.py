@@ -1,23 +1,222 @@
+import atexit
 import json
 import os
+import threading
 import time
-import uuid
-from typing import Dict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import chain
+from .ids import find_line, stamp
+from .records import RecordLike
+from .writer import append_lines
+from .writer import wait as _wait
+
+# AUDIT_MODE controls how allowed 'enforce' records are written (read at call time):
+#   full       every record (default)
+#   sample     1 in AUDIT_SAMPLE_N per (tenant, tool, op), starting with the first;
+#              written records carry sample_rate=N so counts scale back up
+#   aggregate  rolled up per (tenant, tool, op, status) into one 'enforce_rollup'
+#              record {count, amount_cents_sum, since, ts} every AUDIT_ROLLUP_S seconds
+# Blocked and pending decisions, and allowed records carrying a window_key (needed to
+# rebuild window_cap_cents totals), are always written in full. The settings are
+# validated by config(), which the servers call at startup so bad values fail there.
+AUDIT_MODES = ("full", "sample", "aggregate")
+MAX_SAMPLE_KEYS = 100_000
+
+_GroupKey = Tuple[Any, ...]
+
+_SAMPLED: Dict[_GroupKey, int] = {}
+_ROLLUP: Dict[_GroupKey, List[int]] = {}  # key -> [count, amount_cents_sum, first ts]
+_ROLLUP_PATH: Optional[str] = None
+_LOCK = threading.Lock()
+_CONFIG: List[Any] = [None, None]  # [raw env values, parsed config()]
 
 
 def _audit_path() -> str:
     return os.environ.get("AUDIT_PATH", "audit.log")
 
 
-def write(event: Dict) -> Dict:
-    """Append an audit event as a JSONL record.
-    Uses AUDIT_PATH env at *call time* for test isolation.
+def config() -> Tuple[str, int, float]:
+    """(AUDIT_MODE, AUDIT_SAMPLE_N, AUDIT_ROLLUP_S), parsed once per distinct set of values.
+    Raises ValueError for an unknown mode, N < 1 or a non-positive rollup period."""
+    raw = (os.environ.get("AUDIT_MODE") or "full", os.environ.get("AUDIT_SAMPLE_N") or "100",
+           os.environ.get("AUDIT_ROLLUP_S") or "60")
+    if _CONFIG[0] == raw:
+        return _CONFIG[1]
+    mode, n, period = raw
+    if mode not in AUDIT_MODES:
+        raise ValueError(f"AUDIT_MODE must be one of {', '.join(AUDIT_MODES)}, got {mode!r}")
+    try:
+        sample_n = int(n)
+    except ValueError:
+        sample_n = 0
+    if sample_n < 1:
+        raise ValueError(f"AUDIT_SAMPLE_N must be an integer >= 1, got {n!r}")
+    try:
+        rollup_s = float(period)
+    except ValueError:
+        rollup_s = 0.0
+    if not rollup_s > 0:
+        raise ValueError(f"AUDIT_ROLLUP_S must be a number of seconds > 0, got {period!r}")
+    _CONFIG[:] = [raw, (mode, sample_n, rollup_s)]
+    return _CONFIG[1]
+
+
+def _done() -> "Future[int]":
+    fut: "Future[int]" = Future()
+    fut.set_result(0)
+    return fut
+
+
+def _reduce(rec: Dict, path: str) -> Optional[Dict]:
+    """Apply AUDIT_MODE to a finished record: returns it (maybe tagged) or None if absorbed."""
+    if rec.get("status") != "allowed" or rec.get("action") != "enforce" or "window_key" in rec:
+        return rec
+    mode, n, _ = config()
+    if mode == "sample":
+        key = (path, rec.get("tenant"), rec.get("tool"), rec.get("op"))
+        with _LOCK:
+            if len(_SAMPLED) >= MAX_SAMPLE_KEYS:
+                _SAMPLED.clear()
+            seen = _SAMPLED.get(key, 0)
+            _SAMPLED[key] = seen + 1
+        if seen % n:
+            return None
+        rec["sample_rate"] = n
+        return rec
+    if mode == "aggregate":
+        _absorb(rec, path)
+        return None
+    return rec
+
+
+def _absorb(rec: Dict, path: str) -> None:
+    global _ROLLUP_PATH
+    amount = rec.get("amount_cents")
+    key = (rec.get("tenant"), rec.get("tool"), rec.get("op"), rec["status"])
+    with _LOCK:
+        if _ROLLUP_PATH is not None and _ROLLUP_PATH != path:
+            _flush_locked()
+        if not _ROLLUP:
+            # First record of a new period: schedule its flush
+            timer = threading.Timer(config()[2], flush_rollups)
+            timer.daemon = True
+            timer.start()
+        _ROLLUP_PATH = path
+        acc = _ROLLUP.get(key)
+        if acc is None:
+            acc = _ROLLUP[key] = [0, 0, rec["ts"]]
+        acc[0] += 1
+        if isinstance(amount, int):
+            acc[1] += amount
+
+
+def _rollup_lines() -> List[str]:
+    now = int(time.time())
+    lines = []
+    for (tenant, tool, op, status), (count, amount_sum, since) in _ROLLUP.items():
+        rec = {"action": "enforce_rollup", "tool": tool, "op": op, "status": status,
+               "count": count, "amount_cents_sum": amount_sum, "since": since, "ts": now}
+        if tenant is not None:
+            rec["tenant"] = tenant
+        lines.append(json.dumps(rec) + "\n")
+    _ROLLUP.clear()
+    return lines
+
+
+def _flush_locked() -> "Future[int]":
+    if not _ROLLUP or _ROLLUP_PATH is None:
+        return _done()
+    return append_lines(_ROLLUP_PATH, _rollup_lines(), chained=chain.enabled())
+
+
+def flush_rollups() -> "Future[int]":
+    """Write pending 'enforce_rollup' records now; the future yields how many were written."""
+    with _LOCK:
+        return _flush_locked()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    # The writer thread may already be gone at interpreter exit, so append directly
+    with _LOCK:
+        if _ROLLUP and _ROLLUP_PATH is not None:
+            path, lines = _ROLLUP_PATH, _rollup_lines()
+            if chain.enabled():
+                chain.append(path, lines)
+            else:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+
+
+def calls_in(rec: RecordLike) -> int:
+    """How many enforce calls an audit record stands for: 1, its sample_rate, or a rollup's
+    count; 0 for records of other actions."""
+    action = rec.get("action")
+    if action == "enforce":
+        n = rec.get("sample_rate", 1)
+    elif action == "enforce_rollup":
+        n = rec.get("count", 0)
+    else:
+        return 0
+    return n if isinstance(n, int) and n > 0 else 0
+
+
+def submit(event: Dict) -> Tuple[Dict, "Future[int]"]:
+    """Queue an audit event on the background writer.
+    Returns ({trace_id, path}, future) — the future resolves once the record is on disk
+    (at once if AUDIT_MODE sampled it out or rolled it up).
     """
-    trace_id = str(uuid.uuid4())
+    trace_id, ms = stamp()
     rec = dict(event)
-    rec["ts"] = int(time.time())
+    rec["ts"] = ms // 1000
+    rec["ts_ms"] = ms
     rec["trace_id"] = trace_id
     path = _audit_path()
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(rec) + "\n")
-    return {"trace_id": trace_id, "path": path}
\ No newline at end of file
+    kept = _reduce(rec, path)
+    fut = append_lines(path, [json.dumps(kept) + "\n"], chained=chain.enabled()) if kept is not None else _done()
+    return {"trace_id": trace_id, "path": path}, fut
+
+
+def submit_many(events: List[Dict]) -> Tuple[List[str], "Future[int]"]:
+    """Queue several audit events as one grouped append; returns (trace_ids, future).
+    Like submit(), every record gets its ts/ts_ms/trace_id on arrival: windows.rebuild()
+    and export.seek_ts() rely on ts following log order.
+    """
+    path = _audit_path()
+    trace_ids: List[str] = []
+    lines: List[str] = []
+    for event in events:
+        rec = dict(event)
+        trace_id, ms = stamp()
+        rec["ts"] = ms // 1000
+        rec["ts_ms"] = ms
+        rec["trace_id"] = trace_id
+        trace_ids.append(trace_id)
+        kept = _reduce(rec, path)
+        if kept is not None:
+            lines.append(json.dumps(kept) + "\n")
+    return trace_ids, append_lines(path, lines, chained=chain.enabled()) if lines else _done()
+
+
+def write(event: Dict) -> Dict:
+    """Append an audit event as a JSONL record.
+    Uses AUDIT_PATH env at *call time* for test isolation.
+    """
+    info, fut = submit(event)
+    fut.result()
+    return info
+
+
+async def write_async(event: Dict) -> Dict:
+    """Like write(), but waits for the background writer without blocking the event loop."""
+    info, fut = submit(event)
+    await _wait(fut)
+    return info
+
+
+def find_trace(trace_id: str, path: Optional[str] = None) -> Optional[Dict]:
+    """The audit record with this trace_id; binary-searches the log by the ID's timestamp."""
+    line = find_line(path or _audit_path(), "trace_id", trace_id)
+    return json.loads(line) if line is not None else None
@@ -0,0 +1,307 @@
+"""
+Tamper-evident audit log: every record is chained to the one before it by hash, and
+every AUDIT_CHECKPOINT_N records the writer appends an 'audit_checkpoint' record
+holding the Merkle root of that segment's record hashes.
+
+A sealed line is the original JSON object with one more field appended:
+
+    {..., "chain": "<32 hex>"}   chain = blake2b-128(previous chain + line without it)
+
+keyed with AUDIT_CHAIN_KEY when set, so the chain cannot be recomputed after an edit
+without the key. Sealing runs on the background writer thread, once per group-commit
+batch (append()), so request threads never hash. A file lock and a size check keep
+the chain intact when several processes append to the same log: a writer that finds
+the file grew behind its back re-reads the open segment before sealing.
+
+Each link only needs the previous line's stored hash, so verify() checks byte ranges
+of the log in parallel worker processes and stitches them together (links across
+range edges, Merkle roots of segments that span ranges). With a state file it resumes
+from the last verified checkpoint instead of re-reading history.
+"""
+import binascii
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .logscan import closed_end, lines_backward
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None  # type: ignore[assignment]
+
+GENESIS = "0" * 32
+CHECKPOINT_ACTION = "audit_checkpoint"
+MAX_ERRORS = 20
+RANGE_BYTES = 16 << 20
+
+_PREFIX = b', "chain": "'
+_SUFFIX_LEN = len(_PREFIX) + 32 + 2  # , "chain": "<32 hex>"}
+_CHECKPOINT = b'"action": "audit_checkpoint"'
+_HEX = frozenset(b"0123456789abcdef")
+
+
+def enabled() -> bool:
+    return (os.environ.get("AUDIT_CHAIN") or "1").lower() not in ("0", "false", "no", "off")
+
+
+def _key() -> bytes:
+    return (os.environ.get("AUDIT_CHAIN_KEY") or "").encode()
+
+
+def _checkpoint_every() -> int:
+    return max(1, int(os.environ.get("AUDIT_CHECKPOINT_N") or 10_000))
+
+
+def link(prev: bytes, body: bytes, key: bytes = b"") -> bytes:
+    """Hex chain hash of a line `body` (JSON object without the chain field) after `prev`."""
+    return hashlib.blake2b(prev + body, digest_size=16, key=key).hexdigest().encode()
+
+
+def merkle_root(leaves: bytes, key: bytes = b"") -> str:
+    """Merkle root (hex) over concatenated 16-byte leaf digests; an odd node is promoted."""
+    level = [leaves[i:i + 16] for i in range(0, len(leaves), 16)]
+    if not level:
+        return GENESIS
+    while len(level) > 1:
+        nxt = [hashlib.blake2b(level[i] + level[i + 1], digest_size=16, key=key).digest()
+               for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0].hex()
+
+
+def split(line: bytes) -> Optional[Tuple[bytes, bytes]]:
+    """(body, hash) of a sealed line (without its newline), or None if it carries no chain field."""
+    tail = line[-_SUFFIX_LEN:]
+    if len(line) <= _SUFFIX_LEN or not tail.startswith(_PREFIX) or tail[-2:] != b'"}':
+        return None
+    h = tail[len(_PREFIX):-2]
+    if not _HEX.issuperset(h):
+        return None
+    return line[:-_SUFFIX_LEN] + b"}", h
+
+
+class _State:
+    """Where one log's chain stands: the file size it was read at, the last hash and the
+    leaves (record hashes) of the segment not yet checkpointed."""
+
+    def __init__(self, size: int, last: bytes, leaves: bytearray) -> None:
+        self.size = size
+        self.last = last
+        self.leaves = leaves
+
+    def seal(self, lines: List[str], key: bytes, every: int) -> bytes:
+        out: List[bytes] = []
+        last, leaves = self.last, self.leaves
+        for line in lines:
+            body = line.encode()
+            d = hashlib.blake2b(last + body[:-1], digest_size=16, key=key).digest()
+            last = binascii.hexlify(d)
+            out.append(body[:-2] + _PREFIX + last + b'"}\n')
+            leaves += d
+            if len(leaves) >= every * 16:
+                cp = {"action": CHECKPOINT_ACTION, "records": len(leaves) // 16,
+                      "root": merkle_root(bytes(leaves), key), "ts": int(time.time())}
+                leaves = bytearray()
+                body = json.dumps(cp).encode()
+                last = link(last, body, key)
+                out.append(body[:-1] + _PREFIX + last + b'"}\n')
+        self.last, self.leaves = last, leaves
+        return b"".join(out)
+
+
+_STATES: Dict[str, _State] = {}
+
+
+def _recover(path: str, size: int) -> _State:
+    """Rebuild the chain state from the log's tail, reading back to the last checkpoint
+    (or to the first record written before chaining was turned on)."""
+    last: Optional[bytes] = None
+    leaves: List[bytes] = []
+    with open(path, "rb") as f:
+        lines = lines_backward(f, size)
+        f.seek(max(0, size - 1))
+        if size and f.read(1) != b"\n":
+            next(lines)  # a torn final line; the next append starts after it
+        for line in lines:
+            if not line:
+                continue
+            parts = split(line)
+            if parts is None:
+                break
+            if last is None:
+                last = parts[1]
+            if _CHECKPOINT in parts[0]:
+                break
+            leaves.append(bytes.fromhex(parts[1].decode()))
+    return _State(size, last or GENESIS.encode(), bytearray(b"".join(reversed(leaves))))
+
+
+def append(path: str, lines: List[str]) -> None:
+    """Seal `lines` (newline-terminated JSON objects) onto the chain of `path` and append them."""
+    key, every = _key(), _checkpoint_every()
+    with open(path, "ab") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(f.fileno()).st_size
+            state = _STATES.get(path)
+            if state is None or state.size != size:
+                state = _STATES[path] = _recover(path, size)
+            data = state.seal(lines, key, every)
+            state.size = -1  # unknown until the write lands
+            f.write(data)
+            f.flush()
+            state.size = size + len(data)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _ranges(path: str, start: int, end: int, parts: int) -> List[Tuple[int, int]]:
+    size = max(1 << 20, min(RANGE_BYTES, (end - start) // max(1, parts) + 1))
+    bounds = [start]
+    with open(path, "rb") as f:
+        while bounds[-1] + size < end:
+            f.seek(bounds[-1] + size)
+            f.readline()
+            if f.tell() >= end:
+                break
+            bounds.append(f.tell())
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _verify_range(path: str, start: int, end: int, key: bytes) -> Dict[str, Any]:
+    """Check every link inside [start, end) and the roots of segments wholly inside it.
+    The first link and segments crossing the edges are left to the caller (see verify())."""
+    res: Dict[str, Any] = {"start": start, "records": 0, "checkpoints": 0, "leading_unchained": 0,
+                           "first": None, "last": None, "head": None, "tail": b"", "last_checkpoint": None,
+                           "errors": []}
+    errors: List[Dict[str, Any]] = res["errors"]
+    leaves = bytearray()
+    prev: Optional[bytes] = None
+    closed = False  # a checkpoint was seen in this range, so `leaves` is a whole segment
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            raw = f.readline()
+            off, pos = pos, pos + len(raw)
+            line = raw.rstrip(b"\n")
+            parts = split(line)
+            if parts is None:
+                if prev is None:
+                    res["leading_unchained"] += 1
+                elif len(errors) < MAX_ERRORS:
+                    errors.append({"offset": off, "error": "record without a chain hash"})
+                continue
+            body, h = parts
+            if prev is None:
+                res["first"] = (off, body, h)
+            elif link(prev, body, key) != h and len(errors) < MAX_ERRORS:
+                errors.append({"offset": off, "error": "hash mismatch (record edited, inserted or removed)"})
+            prev = h
+            if _CHECKPOINT not in body:
+                res["records"] += 1
+                leaves += bytes.fromhex(h.decode())
+                continue
+            res["checkpoints"] += 1
+            res["last_checkpoint"] = (pos, h.decode())
+            try:
+                cp = json.loads(body)
+            except ValueError:
+                cp = {}
+            if not closed:
+                res["head"] = (off, bytes(leaves), cp.get("records"), cp.get("root"))
+            elif (cp.get("records") != len(leaves) // 16 or cp.get("root") != merkle_root(bytes(leaves), key)) \
+                    and len(errors) < MAX_ERRORS:
+                errors.append({"offset": off, "error": "checkpoint root does not match its segment"})
+            closed = True
+            leaves = bytearray()
+    res["last"] = prev
+    res["tail"] = bytes(leaves)
+    return res
+
+
+def _load_state(state_path: Optional[str], path: str) -> Optional[Dict[str, Any]]:
+    if not state_path or not os.path.exists(state_path):
+        return None
+    with open(state_path, encoding="utf-8") as f:
+        state = json.load(f)
+    return state if state.get("path") == os.path.abspath(path) else None
+
+
+def verify(path: str, jobs: Optional[int] = None, state_path: Optional[str] = None) -> Dict[str, Any]:
+    """Verify the hash chain and checkpoint roots of an audit log.
+
+    With `state_path`, resume after the checkpoint recorded there by the previous run
+    (after checking that checkpoint is still in place) and record the last one reached.
+    Returns {ok, records, checkpoints, unchained, open_records, from_offset, errors}.
+    """
+    key = _key()
+    state = _load_state(state_path, path)
+    start, prev = 0, GENESIS.encode()
+    errors: List[Dict[str, Any]] = []
+    if state is not None:
+        start, prev = state["offset"], state["head"].encode()
+        with open(path, "rb") as f:
+            f.seek(max(0, start - (1 << 16)))
+            before = f.read(start - f.tell())
+        line = before.rstrip(b"\n")
+        parts = split(line[line.rfind(b"\n") + 1:])
+        if os.path.getsize(path) < start or parts is None or parts[1] != prev:
+            errors.append({"offset": start, "error": "the last verified checkpoint is gone (log truncated or rewritten)"})
+            return {"ok": False, "records": 0, "checkpoints": 0, "unchained": 0, "open_records": 0,
+                    "from_offset": start, "errors": errors}
+    end = closed_end(path, start)
+    workers = jobs or os.cpu_count() or 1
+    ranges = _ranges(path, start, end, workers * 4)
+    if workers > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(min(workers, len(ranges))) as pool:
+            results = list(pool.map(_verify_range, *zip(*((path, a, b, key) for a, b in ranges))))
+    else:
+        results = [_verify_range(path, a, b, key) for a, b in ranges]
+
+    records = checkpoints = unchained = 0
+    carry = bytearray()
+    chained = start > 0
+    last_checkpoint = None
+    for r in results:
+        if r["leading_unchained"]:
+            if chained:
+                errors.append({"offset": r["start"], "error": "record without a chain hash"})
+            else:
+                unchained += r["leading_unchained"]  # written before chaining was turned on
+        if r["first"] is not None:
+            off, body, h = r["first"]
+            if link(prev, body, key) != h:
+                errors.append({"offset": off, "error": "hash mismatch (record edited, inserted or removed)"})
+            chained = True
+        if r["head"] is not None:
+            off, leaves, n, root = r["head"]
+            carry += leaves
+            if n != len(carry) // 16 or root != merkle_root(bytes(carry), key):
+                errors.append({"offset": off, "error": "checkpoint root does not match its segment"})
+            carry = bytearray(r["tail"])
+        else:
+            carry += r["tail"]
+        errors.extend(r["errors"])
+        records += r["records"]
+        checkpoints += r["checkpoints"]
+        if r["last"] is not None:
+            prev = r["last"]
+        if r["last_checkpoint"] is not None:
+            last_checkpoint = r["last_checkpoint"]
+    errors.sort(key=lambda e: e["offset"])
+    ok = not errors
+    if ok and state_path and last_checkpoint is not None:
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({"path": os.path.abspath(path), "offset": last_checkpoint[0], "head": last_checkpoint[1]}, f)
+    return {"ok": ok, "records": records, "checkpoints": checkpoints, "unchained": unchained,
+            "open_records": len(carry) // 16, "from_offset": start, "errors": errors[:MAX_ERRORS]}
@@ -0,0 +1,88 @@
+"""
+Compile v2 `when:` clauses into predicate closures over request meta.
+
+    when:
+      agent: support-bot              # equality (shorthand for {eq: ...})
+      tier: {in: [gold, platinum]}    # set membership
+      risk: {gte: 0, lt: 50}          # numeric range (bools are not numbers here)
+
+All keys must hold (AND); a missing key never matches. The clause is turned into
+closures once, at compile time, so evaluation never walks the condition dict.
+"""
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+RANGE_OPS = ('gt', 'gte', 'lt', 'lte')
+MISSING = object()
+
+
+def _eq(key: str, value: Any) -> Predicate:
+    def check(meta: Dict[str, Any]) -> bool:
+        return bool(meta.get(key, MISSING) == value)
+    return check
+
+
+def _member(key: str, values: FrozenSet[Any]) -> Predicate:
+    def check(meta: Dict[str, Any]) -> bool:
+        try:
+            return meta.get(key, MISSING) in values
+        except TypeError:  # unhashable meta value
+            return False
+    return check
+
+
+def _range(key: str, gt: Any, gte: Any, lt: Any, lte: Any) -> Predicate:
+    def check(meta: Dict[str, Any]) -> bool:
+        v = meta.get(key)
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            return False
+        return (gt is None or v > gt) and (gte is None or v >= gte) and (lt is None or v < lt) and (lte is None or v <= lte)
+    return check
+
+
+def _checks(key: str, cond: Any) -> List[Predicate]:
+    if not isinstance(cond, dict):
+        return [_eq(key, cond)]
+    checks = []
+    if 'eq' in cond:
+        checks.append(_eq(key, cond['eq']))
+    if 'in' in cond:
+        checks.append(_member(key, frozenset(cond['in'])))
+    if any(op in cond for op in RANGE_OPS):
+        checks.append(_range(key, *(cond.get(op) for op in RANGE_OPS)))
+    return checks
+
+
+def compile_when(when: Optional[Dict[str, Any]]) -> Optional[Predicate]:
+    """One predicate for the whole clause, or None when there is nothing to test."""
+    checks = tuple(c for key, cond in (when or {}).items() for c in _checks(key, cond))
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    def all_hold(meta: Dict[str, Any]) -> bool:
+        for check in checks:
+            if not check(meta):
+                return False
+        return True
+    return all_hold
+
+
+def index_values(when: Optional[Dict[str, Any]]) -> Dict[str, FrozenSet[Any]]:
+    """{key: values} for every equality/membership test; a rule can only match when meta[key] is one of them."""
+    out: Dict[str, FrozenSet[Any]] = {}
+    for key, cond in (when or {}).items():
+        if not isinstance(cond, dict):
+            values = frozenset([cond])
+        elif 'eq' in cond and 'in' in cond:
+            values = frozenset([cond['eq']]) & frozenset(cond['in'])
+        elif 'eq' in cond:
+            values = frozenset([cond['eq']])
+        elif 'in' in cond:
+            values = frozenset(cond['in'])
+        else:
+            continue
+        out[key] = values
+    return out
@@ -1,24 +1,123 @@
-import json
-import os
-import time
-import uuid
-from typing import Any, Dict, Optional
+import asyncio
+from typing import Any, Dict, Optional, Tuple
 
-from .audit import write as audit_write
+from .approvals import submit_approval
+from .audit import submit as audit_submit
 from .guard import evaluate as guard_evaluate
+from .ids import new_id
+from .windows import exceeded as window_exceeded
+from .windows import reserve as reserve_window
+from .writer import wait as _wait
 
 
-def _approvals_path() -> str:
-    return os.environ.get("APPROVALS_PATH", "approvals.log")
+def _decide(
+    tool: str,
+    amount_cents: Optional[int],
+    op: Optional[str],
+    meta: Optional[Dict[str, Any]],
+    principal: Optional[str] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Pure part of enforce(): returns (result, audit event, pending approval entry or None)."""
+    res = guard_evaluate(tool, amount_cents=amount_cents, op=op, meta=meta, principal=principal)
+    window_key = res.get("window_key")
+    if window_key is not None and amount_cents is not None:
+        # Check-and-add under the window lock; a concurrent call may have used up the cap
+        added, total = reserve_window(window_key, amount_cents, res["window"]["cap_cents"])
+        if not added:
+            res, window_key = window_exceeded(res, amount_cents, total), None
+    result, event, approval = _outcome(res, tool, amount_cents, op, meta)
+    if window_key is not None:
+        event["window_key"] = list(window_key)  # lets windows.rebuild() restore the total
+    if isinstance(meta, dict) and isinstance(meta.get("tenant"), str):
+        event["tenant"] = meta["tenant"]
+    # v2 decisions name the matched rule; carry it into the result and the audit record
+    if res.get("rule_index") is not None:
+        result["rule_index"] = event["rule_index"] = res["rule_index"]
+        if res.get("rule_id") is not None:
+            result["rule_id"] = event["rule_id"] = res["rule_id"]
+    return result, event, approval
+
+
+def _outcome(
+    res: Dict[str, Any],
+    tool: str,
+    amount_cents: Optional[int],
+    op: Optional[str],
+    meta: Optional[Dict[str, Any]],
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[Dict[str, Any]]]:
+    reasons = list(res.get("reasons", []))
+
+    # Hard block (deny-list)
+    if not res.get("allowed") and not res.get("approval_required"):
+        return (
+            {
+                "allowed": False,
+                "approval_required": False,
+                "status": "blocked",
+                "reasons": reasons,
+            },
+            {
+                "action": "enforce",
+                "ok": False,
+                "tool": tool,
+                "op": op,
+                "amount_cents": amount_cents,
+                "status": "blocked",
+            },
+            None,
+        )
+
+    # Allowed immediately
+    if res.get("allowed") and not res.get("approval_required"):
+        return (
+            {
+                "allowed": True,
+                "approval_required": False,
+                "status": "allowed",
+                "reasons": reasons,
+            },
+            {
+                "action": "enforce",
+                "ok": True,
+                "tool": tool,
+                "op": op,
+                "amount_cents": amount_cents,
+                "status": "allowed",
+            },
+            None,
+        )
 
+    # Approval required → create pending approval
+    dry_run_id = None
+    if isinstance(meta, dict):
+        dry_run_id = meta.get("dry_run_id")
+    if not dry_run_id:
+        dry_run_id = f"enf-{new_id()}"
 
-def _append_approval(entry: Dict[str, Any]) -> Dict[str, Any]:
-    rec = dict(entry)
-    rec["ts"] = int(time.time())
-    path = _approvals_path()
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(rec) + "\n")
-    return rec
+    approval_id = new_id()
+    return (
+        {
+            "allowed": False,
+            "approval_required": True,
+            "status": "pending",
+            "reasons": reasons,
+            "approval_id": approval_id,
+        },
+        {
+            "action": "enforce",
+            "ok": False,
+            "tool": tool,
+            "op": op,
+            "amount_cents": amount_cents,
+            "status": "pending",
+            "note": f"dry_run_id={dry_run_id} approval_id={approval_id}",
+        },
+        {
+            "status": "pending",
+            "dry_run_id": dry_run_id,
+            "approval_id": approval_id,
+        },
+    )
 
 
 def enforce(
@@ -26,6 +125,7 @@ def enforce(
     amount_cents: Optional[int] = None,
     op: Optional[str] = None,
     meta: Optional[Dict[str, Any]] = None,
+    principal: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Unified firewall decision:
@@ -36,71 +136,27 @@ def enforce(
     Returns: {allowed: bool, approval_required: bool, status: str, reasons: [str], approval_id?: str}
     Status: 'allowed' | 'pending' | 'blocked'
     """
-    res = guard_evaluate(tool, amount_cents=amount_cents, op=op)
-    reasons = list(res.get("reasons", []))
+    result, event, approval = _decide(tool, amount_cents, op, meta, principal)
+    if approval is not None:
+        submit_approval(approval)[1].result()
+    audit_submit(event)[1].result()
+    return result
 
-    # Hard block (deny-list)
-    if not res.get("allowed") and not res.get("approval_required"):
-        audit_write({
-            "action": "enforce",
-            "ok": False,
-            "tool": tool,
-            "op": op,
-            "amount_cents": amount_cents,
-            "status": "blocked",
-        })
-        return {
-            "allowed": False,
-            "approval_required": False,
-            "status": "blocked",
-            "reasons": reasons,
-        }
-
-    # Allowed immediately
-    if res.get("allowed") and not res.get("approval_required"):
-        audit_write({
-            "action": "enforce",
-            "ok": True,
-            "tool": tool,
-            "op": op,
-            "amount_cents": amount_cents,
-            "status": "allowed",
-        })
-        return {
-            "allowed": True,
-            "approval_required": False,
-            "status": "allowed",
-            "reasons": reasons,
-        }
 
-    # Approval required → create pending approval
-    dry_run_id = None
-    if isinstance(meta, dict):
-        dry_run_id = meta.get("dry_run_id")
-    if not dry_run_id:
-        dry_run_id = f"enf-{uuid.uuid4()}"
-
-    approval_id = str(uuid.uuid4())
-    _append_approval({
-        "status": "pending",
-        "dry_run_id": dry_run_id,
-        "approval_id": approval_id,
-    })
-
-    audit_write({
-        "action": "enforce",
-        "ok": False,
-        "tool": tool,
-        "op": op,
-        "amount_cents": amount_cents,
-        "status": "pending",
-        "note": f"dry_run_id={dry_run_id} approval_id={approval_id}",
-    })
-
-    return {
-        "allowed": False,
-        "approval_required": True,
-        "status": "pending",
-        "reasons": reasons,
-        "approval_id": approval_id,
-    }
\ No newline at end of file
+async def enforce_async(
+    tool: str,
+    amount_cents: Optional[int] = None,
+    op: Optional[str] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    principal: Optional[str] = None,
+) -> Dict[str, Any]:
+    """enforce() for event-loop callers. The decision (policy stat and any reload or tenant
+    compile, evaluation, window reserve) runs in a worker thread, so a slow policy load
+    never stalls the loop; the approval and audit appends are awaited on the background
+    writer, in enforce()'s order, so no audit record names an approval that failed to append.
+    """
+    result, event, approval = await asyncio.to_thread(_decide, tool, amount_cents, op, meta, principal)
+    if approval is not None:
+        await _wait(submit_approval(approval)[1])
+    await _wait(audit_submit(event)[1])
+    return result
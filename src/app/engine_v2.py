@@ -1,55 +1,505 @@
 import fnmatch
-from typing import Any, Dict, List, Optional
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from .conditions import MISSING, Predicate, compile_when, index_values
+from .windows import DEFAULT_WINDOW, WINDOW_BY, parse_window
 
 # Evaluate a v2 policy (already validated or trusted input)
-# Returns {allowed: bool, approval_required: bool, reasons: [str]}
+# Returns {allowed: bool, approval_required: bool, reasons: [str], rule_index: int|None, rule_id: str|None}
+# rule_index is the matched rule's position in the effective policy (includes spliced in);
+# both are None when no rule matched. Allow results of rules with window_cap_cents also
+# carry 'window' (the rule's window spec); the policy itself keeps no spend state.
+
+_DECISIONS = frozenset(('allow', 'review', 'deny'))
+
+_GLOB_META = frozenset('*?[')
+
+# Bound on per-policy memoized tool -> rule plans (tool names are low-cardinality)
+MEMO_SIZE = 65536
+
+# A per-tool plan step: a conditional rule position, or (meta key, {value: positions})
+# for a run of conditional rules that all test that key for equality/membership
+Step = Union[int, Tuple[str, Dict[Any, Tuple[int, ...]]]]
+
+
+def classify_glob(pat: str) -> Tuple[str, str]:
+    """('exact', name) or ('prefix', head) when a glob needs no regex, else ('glob', pat)."""
+    if not _GLOB_META.intersection(pat):
+        return 'exact', pat
+    head = pat[:-1]
+    if pat.endswith('*') and not _GLOB_META.intersection(head):
+        return 'prefix', head
+    return 'glob', pat
+
+
+def classify(pat: str, match_type: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Reduce a rule's match to ('exact', name), ('prefix', head) or ('pattern', regex source).
+    Globs (the default match_type) that need no wildcard machinery become exact/prefix;
+    'pattern' sources are anchored at both ends like fnmatch.
+    """
+    if match_type in ('exact', 'prefix'):
+        return match_type, pat
+    if match_type == 'regex':
+        return 'pattern', f'(?:{pat})\\Z'
+    kind, key = classify_glob(pat)
+    return ('pattern', fnmatch.translate(key)) if kind == 'glob' else (kind, key)
+
+
+def _matcher(kind: str, key: str, match: str) -> Callable[[str], Any]:
+    """Stand-alone matcher for one classified rule (see classify)."""
+    if kind == 'exact':
+        return key.__eq__
+    if kind == 'prefix':
+        return lambda tool: tool.startswith(key)
+    try:
+        return re.compile(key).match
+    except re.error:  # e.g. inline global flags mid-pattern; fullmatch the bare regex instead
+        return re.compile(match).fullmatch
+
+
+def _window_spec(rule: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Cumulative cap of an allow rule (see windows.py), or None."""
+    cap = rule.get('window_cap_cents')
+    if cap is None:
+        return None
+    window = rule.get('window') or DEFAULT_WINDOW
+    by = rule.get('window_by')
+    return {
+        'rule': rule.get('id') or rule['match'],
+        'cap_cents': int(cap),
+        'window': window,
+        'window_s': parse_window(window),
+        'by': tuple(WINDOW_BY if by is None else by),
+    }
 
-def evaluate_v2(policy: Dict[str, Any], tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None) -> Dict[str, Any]:
-    rules: List[Dict[str, Any]] = list(policy.get('rules') or [])
 
-    for rule in rules:
-        pat = rule.get('match')
-        if not pat:
-            continue
-        if not fnmatch.fnmatch(tool, pat):
-            continue
+class CompiledRule:
+    __slots__ = ('id', 'match', 'decision', 'reason', 'cap', 'ops', 'when', 'window', 'pred')
 
-        decision = rule.get('decision')
-        reason = rule.get('reason')
+    def __init__(self, rule: Dict[str, Any]) -> None:
+        self.id: Optional[str] = rule.get('id')
+        self.match: str = rule['match']
+        self.decision: Optional[str] = rule.get('decision')
+        self.reason: Optional[str] = rule.get('reason')
         cap = rule.get('cap_cents')
+        self.cap: Optional[int] = int(cap) if cap is not None else None
         ops = rule.get('ops')  # None or list[str]
+        self.ops: Optional[FrozenSet[str]] = frozenset(ops) if ops else None
+        self.when: Optional[Dict[str, Any]] = rule.get('when') or None
+        self.window: Optional[Dict[str, Any]] = _window_spec(rule)
+        self.pred: Optional[Predicate] = compile_when(self.when)
 
-        if decision == 'deny':
-            return {
-                'allowed': False,
-                'approval_required': False,
-                'reasons': [reason or f"Denied by rule for '{pat}'"],
-            }
+    def __getstate__(self) -> Tuple[Any, ...]:
+        # Closures do not pickle; the predicate is recompiled from `when` on load
+        return (self.id, self.match, self.decision, self.reason, self.cap, self.ops, self.when, self.window)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        self.id, self.match, self.decision, self.reason, self.cap, self.ops, self.when, self.window = state
+        self.pred = compile_when(self.when)
+
+    def to_state(self) -> List[Any]:
+        """JSON-safe form of __getstate__ (policy artifacts); from_state() restores it."""
+        window = dict(self.window, by=list(self.window['by'])) if self.window is not None else None
+        ops = sorted(self.ops) if self.ops is not None else None
+        return [self.id, self.match, self.decision, self.reason, self.cap, ops, self.when, window]
+
+    @classmethod
+    def from_state(cls, state: List[Any]) -> 'CompiledRule':
+        rule = cls.__new__(cls)
+        rule_id, match, decision, reason, cap, ops, when, window = state
+        if window is not None:
+            window = dict(window, by=tuple(window['by']))
+        rule.__setstate__((rule_id, match, decision, reason, cap, frozenset(ops) if ops is not None else None, when, window))
+        return rule
+
+
+class CompiledFragment:
+    """One file's rules, pre-parsed and classified; CompiledPolicyV2 splices fragments in order."""
+
+    __slots__ = ('source_rules', 'rules', 'keys', 'positions')
+
+    def __init__(self, rules: List[Dict[str, Any]]) -> None:
+        self.source_rules = rules
+        self.rules: List[CompiledRule] = []
+        self.keys: List[Tuple[str, str]] = []
+        self.positions: List[int] = []  # index of each compiled rule in source_rules
+        for i, r in enumerate(rules):
+            if not r.get('match') or r.get('decision') not in _DECISIONS:
+                continue
+            self.rules.append(CompiledRule(r))
+            self.positions.append(i)
+            self.keys.append(classify(r['match'], r.get('match_type')))
+
+
+class CompiledPolicyV2:
+    """
+    A v2 policy with every rule pre-parsed and indexed into one matcher, so evaluation
+    does no dict work and each tool name is resolved in a single pass.
+
+    Built from one or more CompiledFragments (see includes.py), concatenated in order.
+    Rules whose decision is not allow/review/deny never apply and are dropped. The rest
+    are indexed by position: exact names in a dict, prefixes in a dict per prefix length,
+    and everything needing a regex (non-trivial globs, match_type 'regex') in one ordered
+    alternation whose first matching branch is the earliest such rule. A lookup takes the
+    lowest matching position (first match wins).
+
+    Rules with a `when:` clause are kept out of that index. Per tool name, the conditional
+    rules that match it ahead of the first unconditional match are turned into a plan
+    (memoized): runs of rules testing the same meta key become one dict lookup on that
+    key's value, so a call only runs the predicates of rules that can still apply.
+
+    Every evaluation bumps a hit counter for the matched rule (or the no-match default).
+    Counters are per thread, so the hot path takes no lock; stats() merges them on read.
+    They start at zero whenever a policy is (re)loaded.
+    """
+
+    __slots__ = ('rules', 'source', 'positions', 'exact', 'prefixes', 'prefix_lengths', 'patterns', 'conditional',
+                 '_combined', '_cond_matchers', '_memo', 'loaded_at', '_local', '_counters', '_lock')
 
-        if decision == 'allow':
-            # Cap escalation only applies to allow rules
-            if cap is not None:
-                applies = True if not ops else (op in ops if op is not None else False)
-                if applies and (amount_cents is not None) and (amount_cents > int(cap)):
+    def __init__(self, policy: Dict[str, Any], fragments: Optional[List[CompiledFragment]] = None) -> None:
+        self.source = policy
+        self.rules: List[CompiledRule] = []
+        self.positions: List[int] = []
+        self.exact: Dict[str, int] = {}
+        self.prefixes: Dict[int, Dict[str, int]] = {}
+        self.patterns: List[Tuple[int, str]] = []
+        self.conditional: List[Tuple[int, str, str]] = []
+        if fragments is None:
+            fragments = [CompiledFragment(policy.get('rules') or [])]
+        offset = 0
+        for frag in fragments:
+            for rule, (kind, key), pos in zip(frag.rules, frag.keys, frag.positions):
+                idx = len(self.rules)
+                self.rules.append(rule)
+                self.positions.append(offset + pos)
+                if rule.pred is not None:
+                    self.conditional.append((idx, kind, key))
+                elif kind == 'exact':
+                    self.exact.setdefault(key, idx)
+                elif kind == 'prefix':
+                    self.prefixes.setdefault(len(key), {}).setdefault(key, idx)
+                else:
+                    self.patterns.append((idx, key))
+            offset += len(frag.source_rules)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.prefix_lengths: List[int] = sorted(self.prefixes)
+        self._combined: Optional[Tuple[Any, List[int], List[Tuple[int, Callable[[str], Any]]]]] = None
+        self._cond_matchers: Optional[List[Tuple[int, Callable[[str], Any]]]] = None
+        self._memo: Dict[str, Tuple[Tuple[Step, ...], Optional[int]]] = {}
+        self.loaded_at = time.time()
+        self._local = threading.local()
+        self._counters: List[List[int]] = []  # one per thread: hits per rule, then the default
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return (self.source, self.rules, self.positions, self.exact, self.prefixes, self.patterns, self.conditional)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        self.source, self.rules, self.positions, self.exact, self.prefixes, self.patterns, self.conditional = state
+        self._reset()
+
+    def to_state(self) -> List[Any]:
+        """JSON-safe form of __getstate__ for policy artifacts (no pickle); see from_state()."""
+        return [self.source, [r.to_state() for r in self.rules], self.positions, self.exact,
+                [[n, d] for n, d in self.prefixes.items()], self.patterns, self.conditional]
+
+    @classmethod
+    def from_state(cls, state: List[Any]) -> 'CompiledPolicyV2':
+        source, rules, positions, exact, prefixes, patterns, conditional = state
+        policy = cls.__new__(cls)
+        policy.__setstate__((
+            source, [CompiledRule.from_state(r) for r in rules], positions, exact,
+            {int(n): d for n, d in prefixes}, [tuple(p) for p in patterns], [tuple(c) for c in conditional],
+        ))
+        return policy
+
+    def _build_combined(self) -> Tuple[Any, List[int], List[Tuple[int, Callable[[str], Any]]]]:
+        """
+        (alternation, group -> rule position, separately matched rules). Built on first use
+        so loading a compiled artifact never pays for regex compilation. Each branch ends
+        in an empty marker group, so match.lastindex names the branch that matched; regexes
+        with their own groups would shift that numbering and are matched one by one.
+        """
+        branches: List[str] = []
+        owners: List[int] = [-1]  # group 0 is the whole match
+        singles: List[Tuple[int, Callable[[str], Any]]] = []
+        for idx, src in self.patterns:
+            try:
+                groups: Optional[int] = re.compile(src).groups
+            except re.error:  # e.g. inline global flags mid-pattern
+                groups = None
+            if groups != 0:  # own groups would shift the marker numbering
+                singles.append((idx, _matcher('pattern', src, self.rules[idx].match)))
+                continue
+            branches.append(f'{src}()')
+            owners.append(idx)
+        combined = re.compile('|'.join(branches)).match if branches else None
+        return combined, owners, singles
+
+    def _lookup(self, tool: str) -> Optional[int]:
+        best = self.exact.get(tool, len(self.rules))
+        n = len(tool)
+        for k in self.prefix_lengths:
+            if k > n:
+                break
+            idx = self.prefixes[k].get(tool[:k])
+            if idx is not None and idx < best:
+                best = idx
+        if self.patterns and self.patterns[0][0] < best:
+            if self._combined is None:
+                self._combined = self._build_combined()
+            combined, owners, singles = self._combined
+            m = combined(tool) if combined is not None else None
+            if m is not None and m.lastindex is not None and owners[m.lastindex] < best:
+                best = owners[m.lastindex]
+            for idx, matches in singles:
+                if idx >= best:
+                    break
+                if matches(tool):
+                    best = idx
+                    break
+        return best if best < len(self.rules) else None
+
+    def _plan(self, tool: str) -> Tuple[Tuple[Step, ...], Optional[int]]:
+        """(conditional steps, unconditional fallback position) for one tool name."""
+        fallback = self._lookup(tool)
+        if not self.conditional:
+            return (), fallback
+        if self._cond_matchers is None:
+            self._cond_matchers = [(idx, _matcher(kind, key, self.rules[idx].match)) for idx, kind, key in self.conditional]
+        limit = len(self.rules) if fallback is None else fallback
+        cands = []
+        for idx, matches in self._cond_matchers:
+            if idx >= limit:
+                break
+            if matches(tool):
+                cands.append(idx)
+        steps: List[Step] = []
+        i = 0
+        while i < len(cands):
+            # Longest run from cands[i] sharing an indexable meta key
+            keys = index_values(self.rules[cands[i]].when)
+            field, j = None, i + 1
+            for k in sorted(keys):
+                end = i + 1
+                while end < len(cands) and k in index_values(self.rules[cands[end]].when):
+                    end += 1
+                if end > j:
+                    field, j = k, end
+            if field is None:
+                steps.append(cands[i])
+                i += 1
+                continue
+            table: Dict[Any, Tuple[int, ...]] = {}
+            for idx in cands[i:j]:
+                for value in index_values(self.rules[idx].when)[field]:
+                    table[value] = table.get(value, ()) + (idx,)
+            steps.append((field, table))
+            i = j
+        return tuple(steps), fallback
+
+    def first_match(self, tool: str, meta: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """Position of the first rule matching `tool` whose `when` holds for `meta`, or None."""
+        memo = self._memo
+        try:
+            steps, fallback = memo[tool]
+        except KeyError:
+            if len(memo) >= MEMO_SIZE:
+                memo.clear()
+            steps, fallback = memo[tool] = self._plan(tool)
+        if not steps:
+            return fallback
+        m = meta if isinstance(meta, dict) else {}
+        rules = self.rules
+        for step in steps:
+            if isinstance(step, int):
+                if rules[step].pred(m):  # type: ignore[misc]  # plan steps only hold conditional rules
+                    return step
+                continue
+            field, table = step
+            try:
+                hits = table.get(m.get(field, MISSING), ())
+            except TypeError:  # unhashable meta value
+                hits = ()
+            for idx in hits:
+                if rules[idx].pred(m):  # type: ignore[misc]
+                    return idx
+        return fallback
+
+    def _count(self, idx: Optional[int]) -> None:
+        try:
+            hits = self._local.hits
+        except AttributeError:  # first evaluation on this thread
+            hits = self._local.hits = [0] * (len(self.rules) + 1)
+            with self._lock:
+                self._counters.append(hits)
+        hits[-1 if idx is None else idx] += 1
+
+    def _result(self, idx: Optional[int], amount_cents: Optional[int], op: Optional[str]) -> Dict[str, Any]:
+        if idx is not None:
+            rule = self.rules[idx]
+            decision = rule.decision
+            pat = rule.match
+            pos = self.positions[idx]
+
+            if decision == 'deny':
+                return {
+                    'allowed': False,
+                    'approval_required': False,
+                    'reasons': [rule.reason or f"Denied by rule for '{pat}'"],
+                    'rule_index': pos,
+                    'rule_id': rule.id,
+                }
+
+            if decision == 'allow':
+                # Cap escalation only applies to allow rules
+                cap = rule.cap
+                if cap is not None and self._cap_exceeded(rule, amount_cents, op):
                     return {
                         'allowed': False,
                         'approval_required': True,
                         'reasons': [
                             f"Amount {amount_cents} exceeds cap {cap} for pattern '{pat}'"
                         ],
+                        'rule_index': pos,
+                        'rule_id': rule.id,
                     }
-            return {'allowed': True, 'approval_required': False, 'reasons': []}
+                res = {'allowed': True, 'approval_required': False, 'reasons': [], 'rule_index': pos, 'rule_id': rule.id}
+                if rule.window is not None and amount_cents is not None and self._cap_applies(rule, op):
+                    res['window'] = rule.window  # cumulative cap; checked against live totals by guard.evaluate
+                return res
+
+            if decision == 'review':
+                return {
+                    'allowed': False,
+                    'approval_required': True,
+                    'reasons': [rule.reason or f"Review required by rule for '{pat}'"],
+                    'rule_index': pos,
+                    'rule_id': rule.id,
+                }
 
-        if decision == 'review':
-            return {
-                'allowed': False,
-                'approval_required': True,
-                'reasons': [reason or f"Review required by rule for '{pat}'"],
+        # No rule matched -> default to review (safer default)
+        return {
+            'allowed': False,
+            'approval_required': True,
+            'reasons': ["No matching rule; default to review"],
+            'rule_index': None,
+            'rule_id': None,
+        }
+
+    @staticmethod
+    def _cap_applies(rule: CompiledRule, op: Optional[str]) -> bool:
+        return rule.ops is None or (op in rule.ops if op is not None else False)
+
+    @classmethod
+    def _cap_exceeded(cls, rule: CompiledRule, amount_cents: Optional[int], op: Optional[str]) -> bool:
+        cap = rule.cap
+        return cap is not None and cls._cap_applies(rule, op) and amount_cents is not None and amount_cents > cap
+
+    def evaluate(
+        self, tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None, meta: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        idx = self.first_match(tool, meta)
+        try:  # inlined _count
+            self._local.hits[-1 if idx is None else idx] += 1
+        except AttributeError:
+            self._count(idx)
+        return self._result(idx, amount_cents, op)
+
+    def explain(
+        self, tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None, meta: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """evaluate() plus an 'explain' trace: which lookup resolved the tool, every
+        conditional rule whose `when` was tested (in order), and the cap check."""
+        t0 = time.perf_counter()
+        idx = self.first_match(tool, meta)
+        elapsed_us = (time.perf_counter() - t0) * 1e6
+        self._count(idx)
+        res = self._result(idx, amount_cents, op)
+
+        steps, fallback = self._memo.get(tool) or self._plan(tool)
+        m = meta if isinstance(meta, dict) else {}
+        checked: List[Dict[str, Any]] = []
+
+        def test(i: int) -> bool:
+            held = bool(self.rules[i].pred(m))  # type: ignore[misc]  # plan steps only hold conditional rules
+            checked.append({'rule_index': self.positions[i], 'rule_id': self.rules[i].id, 'when': self.rules[i].when, 'held': held})
+            return held
+
+        for step in steps:
+            if isinstance(step, int):
+                if test(step):
+                    break
+                continue
+            field, table = step
+            try:
+                hits = table.get(m.get(field, MISSING), ())
+            except TypeError:
+                hits = ()
+            if any(test(i) for i in hits):
+                break
+
+        trace: Dict[str, Any] = {
+            'engine': 'v2',
+            'rules': len(self.source.get('rules') or []),
+            'unconditional_match': None if fallback is None else self.positions[fallback],
+            'conditions_checked': checked,
+            'matched': None if idx is None else {
+                'rule_index': self.positions[idx],
+                'rule_id': self.rules[idx].id,
+                'match': self.rules[idx].match,
+                'decision': self.rules[idx].decision,
+                'when': self.rules[idx].when,
+            },
+            'default': idx is None,
+            'elapsed_us': round(elapsed_us, 2),
+        }
+        if idx is not None and self.rules[idx].decision == 'allow' and self.rules[idx].cap is not None:
+            rule = self.rules[idx]
+            trace['cap'] = {
+                'cap_cents': rule.cap,
+                'ops': sorted(rule.ops) if rule.ops else None,
+                'applies': self._cap_applies(rule, op),
+                'amount_cents': amount_cents,
+                'exceeded': self._cap_exceeded(rule, amount_cents, op),
             }
+        res['explain'] = trace
+        return res
 
-    # No rule matched -> default to review (safer default)
-    return {
-        'allowed': False,
-        'approval_required': True,
-        'reasons': ["No matching rule; default to review"],
-    }
\ No newline at end of file
+    def stats(self) -> Dict[str, Any]:
+        """Per-rule hit counts merged across threads since the policy was loaded.
+        dead_rules lists rules with no hits; inactive_rules those that can never apply
+        (missing match or unknown decision)."""
+        with self._lock:
+            counters = list(self._counters)
+        totals = [sum(col) for col in zip(*counters)] if counters else [0] * (len(self.rules) + 1)
+        rules = [
+            {'rule_index': self.positions[i], 'rule_id': r.id, 'match': r.match, 'decision': r.decision, 'hits': totals[i]}
+            for i, r in enumerate(self.rules)
+        ]
+        compiled = set(self.positions)
+        return {
+            'since': self.loaded_at,
+            'evaluations': sum(totals),
+            'default_hits': totals[-1],
+            'rules': rules,
+            'dead_rules': [r['rule_index'] for r in rules if not r['hits']],
+            'inactive_rules': [i for i in range(len(self.source.get('rules') or [])) if i not in compiled],
+        }
+
+
+def compile_v2(policy: Dict[str, Any]) -> CompiledPolicyV2:
+    return CompiledPolicyV2(policy)
+
+
+def evaluate_v2(
+    policy: Any, tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None, meta: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    compiled = policy if isinstance(policy, CompiledPolicyV2) else compile_v2(policy)
+    return compiled.evaluate(tool, amount_cents=amount_cents, op=op, meta=meta)
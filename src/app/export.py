@@ -0,0 +1,121 @@
+"""
+Streaming audit export (GET /audit/export).
+
+The log is snapshotted at its current size, the first record at or after `since` is
+found by binary search over byte offsets (records are appended in time order, give or
+take SLACK_S, since ts is stamped on submit and the background writer appends later),
+and matching lines are streamed forward until records pass `until`. Output is gzip-compressed on the fly in
+CHUNK-sized pieces, so memory stays flat however large the range; ndjson passes the
+original lines through untouched, csv flattens them into CSV_COLUMNS plus an `extra`
+JSON column holding any other fields.
+"""
+import csv
+import io
+import json
+import os
+import zlib
+from typing import IO, Any, Iterator, List, Optional
+
+from .ids import SLACK_MS
+from .logscan import line_ts
+
+CHUNK = 1 << 16
+GZIP_LEVEL = 5
+SLACK_S = SLACK_MS // 1000  # how far a record's ts may trail the lines appended before it, as for IDs
+FORMATS = ("ndjson", "csv")
+CSV_COLUMNS = ("ts", "action", "tool", "op", "status", "amount_cents", "tenant", "rule_id", "approval_id", "trace_id")
+
+def seek_ts(f: IO[bytes], since: int, size: int) -> int:
+    """Offset of a line start at or before the first record with ts >= since - SLACK_S."""
+    target = since - SLACK_S
+    lo, hi = 0, size
+    while hi - lo > CHUNK:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        f.readline()  # skip the partial line
+        ts = None
+        while ts is None and f.tell() < hi:
+            line = f.readline()
+            if not line:
+                break
+            ts = line_ts(line)
+        if ts is not None and ts < target:
+            lo = mid
+        else:
+            hi = mid
+    if lo:
+        f.seek(lo)
+        f.readline()
+        return f.tell()
+    return 0
+
+
+def _csv_row(line: bytes) -> Optional[List[Any]]:
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(rec, dict):
+        return None
+    row: List[Any] = []
+    for c in CSV_COLUMNS:
+        v = rec.get(c)
+        row.append("" if v is None else v if isinstance(v, (str, int, float)) else json.dumps(v))
+    extra = {k: v for k, v in rec.items() if k not in CSV_COLUMNS}
+    row.append(json.dumps(extra) if extra else "")
+    return row
+
+
+def iter_export(path: str, since: Optional[int] = None, until: Optional[int] = None, fmt: str = "ndjson") -> Iterator[bytes]:
+    """Yield the gzip stream of records with since <= ts < until (either bound optional)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    out = bytearray()
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator="\n")
+    if fmt == "csv":
+        writer.writerow(CSV_COLUMNS + ("extra",))
+    bounded = since is not None or until is not None
+    if os.path.exists(path):
+        size = os.path.getsize(path)  # records appended during the export are not included
+        with open(path, "rb") as f:
+            pos = seek_ts(f, since, size) if since is not None else 0
+            f.seek(pos)
+            stop = None if until is None else until + SLACK_S
+            while pos < size:
+                line = f.readline()
+                pos += len(line)
+                if not line.endswith(b"\n"):
+                    break  # a record still being written
+                if bounded:
+                    ts = line_ts(line)
+                    if ts is None:
+                        continue
+                    if stop is not None and ts >= stop:
+                        break
+                    if (since is not None and ts < since) or (until is not None and ts >= until):
+                        continue
+                if fmt == "ndjson":
+                    out += line
+                else:
+                    row = _csv_row(line)
+                    if row is not None:
+                        writer.writerow(row)
+                    if text.tell() >= CHUNK:
+                        out += text.getvalue().encode()
+                        text.seek(0)
+                        text.truncate()
+                if len(out) >= CHUNK:
+                    data = gz.compress(bytes(out))
+                    out.clear()
+                    if data:
+                        yield data
+    out += text.getvalue().encode()
+    yield gz.compress(bytes(out)) + gz.flush()
+
+
+def export_filename(since: Optional[int], until: Optional[int], fmt: str) -> str:
+    """e.g. audit-1700000000-1700086400.ndjson.gz"""
+    span = "".join(f"-{'' if t is None else t}" for t in (since, until)) if since is not None or until is not None else ""
+    return f"audit{span}.{fmt}.gz"
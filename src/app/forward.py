@@ -0,0 +1,123 @@
+import fnmatch
+import os
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from pydantic import BaseModel, ConfigDict, Field
+
+# HTTP forward-proxy support: after an allowed enforce decision the call is sent
+# to the upstream tool server configured for that tool. Each upstream gets one
+# long-lived httpx.AsyncClient (keep-alive pool with its own limits/timeouts),
+# so forwarding pays no connection setup on the hot path. The policy decision is
+# made on the tool, so each tool is bound to the upstream paths it may reach
+# (`paths`); any other path is refused rather than forwarded under that tool's name.
+
+# Never forwarded in either direction (RFC 9110 §7.6.1), plus what httpx/Starlette recompute
+HOP_BY_HOP = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade", "host", "content-length",
+})
+
+
+class Upstream(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    url: str = Field(..., description='Base URL of the upstream tool server')
+    match: List[str] = Field(default_factory=lambda: ['*'], description='Tool globs routed to this upstream')
+    paths: Dict[str, List[str]] = Field(
+        default_factory=dict,
+        description='Tool glob -> upstream path prefixes it may call; a tool with no entry reaches no path',
+    )
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_s: float = 30.0
+    timeout_s: float = 30.0
+    connect_timeout_s: float = 5.0
+
+
+class UpstreamsConfig(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    upstreams: Dict[str, Upstream] = Field(default_factory=dict)
+
+
+def _upstreams_path() -> str:
+    return os.environ.get("UPSTREAMS_PATH", "upstreams.yml")
+
+
+def load_upstreams(path: Optional[str] = None) -> UpstreamsConfig:
+    """Load upstreams.yml (UPSTREAMS_PATH); an absent file means no upstreams."""
+    p = path or _upstreams_path()
+    if not os.path.exists(p):
+        return UpstreamsConfig()
+    import yaml  # type: ignore
+
+    with open(p, "r", encoding="utf-8") as f:
+        raw: Any = yaml.safe_load(f) or {}
+    return UpstreamsConfig.model_validate(raw)
+
+
+class ForwardPool:
+    """One pooled AsyncClient per upstream; create once per app and aclose() on shutdown."""
+
+    def __init__(self, config: UpstreamsConfig, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self.config = config
+        self._transport = transport  # tests inject an ASGI transport for a stand-in upstream
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def route(self, tool: str) -> Optional[str]:
+        """Name of the first upstream (in config order) whose globs match `tool`."""
+        for name, up in self.config.upstreams.items():
+            if any(fnmatch.fnmatch(tool, pat) for pat in up.match):
+                return name
+        return None
+
+    def allows(self, name: str, tool: str, path: str) -> bool:
+        """True if `path` is under a prefix bound to `tool` (first matching glob) on upstream `name`."""
+        path = "/" + path.lstrip("/")
+        if any(seg in (".", "..") for seg in path.split("/")):
+            return False  # the upstream would resolve these to somewhere else
+        for pat, prefixes in self.config.upstreams[name].paths.items():
+            if fnmatch.fnmatch(tool, pat):
+                return any(path == pre or path.startswith(pre.rstrip("/") + "/") for pre in prefixes)
+        return False
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        c = self._clients.get(name)
+        if c is None:
+            up = self.config.upstreams[name]
+            c = self._clients[name] = httpx.AsyncClient(
+                base_url=up.url,
+                transport=self._transport,
+                limits=httpx.Limits(
+                    max_connections=up.max_connections,
+                    max_keepalive_connections=up.max_keepalive_connections,
+                    keepalive_expiry=up.keepalive_expiry_s,
+                ),
+                timeout=httpx.Timeout(up.timeout_s, connect=up.connect_timeout_s),
+            )
+        return c
+
+    async def send(
+        self,
+        name: str,
+        method: str,
+        path: str,
+        headers: Iterable[Tuple[str, str]],
+        params: Any,
+        body: AsyncIterator[bytes],
+    ) -> httpx.Response:
+        """Start the upstream request with a streamed body; caller must aclose() the response."""
+        client = self.client(name)
+        req = client.build_request(method, "/" + path.lstrip("/"), headers=filter_headers(headers), params=params, content=body)
+        return await client.send(req, stream=True)
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for c in clients.values():
+            await c.aclose()
+
+
+def filter_headers(headers: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    # (name, value) pairs rather than a dict, so repeated headers keep every value
+    return [(k, v) for k, v in headers if k.lower() not in HOP_BY_HOP and not k.lower().startswith("x-aegis-")]
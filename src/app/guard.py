@@ -1,19 +1,73 @@
 import fnmatch
-from typing import Optional
+import time
+from typing import Any, Dict, Optional
 
-from .engine_v2 import evaluate_v2 as _evaluate_v2
-from .policy import load_policy
+from .engine_v2 import CompiledPolicyV2
+from .policy import load_compiled_policy, load_tenant_policy
+from .windows import apply as apply_window
 
 
-def evaluate(tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None) -> dict:
+def evaluate(
+    tool: str,
+    amount_cents: Optional[int] = None,
+    op: Optional[str] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    principal: Optional[str] = None,
+) -> dict:
     """Evaluate whether a tool call is allowed based on active policy.
     - If the policy file is version 2, use the v2 rules engine (top-down).
     - Otherwise, use the existing v1 logic (unchanged).
+    The policy comes from the compiled-policy cache, so the YAML is only re-read when it changes.
+    `meta` feeds v2 `when:` conditions; v1 ignores it. `meta.tenant` selects that tenant's
+    policy when POLICY_DIR is set (see policy.load_tenant_policy). Rules with
+    window_cap_cents are checked against the live window totals (see windows.py), kept per
+    `principal` when the server knows who the caller is.
     """
-    p = load_policy()
-    if isinstance(p, dict) and p.get('version') == 2:
-        return _evaluate_v2(p, tool, amount_cents=amount_cents, op=op)
+    res = evaluate_compiled(active_policy(meta), tool, amount_cents=amount_cents, op=op, meta=meta)
+    if "window" in res:
+        res = apply_window(res, tool, amount_cents, meta, principal)
+    return res
 
+
+def active_policy(meta: Optional[Dict[str, Any]] = None) -> Any:
+    """The compiled policy a call with this meta is decided by."""
+    tenant = meta.get("tenant") if isinstance(meta, dict) else None
+    return load_compiled_policy() if tenant is None else load_tenant_policy(tenant)
+
+
+def evaluate_compiled(
+    p: Any, tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None, meta: Optional[Dict[str, Any]] = None
+) -> dict:
+    """Evaluate against an already compiled policy (see policy.compile_policy)."""
+    if isinstance(p, CompiledPolicyV2):
+        return p.evaluate(tool, amount_cents=amount_cents, op=op, meta=meta)
+    return evaluate_v1(p, tool, amount_cents=amount_cents, op=op)
+
+
+def explain(
+    tool: str,
+    amount_cents: Optional[int] = None,
+    op: Optional[str] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    principal: Optional[str] = None,
+) -> dict:
+    """evaluate() with an 'explain' trace of how the decision was reached (v2: see CompiledPolicyV2.explain)."""
+    p = active_policy(meta)
+    if isinstance(p, CompiledPolicyV2):
+        res = p.explain(tool, amount_cents=amount_cents, op=op, meta=meta)
+        if "window" in res:
+            trace = res.pop("explain")
+            res = apply_window(res, tool, amount_cents, meta, principal)
+            res["explain"] = trace
+        return res
+    t0 = time.perf_counter()
+    res = evaluate_v1(p, tool, amount_cents=amount_cents, op=op)
+    res["explain"] = {"engine": "v1", "elapsed_us": round((time.perf_counter() - t0) * 1e6, 2)}
+    return res
+
+
+def evaluate_v1(p: dict, tool: str, amount_cents: Optional[int] = None, op: Optional[str] = None) -> dict:
+    """Legacy v1 evaluation against a coerced v1 policy dict."""
     # --------- BEGIN existing v1 logic (unchanged) ---------
     # Use existing implementation below exactly as-is so existing tests remain stable.
     # (Keep deny/allow/caps reasoning strings intact.)
@@ -0,0 +1,138 @@
+"""
+Time-sortable IDs (ULID: 48-bit Unix ms + 80 random bits, 26 Crockford base32 chars)
+for trace_id, approval_id and generated dry_run_ids.
+
+IDs minted by one process are strictly increasing: within a millisecond, or if the
+clock steps back, the previous ID's random part is incremented instead of redrawn.
+Across threads that is guaranteed by a lock; across processes IDs stay unique (fresh
+random bits, re-drawn after fork) and ordered to the millisecond.
+
+Because logs are appended in roughly ID order, find_line() can binary-search a log for
+the line holding an ID using the time embedded in it, then search only the bytes
+minted within SLACK_MS of it. IDs that are not ULIDs (older uuid4 records) fall back to
+a linear scan.
+"""
+import base64
+import os
+import re
+import threading
+import time
+from typing import IO, Optional, Tuple
+
+SLACK_MS = 300_000  # how long after minting an ID its record may still be appended
+
+_CROCKFORD = b"0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_TO_CROCKFORD = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", _CROCKFORD)
+_VALUE = {c: i for i, c in enumerate(_CROCKFORD.decode())}
+_ULID_RE = re.compile(r"[0-7][0-9A-HJKMNP-TV-Z]{25}\Z")
+_RAND_MAX = (1 << 80) - 1
+_BLOCK = 1 << 16
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_rand = 0
+
+
+def _reset() -> None:
+    global _lock, _last_ms
+    _lock = threading.Lock()
+    _last_ms = -1
+
+
+os.register_at_fork(after_in_child=_reset)
+
+
+def stamp() -> Tuple[str, int]:
+    """A new ULID and the Unix ms it encodes (use it as the record's ts_ms)."""
+    global _last_ms, _last_rand
+    now = time.time_ns() // 1_000_000
+    with _lock:
+        if now > _last_ms:
+            _last_ms, _last_rand = now, int.from_bytes(os.urandom(10), "big")
+        elif _last_rand < _RAND_MAX:
+            _last_rand += 1
+        else:
+            _last_ms, _last_rand = _last_ms + 1, int.from_bytes(os.urandom(10), "big")
+        ms, rand = _last_ms, _last_rand
+    # 128 bits in 20 bytes -> 32 base32 chars; the first 6 are always zero
+    raw = ((ms << 80) | rand).to_bytes(20, "big")
+    return base64.b32encode(raw).translate(_TO_CROCKFORD)[6:].decode(), ms
+
+
+def new_id() -> str:
+    return stamp()[0]
+
+
+def id_ms(value: str) -> Optional[int]:
+    """Unix ms encoded in a ULID, or None for anything else."""
+    if not isinstance(value, str) or _ULID_RE.match(value) is None:
+        return None
+    ms = 0
+    for c in value[:10]:
+        ms = ms * 32 + _VALUE[c]
+    return ms
+
+
+def _probe(f: IO[bytes], field: "re.Pattern[bytes]", hi: int) -> Optional[int]:
+    """ms of the first line at or after the current position (a line start) that carries an ID."""
+    while f.tell() < hi:
+        line = f.readline()
+        if not line:
+            break
+        m = field.search(line)
+        if m is not None:
+            ms = id_ms(m.group(1).decode())
+            if ms is not None:
+                return ms
+    return None
+
+
+def _bisect(f: IO[bytes], field: "re.Pattern[bytes]", target: int, size: int) -> int:
+    """Line-start offset before which every ID-bearing line has ms < target (approximately)."""
+    lo, hi = 0, size
+    while hi - lo > _BLOCK:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        f.readline()
+        ms = _probe(f, field, hi)
+        if ms is None or ms < target:  # no ID there: older, pre-ULID records
+            lo = mid
+        else:
+            hi = mid
+    if lo == 0:
+        return 0
+    f.seek(lo)
+    f.readline()
+    return f.tell()
+
+
+def find_line(path: str, field: str, value: str) -> Optional[bytes]:
+    """The first line of `path` whose JSON `field` equals `value`, or None."""
+    if not os.path.exists(path) or not value or '"' in value or "\\" in value:
+        return None
+    needle = f'"{field}": "{value}"'.encode()
+    size = os.path.getsize(path)
+    ms = id_ms(value)
+    with open(path, "rb") as f:
+        if ms is None:
+            start, end = 0, size
+        else:
+            pattern = re.compile(rb'"' + re.escape(field.encode()) + rb'": "([0-9A-Z]{26})"')
+            start = _bisect(f, pattern, ms - SLACK_MS, size)
+            end = min(size, _bisect(f, pattern, ms + SLACK_MS, size) + _BLOCK)
+        f.seek(start)
+        pos, tail = start, b""
+        while pos < end:
+            block = tail + f.read(min(_BLOCK, end - pos))
+            pos = f.tell()
+            i = block.find(needle)
+            if i >= 0:
+                line_start = block.rfind(b"\n", 0, i) + 1
+                line_end = block.find(b"\n", i)
+                if line_end < 0:
+                    rest = f.readline()
+                    return block[line_start:] + rest.rstrip(b"\n")
+                return block[line_start:line_end]
+            cut = block.rfind(b"\n") + 1
+            tail = block[cut:]  # keep the partial last line for the next block
+    return None
@@ -0,0 +1,49 @@
+"""
+Byte-level helpers for scanning the JSONL logs without parsing them: reading lines
+from the end, finding where the complete lines stop, and pulling a record's ts out
+of its raw bytes. Shared by windows.rebuild(), chain, archive and export.
+"""
+import os
+import re
+from typing import IO, Iterator, Optional
+
+TS_RE = re.compile(rb'"ts": (\d+)')
+
+_BLOCK = 1 << 20
+_TAIL_BLOCK = 1 << 16
+
+
+def line_ts(line: bytes) -> Optional[int]:
+    """The record's top-level ts, read from the raw line (records are written with json.dumps)."""
+    m = TS_RE.search(line)
+    return int(m.group(1)) if m is not None else None
+
+
+def lines_backward(f: IO[bytes], size: int) -> Iterator[bytes]:
+    """The lines of the first `size` bytes of `f`, last first, without their newlines.
+    A file ending in a newline yields an empty line first."""
+    pos, rest = size, b""
+    while pos > 0:
+        step = min(_BLOCK, pos)
+        pos -= step
+        f.seek(pos)
+        lines = (f.read(step) + rest).split(b"\n")
+        rest = lines.pop(0) if pos else b""  # may be cut; completed by the next block
+        yield from reversed(lines)
+
+
+def closed_end(path: str, start: int) -> int:
+    """Offset just past the last complete line at or after `start`; a line still being
+    appended is left out."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = size
+        while pos > start:
+            step = min(_TAIL_BLOCK, pos - start)
+            f.seek(pos - step)
+            block = f.read(step)
+            i = block.rfind(b"\n")
+            if i >= 0:
+                return pos - step + i + 1
+            pos -= step
+    return start
@@ -1,27 +1,37 @@
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from pydantic import BaseModel
 
-from .approvals import complete_approval, list_approvals
+from .admission import Admission, admitted
+from .approvals import complete_approval, complete_approvals, find_approval, list_approvals
+from .audit import config as audit_config
+from .audit import find_trace, flush_rollups
 from .audit import write as audit_write
-from .enforcer import enforce as guard_enforce
+from .enforcer import enforce_async as guard_enforce_async
+from .engine_v2 import CompiledPolicyV2
+from .guard import active_policy
 from .guard import evaluate as guard_evaluate
-from .policy import load_policy
-from .policy_v2 import migrate_v1_to_v2, validate_policy_input
+from .guard import explain as guard_explain
+from .policy import load_compiled_policy, load_policy, policy_hash, tenant_policy_path
+from .windows import rebuild as rebuild_windows
 
-app = FastAPI(title="MCP Firewall MVP")
+# Rarely used paths (policy validation/migration, the HTML UI) import their
+# modules inside the handler so they stay off the cold-start path.
+
+router = APIRouter()
 
 
 class HealthResponse(BaseModel):
     status: str
 
-@app.get("/health", response_model=HealthResponse)
+@router.get("/health", response_model=HealthResponse)
 def health() -> HealthResponse:
     return HealthResponse(status="ok")
 
-@app.get("/policy")
+@router.get("/policy")
 def get_policy() -> dict:
     """Return the current policy (safe subset) and its source path."""
     return {"policy": load_policy()}
@@ -39,33 +49,120 @@ class AuditWriteResult(BaseModel):
     trace_id: str
     path: str
 
-@app.post("/audit", response_model=AuditWriteResult, status_code=201)
+@router.post("/audit", response_model=AuditWriteResult, status_code=201)
 def post_audit(event: AuditEvent) -> AuditWriteResult:
     info = audit_write(event.dict(exclude_none=True))
     return AuditWriteResult(ok=True, **info)
 
 
+class AuditBatchEvent(BaseModel):
+    # Only what Guard.check ships for a local decision. Other keys (status, window_key,
+    # chain, trace_id, ...) are dropped: status follows `ok`, and ts/trace_id are stamped
+    # on arrival, so a client cannot skew windows.rebuild() or export's ts order.
+    action: Literal["enforce"]
+    ok: bool
+    tool: str
+    op: Optional[str] = None
+    amount_cents: Optional[int] = None
+    tenant: Optional[str] = None
+    source: Optional[str] = None
+    ts: Optional[int] = None
+    ts_ms: Optional[int] = None
+
+    def record(self) -> Dict[str, Any]:
+        rec: Dict[str, Any] = {"action": self.action, "ok": self.ok, "tool": self.tool, "op": self.op,
+                               "amount_cents": self.amount_cents, "status": "allowed" if self.ok else "blocked"}
+        if self.tenant is not None:
+            rec["tenant"] = self.tenant
+        if self.source is not None:
+            rec["source"] = self.source
+        client_ms = self.ts_ms if self.ts_ms is not None else self.ts * 1000 if self.ts is not None else None
+        if client_ms is not None:
+            rec["client_ts_ms"] = client_ms  # when the caller says the call happened; informational only
+        return rec
+
+
+class AuditBatchRequest(BaseModel):
+    events: List[AuditBatchEvent]
+
+
+class AuditBatchResult(BaseModel):
+    ok: bool
+    count: int
+    trace_ids: List[str]
+
+
+@router.post("/audit/batch", response_model=AuditBatchResult, status_code=201)
+async def post_audit_batch(req: AuditBatchRequest) -> Any:
+    from .audit import submit_many
+    from .writer import wait
+
+    trace_ids, fut = submit_many([e.record() for e in req.events])
+    await wait(fut)
+    return AuditBatchResult(ok=True, count=len(trace_ids), trace_ids=trace_ids)
+
+
+@router.get("/audit/export")
+def audit_export(since: Optional[int] = None, until: Optional[int] = None, format: Literal["ndjson", "csv"] = "ndjson") -> Any:
+    # Stream records with since <= ts < until (epoch seconds) as a gzip download; the file
+    # is read in bounded chunks on the threadpool, so guard traffic keeps flowing (export.py)
+    import os
+
+    from starlette.responses import StreamingResponse
+
+    from .export import export_filename, iter_export
+
+    path = os.environ.get("AUDIT_PATH", "audit.log")
+    headers = {"Content-Disposition": f'attachment; filename="{export_filename(since, until, format)}"'}
+    return StreamingResponse(iter_export(path, since, until, format), media_type="application/gzip", headers=headers)
+
+
+@router.get("/audit/{trace_id}")
+def audit_get(trace_id: str) -> Any:
+    # One record by trace_id, found by binary search on the time embedded in the ID
+    rec = find_trace(trace_id)
+    return rec if rec is not None else JSONResponse({"detail": f"No audit record with trace_id {trace_id!r}"}, status_code=404)
+
+
 # ---- Guard check HTTP endpoint ----
 class GuardRequest(BaseModel):
     tool: str
     amount_cents: Optional[int] = None
     op: Optional[str] = None
+    meta: Optional[Dict[str, Any]] = None
 
 
 class GuardResult(BaseModel):
     allowed: bool
     approval_required: bool
     reasons: List[str] = []
+    rule_index: Optional[int] = None
+    rule_id: Optional[str] = None
+    explain: Optional[Dict[str, Any]] = None
+
+
+def _with_tenant(meta: Optional[Dict[str, Any]], request: Request) -> Optional[Dict[str, Any]]:
+    # X-Aegis-Tenant (typically set by the gateway) wins over meta.tenant
+    tenant = request.headers.get("x-aegis-tenant")
+    return meta if tenant is None else {**(meta or {}), "tenant": tenant}
+
+
+def _principal(request: Request) -> Optional[str]:
+    # Who the gateway authenticated the caller as; window_cap_cents totals are kept per
+    # principal only from here, never from the caller's own meta.principal
+    return request.headers.get("x-aegis-principal")
 
 
-@app.post("/guard/check", response_model=GuardResult)
-def guard_check_http(req: GuardRequest) -> GuardResult:
-    res = guard_evaluate(req.tool, amount_cents=req.amount_cents, op=req.op)
+@router.post("/guard/check", response_model=GuardResult)
+def guard_check_http(req: GuardRequest, request: Request, explain: bool = False) -> GuardResult:
+    # ?explain=true adds a trace of how the decision was reached
+    evaluate = guard_explain if explain else guard_evaluate
+    res = evaluate(req.tool, amount_cents=req.amount_cents, op=req.op, meta=_with_tenant(req.meta, request), principal=_principal(request))
     return GuardResult(**res)
 
 
 # ---- Approvals JSON endpoints ----
-@app.get("/approvals")
+@router.get("/approvals")
 def approvals_list() -> dict:
     # Use environment variable to pick up test overrides
     import os
@@ -73,12 +170,19 @@ def approvals_list() -> dict:
     return {"approvals": list_approvals(approvals_path)}
 
 
+@router.get("/approvals/{approval_id}")
+def approvals_get(approval_id: str) -> Any:
+    # One approval record, found by binary search on the time embedded in the ID
+    rec = find_approval(approval_id)
+    return rec if rec is not None else JSONResponse({"detail": f"No approval with approval_id {approval_id!r}"}, status_code=404)
+
+
 class ApprovalsCompleteRequest(BaseModel):
     dry_run_id: str
     approval_code: str
 
 
-@app.post("/approvals/complete")
+@router.post("/approvals/complete")
 def approvals_complete(req: ApprovalsCompleteRequest) -> dict:
     res = complete_approval(req.dry_run_id, req.approval_code)
     # Return keys asserted in tests
@@ -89,36 +193,28 @@ def approvals_complete(req: ApprovalsCompleteRequest) -> dict:
     }
 
 
+class ApprovalsCompleteBatchRequest(BaseModel):
+    dry_run_ids: List[str]
+    approval_code: str
+    decision: Literal["approved", "denied"] = "approved"
+
+
+@router.post("/approvals/complete/batch")
+def approvals_complete_batch(req: ApprovalsCompleteBatchRequest) -> Any:
+    # Pending ids are completed together (one grouped append); the rest come back under `skipped`
+    res = complete_approvals(req.dry_run_ids, req.approval_code, req.decision)
+    return res if res["ok"] else JSONResponse(res, status_code=403)
+
+
 # ---- Approvals HTML UI ----
-@app.get("/ui/approvals", response_class=HTMLResponse)
+@router.get("/ui/approvals", response_class=HTMLResponse)
 def approvals_ui() -> str:
     # Use environment variable to pick up test overrides
     import os
+
+    from .ui import render_approvals
     approvals_path = os.environ.get("APPROVALS_PATH")
-    rows = []
-    for r in list_approvals(approvals_path):
-        did = r.get("dry_run_id", "")
-        rows.append(
-            f"<tr>"
-            f"<td>{did}</td>"
-            f"<td>{r.get('status','')}</td>"
-            f"<td>{r.get('ts','')}</td>"
-            f"<td>{r.get('approval_id','')}</td>"
-            f"<td>"
-            f"<input id='code-{did}' placeholder='code' />"
-            f"<button onclick=\"fetch('/approvals/complete',{{method:'POST',headers:{{'Content-Type':'application/json'}},body:JSON.stringify({{dry_run_id:'{did}',approval_code:document.getElementById('code-{did}').value}})}}).then(()=>location.reload())\">Complete</button>"
-            f"</td>"
-            f"</tr>"
-        )
-    html = (
-        "<!doctype html><html><head><meta charset='utf-8'><title>Approvals</title></head>"
-        "<body><h1>Approvals</h1>"
-        "<table border='1' cellpadding='6' cellspacing='0'>"
-        "<thead><tr><th>dry_run_id</th><th>status</th><th>ts</th><th>approval_id</th><th>complete</th></tr></thead>"
-        "<tbody>" + "".join(rows) + "</tbody></table>"
-        "</body></html>"
-    )
-    return html
+    return render_approvals(list_approvals(approvals_path))
 
 
 # ---- Firewall Enforce HTTP endpoint ----
@@ -135,14 +231,103 @@ class EnforceResult(BaseModel):
     status: str
     reasons: List[str] = []
     approval_id: Optional[str] = None
+    rule_index: Optional[int] = None
+    rule_id: Optional[str] = None
+    shed: bool = False
+
+
+# Enforce calls run under the app's admission gate (admission.py): bounded in-flight
+# decisions plus a short queue. Overflow is answered at once with the configured
+# fail-closed status, `shed: true` and Retry-After, without evaluation or audit.
+_RETRY_AFTER = {"Retry-After": "1"}
+
+
+def _admission(request: Request) -> Optional[Admission]:
+    return getattr(request.app.state, "admission", None)
 
 
-@app.post("/guard/enforce", response_model=EnforceResult)
-def guard_enforce_http(req: EnforceRequest) -> EnforceResult:
-    res = guard_enforce(req.tool, amount_cents=req.amount_cents, op=req.op, meta=req.meta)
+@router.post("/guard/enforce", response_model=EnforceResult)
+async def guard_enforce_http(req: EnforceRequest, request: Request) -> Any:
+    meta = _with_tenant(req.meta, request)
+    principal = _principal(request)
+    res = await admitted(_admission(request), lambda: guard_enforce_async(
+        req.tool, amount_cents=req.amount_cents, op=req.op, meta=meta, principal=principal))
+    if res.get("shed"):
+        return JSONResponse(EnforceResult(**res).model_dump(), headers=_RETRY_AFTER)
     return EnforceResult(**res)
 
 
+@router.get("/metrics/admission")
+def admission_metrics(request: Request) -> Any:
+    # In-flight/queue occupancy, shed counts and queue-wait times of the enforce gate
+    gate = _admission(request)
+    return gate.stats() if gate is not None else JSONResponse({"detail": "admission control disabled"}, status_code=404)
+
+
+# ---- HTTP forward proxy ----
+# /forward/{tool}/{path} enforces like /guard/enforce, then streams the request to the
+# upstream configured for `tool` (upstreams.yml), if `path` is bound to that tool
+# there (403 otherwise). Decision inputs come from headers:
+#   X-Aegis-Amount-Cents, X-Aegis-Op, X-Aegis-Meta (JSON object), X-Aegis-Tenant, X-Aegis-Principal
+# Blocked → 403, pending → 202, both with the EnforceResult body; allowed → upstream response.
+# Calls shed by admission control get 503 + Retry-After with the (fail-closed) EnforceResult.
+_DENIED_STATUS = {"blocked": 403, "pending": 202}
+
+
+def _forward_pool(app: FastAPI) -> Any:
+    pool = getattr(app.state, "forward_pool", None)
+    if pool is None:
+        from .forward import ForwardPool, load_upstreams
+        pool = app.state.forward_pool = ForwardPool(load_upstreams())
+    return pool
+
+
+@router.api_route("/forward/{tool}/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def forward_http(tool: str, path: str, request: Request) -> Response:
+    import json
+
+    import httpx
+    from starlette.background import BackgroundTask
+    from starlette.responses import StreamingResponse
+
+    from .forward import HOP_BY_HOP
+
+    pool = _forward_pool(request.app)
+    upstream = pool.route(tool)
+    if upstream is None:
+        return JSONResponse({"detail": f"No upstream configured for tool '{tool}'"}, status_code=404)
+    if not pool.allows(upstream, tool, path):
+        return JSONResponse({"detail": f"Path '/{path}' is not bound to tool '{tool}' on upstream '{upstream}'"}, status_code=403)
+
+    h = request.headers
+    try:
+        amount = int(h["x-aegis-amount-cents"]) if "x-aegis-amount-cents" in h else None
+        meta = json.loads(h["x-aegis-meta"]) if "x-aegis-meta" in h else None
+    except ValueError as e:
+        return JSONResponse({"detail": f"Invalid X-Aegis header: {e}"}, status_code=400)
+    meta = _with_tenant(meta if isinstance(meta, dict) else None, request)
+    principal = _principal(request)
+    res = await admitted(_admission(request), lambda: guard_enforce_async(
+        tool, amount_cents=amount, op=h.get("x-aegis-op"), meta=meta, principal=principal))
+    if res.get("shed"):
+        return JSONResponse(EnforceResult(**res).model_dump(), status_code=503, headers=_RETRY_AFTER)
+    if res["status"] != "allowed":
+        return JSONResponse(EnforceResult(**res).model_dump(), status_code=_DENIED_STATUS.get(res["status"], 403))
+
+    try:
+        up = await pool.send(upstream, request.method, path, h.items(), request.query_params, request.stream())
+    except httpx.TimeoutException as e:
+        return JSONResponse({"detail": f"Upstream '{upstream}' timed out: {e!r}"}, status_code=504)
+    except httpx.HTTPError as e:
+        return JSONResponse({"detail": f"Upstream '{upstream}' unavailable: {e!r}"}, status_code=502)
+    resp = StreamingResponse(up.aiter_raw(), status_code=up.status_code, background=BackgroundTask(up.aclose))
+    for k, v in up.headers.multi_items():  # every value of repeated headers (Set-Cookie)
+        if k.lower() not in HOP_BY_HOP:
+            resp.headers.append(k, v)
+    resp.headers["x-aegis-status"] = "allowed"
+    return resp
+
+
 # ---- Policy Validation HTTP endpoint ----
 class PolicyValidateRequest(BaseModel):
     policy: Dict[str, Any]
@@ -154,21 +339,38 @@ class PolicyValidateResult(BaseModel):
     migrated: Optional[bool] = None
     notes: Optional[List[str]] = None
 
-@app.post('/policy/validate', response_model=PolicyValidateResult)
+@router.post('/policy/validate', response_model=PolicyValidateResult)
 def policy_validate(req: PolicyValidateRequest) -> PolicyValidateResult:
+    from .policy_v2 import validate_policy_input
     res = validate_policy_input(req.policy)
     return PolicyValidateResult(**res)
 
 
 # ---- Policy Effective/Migration HTTP endpoints ----
-@app.get('/policy/effective')
-def policy_effective() -> dict:
-    # Return the policy the server is currently using (v2 preserved, v1 coerced)
-    p = load_policy()
+@router.get('/policy/effective')
+def policy_effective(request: Request) -> Any:
+    # Return the policy the server is currently using (v2 preserved, v1 coerced), or
+    # the X-Aegis-Tenant tenant's when it has its own file
+    import os
+    tenant_path = tenant_policy_path(request.headers.get('x-aegis-tenant'))
+    p = load_policy(tenant_path if tenant_path and os.path.exists(tenant_path) else None)
     # drop internal helper keys like '_path' if present
     if isinstance(p, dict) and '_path' in p:
         p = {k: v for k, v in p.items() if k != '_path'}
-    return p
+    # Content-hash ETag so embedded guards can poll with If-None-Match
+    etag = f'"{policy_hash(p)}"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    return JSONResponse(p, headers={'ETag': etag})
+
+
+@router.get('/policy/stats')
+def policy_stats(request: Request) -> Any:
+    # Per-rule hit counts since the active (or X-Aegis-Tenant's) policy was loaded, plus rules never hit
+    p = active_policy(_with_tenant(None, request))
+    if not isinstance(p, CompiledPolicyV2):
+        return JSONResponse({'detail': 'per-rule stats require a v2 policy'}, status_code=409)
+    return p.stats()
 
 
 class PolicyMigrateRequest(BaseModel):
@@ -179,11 +381,41 @@ class PolicyMigrateResult(BaseModel):
     version: int
     policy: Dict[str, Any]
 
-@app.post('/policy/migrate', response_model=PolicyMigrateResult)
+@router.post('/policy/migrate', response_model=PolicyMigrateResult)
 def policy_migrate(req: PolicyMigrateRequest) -> PolicyMigrateResult:
+    from .policy_v2 import migrate_v1_to_v2
     raw = req.policy or {}
     if isinstance(raw, dict) and raw.get('version') == 2:
         v2 = raw
     else:
         v2 = migrate_v1_to_v2(raw)
-    return PolicyMigrateResult(ok=True, version=2, policy=v2)
\ No newline at end of file
+    return PolicyMigrateResult(ok=True, version=2, policy=v2)
+
+
+# ---- App factory ----
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Refuse to start on bad AUDIT_MODE/AUDIT_SAMPLE_N/AUDIT_ROLLUP_S rather than on the first call
+    audit_config()
+    # Pre-compile the active policy so the first request doesn't pay for YAML parsing
+    load_compiled_policy()
+    # Restore window_cap_cents totals from the audit log
+    rebuild_windows()
+    yield
+    # Write any AUDIT_MODE=aggregate rollups still being counted
+    from .writer import wait
+    await wait(flush_rollups())
+    pool = getattr(app.state, "forward_pool", None)
+    if pool is not None:
+        await pool.aclose()
+
+
+def create_app() -> FastAPI:
+    """Build the HTTP app; the policy is compiled during startup (lifespan)."""
+    app = FastAPI(title="MCP Firewall MVP", lifespan=_lifespan)
+    app.state.admission = Admission.from_env()
+    app.include_router(router)
+    return app
+
+
+app = create_app()
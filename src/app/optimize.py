@@ -0,0 +1,359 @@
+"""
+Rule-ordering optimizer for v2 policies (`cli.py optimize`).
+
+First match wins, so two rules may only trade places when no call can match both.
+Two rules are proven disjoint when either:
+  * their tool patterns cannot match the same name: distinct exact names, an exact
+    name the other pattern rejects, literal heads where neither is a prefix of the
+    other ('payments.*' vs 'admin.*'; a regex's head is its leading literal), or glob
+    tails where neither is a suffix of the other ('*.read' vs '*.write'); or
+  * their `when:` clauses cannot both hold: some key whose equality/membership values
+    on one side all fail the other side's test on that key.
+Every other pair keeps its relative order. Within those constraints rules are
+reordered hottest first (a topological sort keyed by hit count, then position). Any
+call matches a set of pairwise non-disjoint rules, whose order is unchanged, so its
+first match and therefore its decision are unchanged.
+
+`ops` only gate a rule's cap, never whether it matches, so they cannot prove two
+rules disjoint.
+"""
+import heapq
+import json
+import os
+import random
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .audit import calls_in
+from .conditions import RANGE_OPS, compile_when, index_values
+from .engine_v2 import _GLOB_META, _matcher, classify, classify_glob, compile_v2
+
+Shape = Tuple[str, str]  # ('exact' | 'prefix' | 'glob' | 'regex', pattern)
+
+
+def shape(rule: Dict[str, Any]) -> Shape:
+    mt = rule.get('match_type')
+    if mt in ('exact', 'prefix', 'regex'):
+        return mt, rule['match']
+    return classify_glob(rule['match'])
+
+
+def _literal_head(s: Shape) -> str:
+    """A literal every matching tool name starts with."""
+    kind, pat = s
+    if kind in ('exact', 'prefix'):
+        return pat
+    if kind == 'glob':
+        return pat[:min(pat.index(c) for c in _GLOB_META if c in pat)]
+    return _regex_head(pat)
+
+
+def _regex_head(pat: str) -> str:
+    """Leading literal of a regex (e.g. 'team1.' for r'team1\\.(read|list)'), or '' when
+    a top-level alternation or anything but plain/escaped punctuation comes first."""
+    if re.search(r'\(\?[aiLmsux]', pat):  # inline flags (global before Python 3.11)
+        return ''
+    depth, i, in_class = 0, 0, False
+    while i < len(pat):  # any top-level '|' means no common head
+        c = pat[i]
+        if c == '\\':
+            i += 1
+        elif in_class:
+            in_class = c != ']'
+        elif c == '[':
+            in_class = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return ''
+        i += 1
+    head: List[str] = []
+    i = 0
+    while i < len(pat):
+        c = pat[i]
+        if c == '\\' and i + 1 < len(pat) and not pat[i + 1].isalnum():
+            lit, step = pat[i + 1], 2
+        elif c.isalnum() or c in '_-:/@ ':
+            lit, step = c, 1
+        else:
+            break
+        if pat[i + step:i + step + 1] in ('?', '*', '{'):  # the literal is optional or repeated
+            break
+        head.append(lit)
+        i += step
+    return ''.join(head)
+
+
+def _literal_tail(s: Shape) -> str:
+    """A literal every matching tool name ends with."""
+    kind, pat = s
+    if kind == 'exact':
+        return pat
+    if kind == 'glob' and '[' not in pat:
+        return pat[max(pat.rfind('*'), pat.rfind('?')) + 1:]
+    return ''
+
+
+@lru_cache(maxsize=None)
+def _compiled_matcher(match: str, match_type: Optional[str]) -> Callable[[str], Any]:
+    return _matcher(*classify(match, match_type), match)
+
+
+def _rule_matcher(rule: Dict[str, Any]) -> Callable[[str], Any]:
+    return _compiled_matcher(rule['match'], rule.get('match_type'))
+
+
+def _names_disjoint(a: Dict[str, Any], b: Dict[str, Any], sa: Shape, sb: Shape) -> bool:
+    if sa[0] == 'exact':
+        return not _rule_matcher(b)(sa[1])
+    if sb[0] == 'exact':
+        return not _rule_matcher(a)(sb[1])
+    ha, hb = _literal_head(sa), _literal_head(sb)
+    if not (ha.startswith(hb) or hb.startswith(ha)):
+        return True
+    ta, tb = _literal_tail(sa), _literal_tail(sb)
+    return not (ta.endswith(tb) or tb.endswith(ta))
+
+
+def _when_disjoint(wa: Optional[Dict[str, Any]], wb: Optional[Dict[str, Any]]) -> bool:
+    if not wa or not wb:
+        return False
+    for key in wa.keys() & wb.keys():
+        for mine, other in ((wa, wb), (wb, wa)):
+            values = index_values({key: mine[key]}).get(key)
+            test = compile_when({key: other[key]})
+            if values is not None and test is not None and not any(test({key: v}) for v in values):
+                return True
+    return False
+
+
+def disjoint(a: Dict[str, Any], b: Dict[str, Any], sa: Optional[Shape] = None, sb: Optional[Shape] = None) -> bool:
+    """True when no call can match both rules (sound, not complete)."""
+    return _names_disjoint(a, b, sa or shape(a), sb or shape(b)) or _when_disjoint(a.get('when'), b.get('when'))
+
+
+def _covers(a: Dict[str, Any], b: Dict[str, Any], sa: Shape, sb: Shape) -> bool:
+    """True when every tool name `b` matches is also matched by `a`."""
+    if sb[0] == 'exact':
+        return bool(_rule_matcher(a)(sb[1]))
+    if sa == ('glob', '*') or sa == sb:
+        return True
+    return sa[0] == 'prefix' and sb[0] in ('prefix', 'glob') and _literal_head(sb).startswith(sa[1])
+
+
+def _implies(wb: Optional[Dict[str, Any]], wa: Optional[Dict[str, Any]]) -> bool:
+    """True when `wb` holding guarantees `wa` holds (wa's tests are a subset of wb's)."""
+    return all(k in (wb or {}) and (wb or {})[k] == c for k, c in (wa or {}).items())
+
+
+def _never_holds(when: Optional[Dict[str, Any]]) -> bool:
+    if any(not values for values in index_values(when).values()):
+        return True
+    for cond in (when or {}).values():
+        if isinstance(cond, dict):
+            lo = max((cond[o] for o in ('gt', 'gte') if cond.get(o) is not None), default=None)
+            hi = min((cond[o] for o in ('lt', 'lte') if cond.get(o) is not None), default=None)
+            if lo is not None and hi is not None and lo > hi:
+                return True
+    return False
+
+
+def _candidate_pairs(shapes: List[Shape]) -> Iterable[Tuple[int, int]]:
+    """Pairs (i < j) that might overlap. Names matching both rules start with both literal
+    heads, so one head must be a prefix of the other; only those pairs are tried."""
+    by_head: Dict[str, List[int]] = defaultdict(list)
+    for i, s in enumerate(shapes):
+        by_head[_literal_head(s)].append(i)
+    for head, members in by_head.items():
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                yield i, j
+        for k in range(len(head)):
+            for i in by_head.get(head[:k], ()):
+                for j in members:
+                    yield (i, j) if i < j else (j, i)
+
+
+def analyze(rules: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Ordering constraints plus shadowed/unreachable rules.
+    Returns {'after': {j: [i, ...]} (i must precede j), 'shadowed': {j: i}, 'unreachable': [j]}."""
+    shapes = [shape(r) for r in rules]
+    after: Dict[int, List[int]] = defaultdict(list)
+    shadowed: Dict[int, int] = {}
+    unreachable = {j for j, r in enumerate(rules) if _never_holds(r.get('when'))}
+    for i, j in _candidate_pairs(shapes):
+        a, b = rules[i], rules[j]
+        if disjoint(a, b, shapes[i], shapes[j]):
+            continue
+        after[j].append(i)
+        if (j not in shadowed or i < shadowed[j]) and i not in unreachable and _implies(b.get('when'), a.get('when')) and _covers(a, b, shapes[i], shapes[j]):
+            shadowed[j] = i
+    return {'after': dict(after), 'shadowed': dict(sorted(shadowed.items())), 'unreachable': sorted(unreachable)}
+
+
+def reorder(n: int, after: Dict[int, List[int]], hits: List[int]) -> List[int]:
+    """Source positions in their new order: hottest first wherever the constraints allow."""
+    waiting = [len(after.get(j, ())) for j in range(n)]
+    succ: Dict[int, List[int]] = defaultdict(list)
+    for j, preds in after.items():
+        for i in preds:
+            succ[i].append(j)
+    ready = [(-hits[j], j) for j in range(n) if not waiting[j]]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, i = heapq.heappop(ready)
+        order.append(i)
+        for j in succ[i]:
+            waiting[j] -= 1
+            if not waiting[j]:
+                heapq.heappush(ready, (-hits[j], j))
+    return order
+
+
+def hits_from_audit(rules: List[Dict[str, Any]], audit_path: str) -> List[int]:
+    """Per-rule hit counts from audit 'enforce' records. Records name their rule (rule_id,
+    else rule_index when that rule still matches the tool); older records and rollups are
+    replayed against the policy, without meta. Sampled records and rollups are weighted."""
+    hits = [0] * len(rules)
+    ids = {r['id']: i for i, r in enumerate(rules) if r.get('id') is not None}
+    compiled = compile_v2({'version': 2, 'rules': rules})
+    matchers: Dict[int, Callable[[str], Any]] = {}
+    with open(audit_path, 'rb') as f:
+        for line in f:
+            if b'"enforce' not in line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            tool = rec.get('tool')
+            n = calls_in(rec)
+            if not n or not isinstance(tool, str):
+                continue
+            pos = ids.get(rec.get('rule_id'))
+            idx = rec.get('rule_index')
+            if pos is None and isinstance(idx, int) and 0 <= idx < len(rules) and rules[idx].get('match'):
+                m = matchers.get(idx) or matchers.setdefault(idx, _rule_matcher(rules[idx]))
+                pos = idx if m(tool) else None
+            if pos is None:
+                first = compiled.first_match(tool)
+                pos = None if first is None else compiled.positions[first]
+            if pos is not None:
+                hits[pos] += n
+    return hits
+
+
+def hits_from_stats(rules: List[Dict[str, Any]], stats: Dict[str, Any]) -> List[int]:
+    """Per-rule hit counts from a saved GET /policy/stats response for this policy."""
+    hits = [0] * len(rules)
+    for r in stats.get('rules') or []:
+        i = r.get('rule_index')
+        if isinstance(i, int) and 0 <= i < len(rules):
+            hits[i] += int(r.get('hits') or 0)
+    return hits
+
+
+def _scan_cost(order: List[int], hits: List[int]) -> float:
+    """Mean rules examined per call under a linear first-match scan."""
+    total = sum(hits)
+    return sum(hits[i] * (pos + 1) for pos, i in enumerate(order)) / total if total else 0.0
+
+
+def _sample_tool(rng: random.Random, rule: Dict[str, Any]) -> str:
+    kind, pat = shape(rule)
+    fill = rng.choice(['', 'x', 'ab.c', '.z'])
+    if kind == 'exact':
+        name = pat
+    elif kind == 'prefix':
+        name = pat + fill
+    elif kind == 'glob' and '[' not in pat:
+        name = pat.replace('*', fill).replace('?', rng.choice('aZ.'))
+    else:
+        name = re.sub(r'[^A-Za-z0-9_.]', '', pat) or fill
+    mutate = rng.random()
+    if mutate < 0.1:
+        return name + 'x'
+    if mutate < 0.2:
+        return name[:-1]
+    return name
+
+
+def _meta_values(rules: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    values: Dict[str, List[Any]] = defaultdict(list)
+    for r in rules:
+        for key, cond in (r.get('when') or {}).items():
+            values[key].extend(index_values({key: cond}).get(key, ()))
+            if isinstance(cond, dict):
+                for o in RANGE_OPS:
+                    if cond.get(o) is not None:
+                        values[key].extend((cond[o] - 1, cond[o], cond[o] + 1))
+            values[key].append('other')
+    return values
+
+
+def differential_check(
+    rules: List[Dict[str, Any]], order: List[int], samples: int = 2000, seed: int = 0, tools: Iterable[str] = ()
+) -> List[Dict[str, Any]]:
+    """Evaluate random calls under both orders; returns the mismatches (empty when equivalent)."""
+    before = compile_v2({'version': 2, 'rules': rules})
+    after = compile_v2({'version': 2, 'rules': [rules[i] for i in order]})
+    new_pos = {old: new for new, old in enumerate(order)}
+    rng = random.Random(seed)
+    known = [r for r in rules if r.get('match')]
+    extra = list(tools) + ['zz.unmatched']
+    meta_values = _meta_values(rules)
+    ops = sorted({o for r in rules for o in (r.get('ops') or ())}) + ['other']
+    amounts = [None, 0] + [r['cap_cents'] + d for r in rules if isinstance(r.get('cap_cents'), int) for d in (-1, 0, 1)]
+    bad = []
+    for _ in range(samples):
+        tool = _sample_tool(rng, rng.choice(known)) if known and rng.random() < 0.9 else rng.choice(extra)
+        meta = {k: rng.choice(v) for k, v in meta_values.items() if rng.random() < 0.7}
+        op = rng.choice(ops + [None])
+        amount = rng.choice(amounts)
+        want = before.evaluate(tool, amount, op, meta)
+        got = after.evaluate(tool, amount, op, meta)
+        idx = want.pop('rule_index')
+        mapped = None if idx is None else new_pos[idx]
+        if got.pop('rule_index') != mapped or got != want:
+            bad.append({'tool': tool, 'op': op, 'amount_cents': amount, 'meta': meta})
+    return bad
+
+
+def optimize(
+    policy: Dict[str, Any],
+    audit_path: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    samples: int = 2000,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Reorder a validated v2 policy (no include:) hottest-first where provably safe.
+    Returns {'policy', 'order', 'moved', 'shadowed', 'unreachable', 'cold', 'scan_cost', 'mismatches', ...}."""
+    rules = list(policy.get('rules') or [])
+    hits = [0] * len(rules)
+    if audit_path and os.path.exists(audit_path):
+        hits = hits_from_audit(rules, audit_path)
+    if stats:
+        hits = [a + b for a, b in zip(hits, hits_from_stats(rules, stats))]
+    found = analyze(rules)
+    order = reorder(len(rules), found['after'], hits)
+    tools = [_sample_tool(random.Random(i), r) for i, r in enumerate(rules) if r.get('match')]
+    mismatches = differential_check(rules, order, samples=samples, seed=seed, tools=tools)
+    out = dict(policy)
+    out['rules'] = [rules[i] for i in order]
+    return {
+        'policy': out,
+        'order': order,
+        'moved': sum(1 for new, old in enumerate(order) if new != old),
+        'hits': sum(hits),
+        'cold': [i for i, n in enumerate(hits) if not n] if any(hits) else [],
+        'shadowed': found['shadowed'],
+        'unreachable': found['unreachable'],
+        'scan_cost': {'before': _scan_cost(list(range(len(rules))), hits), 'after': _scan_cost(order, hits)},
+        'checked': samples,
+        'mismatches': mismatches,
+    }
@@ -1,7 +1,10 @@
+import hashlib
+import json
 import os
-from typing import Any, Optional
-
-import yaml  # type: ignore
+import re
+import struct
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 DEFAULTS = {
     "max_refund_cents": 0,
@@ -10,6 +13,34 @@ DEFAULTS = {
     "deny_tools": [],
 }
 
+# Compiled policy artifact (see write_artifact): magic, format version, sha256 of the
+# source YAML bytes and any included files, the length of the include list, then the
+# include list (relative to the policy) and the compiled policy, both as JSON. Nothing
+# in it is unpickled or otherwise executed, and the body is only decoded once the
+# header and digest match. Bump ARTIFACT_VERSION whenever the compiled classes change
+# shape; older artifacts are then ignored, not misread.
+ARTIFACT_MAGIC = b"AEGISPC\0"
+ARTIFACT_VERSION = 7
+_ARTIFACT_HEADER = struct.Struct(">8sH32sI")
+
+StatKey = Optional[Tuple[int, int, int]]
+
+# path -> (stat key, compiled policy, ((dependency, stat key), ...)); see load_compiled_policy().
+# Least recently used first; bounded by POLICY_CACHE_SIZE entries and POLICY_CACHE_RULES
+# compiled rules in total, so per-tenant policies (POLICY_DIR) cannot grow it without limit.
+_COMPILED: "OrderedDict[str, Tuple[StatKey, Any, Tuple[Tuple[str, StatKey], ...]]]" = OrderedDict()
+POLICY_CACHE_SIZE = 1024
+POLICY_CACHE_RULES = 2_000_000
+
+# Tenant names usable as file names under POLICY_DIR (no separators, no leading dot)
+TENANT_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}\Z")
+# (POLICY_DIR, tenant) -> policy file path, or None for names that are not valid tenants
+_TENANT_PATHS: Dict[Tuple[str, str], Optional[str]] = {}
+
+
+def _policy_path(path: Optional[str] = None) -> str:
+    return path or os.environ.get("POLICY_PATH", "policy.yml") or "policy.yml"
+
 
 def _coerce_policy(data: dict) -> dict:
     try:
@@ -31,18 +62,256 @@ def _coerce_policy(data: dict) -> dict:
     }
 
 
+def load_yaml(stream: Any) -> Any:
+    """yaml.safe_load, through libyaml's CSafeLoader when PyYAML was built with it (~2.5x faster)."""
+    import yaml  # type: ignore  # deferred: keeps yaml off the startup path
+
+    return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def dump_yaml(data: Any) -> str:
+    """yaml.safe_dump counterpart of load_yaml() (CSafeDumper when available)."""
+    import yaml  # type: ignore
+
+    return yaml.dump(data, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper))
+
+
 def load_policy(path: Optional[str] = None) -> dict:
     """Load YAML policy from disk; return safe, typed dict with defaults if missing."""
-    policy_path: str = path or os.environ.get("POLICY_PATH", "policy.yml") or "policy.yml"
+    policy_path = _policy_path(path)
     if not os.path.exists(policy_path):
         return _coerce_policy({"_path": policy_path})
-    with open(policy_path, "r") as f:
-        raw: Any = yaml.safe_load(f) or {}
-        raw["_path"] = policy_path
-    
-    # If this is a v2 policy, return it as-is (don't coerce to v1)
+    with open(policy_path, "rb") as f:
+        data = f.read()
+    return _from_raw(load_yaml(data) or {}, policy_path, data)
+
+
+def _from_raw(raw: Any, policy_path: str, data: bytes) -> dict:
+    raw["_path"] = policy_path
+
+    # If this is a v2 policy, return it as-is (don't coerce to v1); includes are spliced in
     if isinstance(raw, dict) and raw.get('version') == 2:
+        if raw.get('include'):
+            from .includes import expand
+            return expand(raw, policy_path, data)
         return raw
     
     # Otherwise, coerce to v1 format for backward compatibility
-    return _coerce_policy(raw)
\ No newline at end of file
+    return _coerce_policy(raw)
+
+
+def compile_policy(raw: dict) -> Any:
+    """Turn a loaded policy into its evaluation-ready form.
+    v2 policies become a CompiledPolicyV2; v1 policies are already flat and stay dicts.
+    """
+    if isinstance(raw, dict) and raw.get('version') == 2:
+        from .engine_v2 import compile_v2
+        return compile_v2(raw)
+    return raw
+
+
+def policy_hash(raw: dict) -> str:
+    """Stable content hash of a loaded policy (ignores the internal '_path' helper key)."""
+    data = {k: v for k, v in raw.items() if k != '_path'} if isinstance(raw, dict) else raw
+    blob = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def artifact_path(path: str) -> str:
+    """Where `cli.py compile` puts the artifact for a policy file (policy.yml -> policy.ymlc)."""
+    return path + "c"
+
+
+def write_artifact(path: Optional[str] = None, out: Optional[str] = None, jobs: Optional[int] = 1) -> Tuple[str, Any]:
+    """
+    Validate and compile a policy file into a binary artifact; returns (artifact path, compiled).
+    Raises ValueError with the validation errors for an invalid v2 policy.
+    """
+    policy_path = _policy_path(path)
+    with open(policy_path, "rb") as f:
+        data = f.read()
+    raw = load_yaml(data) or {}
+    if isinstance(raw, dict) and raw.get("version") == 2:
+        from .policy_v2 import validate_v2
+        errors = validate_v2(raw, jobs=jobs)
+        if errors:
+            raise ValueError("\n".join(errors))
+    compiled, deps = _compile_raw(raw, policy_path, data)  # included fragments are validated as they load
+    digest = _deps_digest(policy_path, data, deps)
+    if digest is None:
+        raise ValueError(f"{policy_path}: an included file disappeared while compiling")
+    base = os.path.dirname(policy_path) or "."
+    out = out or artifact_path(policy_path)
+    dep_list = json.dumps([os.path.relpath(d, base) for d in deps]).encode("utf-8")
+    try:
+        body = json.dumps(_artifact_body(compiled), separators=(",", ":"), allow_nan=False).encode("utf-8")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{policy_path}: policy holds values an artifact cannot store ({e})") from e
+    tmp = f"{out}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_ARTIFACT_HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION, digest, len(dep_list)))
+        f.write(dep_list)
+        f.write(body)
+    os.replace(tmp, out)  # readers never see a half-written artifact
+    return out, compiled
+
+
+def _deps_digest(policy_path: str, data: bytes, deps: List[str]) -> Optional[bytes]:
+    """sha256 over the policy bytes and every included file (directory listings for globs).
+    None when a dependency has disappeared.
+    """
+    h = hashlib.sha256(data)
+    for dep in deps:
+        h.update(os.path.relpath(dep, os.path.dirname(policy_path) or ".").encode("utf-8") + b"\0")
+        try:
+            if os.path.isdir(dep):
+                h.update("\0".join(sorted(os.listdir(dep))).encode("utf-8"))
+            else:
+                with open(dep, "rb") as f:
+                    h.update(hashlib.sha256(f.read()).digest())
+        except OSError:
+            return None
+    return h.digest()
+
+
+def _artifact_body(compiled: Any) -> Dict[str, Any]:
+    from .engine_v2 import CompiledPolicyV2
+
+    if isinstance(compiled, CompiledPolicyV2):
+        return {"engine": "v2", "state": compiled.to_state()}
+    return {"engine": "v1", "policy": compiled}
+
+
+def _from_artifact_body(body: Any) -> Any:
+    if body["engine"] == "v2":
+        from .engine_v2 import CompiledPolicyV2
+        return CompiledPolicyV2.from_state(body["state"])
+    if body["engine"] == "v1" and isinstance(body["policy"], dict):
+        return body["policy"]
+    raise ValueError(f"unknown artifact engine {body['engine']!r}")
+
+
+def load_artifact(path: str, policy_path: str, data: bytes) -> Optional[Tuple[Any, List[str]]]:
+    """(compiled, deps) from the artifact at `path` when it was built from exactly `data` and
+    the same included files; None if absent, stale, foreign or malformed.
+    The artifact is plain JSON behind a struct header, so a foreign file can at worst be
+    rejected; the body is not even decoded unless the digest matches.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_ARTIFACT_HEADER.size)
+            if len(head) != _ARTIFACT_HEADER.size:
+                return None
+            magic, version, src_digest, dep_len = _ARTIFACT_HEADER.unpack(head)
+            if magic != ARTIFACT_MAGIC or version != ARTIFACT_VERSION:
+                return None
+            dep_list = json.loads(f.read(dep_len))
+            if not isinstance(dep_list, list) or not all(isinstance(d, str) for d in dep_list):
+                return None
+            base = os.path.dirname(policy_path)
+            deps = [os.path.normpath(os.path.join(base, d)) for d in dep_list]
+            if _deps_digest(policy_path, data, deps) != src_digest:
+                return None
+            return _from_artifact_body(json.loads(f.read())), deps
+    except (OSError, ValueError, TypeError, KeyError, IndexError, AttributeError):
+        return None
+
+
+def _compile_raw(raw: Any, policy_path: str, data: bytes) -> Tuple[Any, List[str]]:
+    """(compiled, included files) for a freshly parsed policy; fragments come from includes' cache."""
+    if isinstance(raw, dict) and raw.get("version") == 2 and raw.get("include"):
+        from .includes import assemble
+        raw["_path"] = policy_path
+        return assemble(policy_path, data, raw)
+    return compile_policy(_from_raw(raw, policy_path, data)), []
+
+
+def _load_fresh(policy_path: str) -> Tuple[Any, List[str]]:
+    """Compile the policy at policy_path, preferring its artifact when it matches the sources."""
+    try:
+        with open(policy_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return compile_policy(load_policy(policy_path)), []
+    hit = load_artifact(artifact_path(policy_path), policy_path, data)
+    if hit is not None:
+        return hit
+    return _compile_raw(load_yaml(data) or {}, policy_path, data)
+
+
+def _stat_key(path: str) -> StatKey:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def load_compiled_policy(path: Optional[str] = None) -> Any:
+    """Return the compiled active policy, re-reading the file only when it changes.
+    Cached per path and keyed on (mtime, size, inode), so POLICY_PATH is still
+    honoured at *call time* and edits on disk are picked up on the next call.
+    A `cli.py compile` artifact next to the file is used when its hash matches.
+    Included fragments are stat-checked too; a change recompiles only that fragment.
+    """
+    policy_path = _policy_path(path)
+    return _compiled_at(policy_path, _stat_key(policy_path))
+
+
+def tenant_policy_path(tenant: Any) -> Optional[str]:
+    """POLICY_DIR/<tenant>.yml for a well-formed tenant name when POLICY_DIR is set, else None."""
+    policy_dir = os.environ.get("POLICY_DIR")
+    if not policy_dir or not isinstance(tenant, str):
+        return None
+    key = (policy_dir, tenant)
+    try:
+        return _TENANT_PATHS[key]
+    except KeyError:
+        pass
+    if len(_TENANT_PATHS) >= 4 * POLICY_CACHE_SIZE:
+        _TENANT_PATHS.clear()
+    path = _TENANT_PATHS[key] = os.path.join(policy_dir, tenant + ".yml") if TENANT_RE.match(tenant) else None
+    return path
+
+
+def load_tenant_policy(tenant: Any) -> Any:
+    """Compiled policy for `tenant` (see tenant_policy_path), loaded lazily into the same
+    LRU as the default policy. Tenants without a file get the default policy (POLICY_PATH)."""
+    path = tenant_policy_path(tenant)
+    if path is not None:
+        key = _stat_key(path)
+        if key is not None:
+            return _compiled_at(path, key)
+    return load_compiled_policy()
+
+
+def _compiled_at(policy_path: str, key: StatKey) -> Any:
+    hit = _COMPILED.get(policy_path)
+    if hit is not None and hit[0] == key and all(_stat_key(d) == k for d, k in hit[2]):
+        try:
+            _COMPILED.move_to_end(policy_path)
+        except KeyError:  # evicted by another thread meanwhile
+            pass
+        return hit[1]
+    compiled, deps = _load_fresh(policy_path)
+    _COMPILED[policy_path] = (key, compiled, tuple((d, _stat_key(d)) for d in deps))
+    _COMPILED.move_to_end(policy_path)
+    _evict()
+    return compiled
+
+
+def _rule_count(compiled: Any) -> int:
+    return len(getattr(compiled, "rules", ())) or 1
+
+
+def _evict() -> None:
+    """Drop least recently used policies beyond POLICY_CACHE_SIZE / POLICY_CACHE_RULES (env overrides)."""
+    max_entries = int(os.environ.get("POLICY_CACHE_SIZE") or POLICY_CACHE_SIZE)
+    max_rules = int(os.environ.get("POLICY_CACHE_RULES") or POLICY_CACHE_RULES)
+    rules = sum(_rule_count(entry[1]) for entry in list(_COMPILED.values()))
+    while len(_COMPILED) > 1 and (len(_COMPILED) > max_entries or rules > max_rules):
+        try:
+            _, entry = _COMPILED.popitem(last=False)
+        except KeyError:
+            break
+        rules -= _rule_count(entry[1])
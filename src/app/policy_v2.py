@@ -1,37 +1,125 @@
-from typing import Any, Dict, List, Optional
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, ValidationInfo, field_validator, model_validator
 from typing_extensions import Literal
 
+from .windows import parse_window
 
 # ---------------------------
 # Pydantic models (v2 schema)
 # ---------------------------
+_SCALARS = (bool, int, float, str)
+
+
+class Condition(BaseModel):
+    """One `when:` test on a meta key; every given operator must hold."""
+    model_config = ConfigDict(extra='forbid', populate_by_name=True)
+
+    eq: Any = None
+    in_: Optional[List[Any]] = Field(default=None, alias='in')
+    gt: Any = None
+    gte: Any = None
+    lt: Any = None
+    lte: Any = None
+
+    @field_validator('eq')
+    @classmethod
+    def _scalar(cls, v: Any) -> Any:
+        if not isinstance(v, _SCALARS):
+            raise ValueError('must be a string, number or boolean')
+        return v
+
+    @field_validator('in_')
+    @classmethod
+    def _scalars(cls, v: Optional[List[Any]]) -> Optional[List[Any]]:
+        if v is None or not all(isinstance(x, _SCALARS) for x in v):
+            raise ValueError('must be a list of strings, numbers or booleans')
+        return v
+
+    @field_validator('gt', 'gte', 'lt', 'lte')
+    @classmethod
+    def _number(cls, v: Any) -> Any:
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            raise ValueError('must be a number')
+        return v
+
+    @model_validator(mode='after')
+    def _not_empty(self) -> 'Condition':
+        if not self.model_fields_set:
+            raise ValueError('condition needs at least one of eq, in, gt, gte, lt, lte')
+        return self
+
+
 class Rule(BaseModel):
     model_config = ConfigDict(extra='forbid')
 
-    match: str = Field(..., description='Glob pattern for tool name')
+    id: Optional[str] = Field(default=None, description='Stable rule name, reported with decisions and in /policy/stats')
+    match: str = Field(..., description='Tool name pattern, interpreted per match_type')
+    match_type: Optional[Literal['exact', 'prefix', 'glob', 'regex']] = Field(
+        default=None, description="How 'match' is applied: exact name, name prefix, fnmatch glob (default) or full-match regex"
+    )
     decision: Literal['allow', 'review', 'deny']
     cap_cents: Optional[int] = Field(default=None, description='Optional amount cap in cents')
+    window_cap_cents: Optional[int] = Field(default=None, description='Cap on the total allowed amount per window (see windows.py)')
+    window: Optional[str] = Field(default=None, description='Window for window_cap_cents: 30s, 15m, 12h, 1d, ... (default 1d, max 31d)')
+    window_by: Optional[List[Literal['tool', 'principal']]] = Field(
+        default=None, description='Keep separate totals per tool name and/or gateway principal (X-Aegis-Principal; default both)'
+    )
     ops: Optional[List[str]] = Field(default=None, description='Optional list of allowed ops')
     reason: Optional[str] = None
+    when: Optional[Dict[str, Condition]] = Field(
+        default=None, description='Conditions on request meta (all must hold); a bare value means {eq: value}'
+    )
 
-    @field_validator('cap_cents')
+    @field_validator('cap_cents', 'window_cap_cents')
     @classmethod
-    def _cap_is_int_and_nonneg(cls, v: Optional[int]) -> Optional[int]:
+    def _cap_is_int_and_nonneg(cls, v: Optional[int], info: ValidationInfo) -> Optional[int]:
         if v is None:
             return v
         if not isinstance(v, int):
-            raise TypeError('cap_cents must be int')
+            raise TypeError(f'{info.field_name} must be int')
         if v < 0:
-            raise ValueError('cap_cents must be >= 0')
+            raise ValueError(f'{info.field_name} must be >= 0')
         return v
 
+    @field_validator('window')
+    @classmethod
+    def _window_parses(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None:
+            parse_window(v)
+        return v
+
+    @field_validator('when', mode='before')
+    @classmethod
+    def _shorthand_eq(cls, v: Any) -> Any:
+        if isinstance(v, dict):
+            return {k: c if isinstance(c, dict) else {'eq': c} for k, c in v.items()}
+        return v
+
+    @model_validator(mode='after')
+    def _window_needs_cap(self) -> 'Rule':
+        if (self.window is not None or self.window_by is not None) and self.window_cap_cents is None:
+            raise ValueError('window and window_by need window_cap_cents')
+        return self
+
+    @model_validator(mode='after')
+    def _regex_compiles(self) -> 'Rule':
+        if self.match_type == 'regex':
+            try:
+                re.compile(self.match)
+            except re.error as e:
+                raise ValueError(f'match is not a valid regex: {e}')
+        return self
+
 
 class PolicyV2(BaseModel):
     model_config = ConfigDict(extra='forbid')
 
     version: int = Field(2, description='Must be 2')
+    include: Optional[List[str]] = Field(default=None, description='Fragment files (or globs) whose rules precede these')
     rules: List[Rule]
 
     @field_validator('version')
@@ -83,34 +171,98 @@ def migrate_v1_to_v2(v1: Dict[str, Any]) -> Dict[str, Any]:
 # ---------------------------
 # Validation entry-point
 # ---------------------------
+# Large generated policies are validated rule-by-rule in chunks: the document
+# shell (version, unknown top-level keys, rules being a list) is checked once,
+# then each chunk of rules goes through a List[Rule] adapter, optionally in a
+# process pool. Chunk errors are re-based onto the global rule index, so
+# locations read 'rules.<i>.<field>' exactly as whole-document validation would.
+
+RULE_CHUNK = 10_000
+
+
+class _PolicyShell(PolicyV2):
+    rules: List[Any]  # type: ignore[assignment]  # rules are validated per chunk
 
-def validate_policy_input(policy: Dict[str, Any]) -> Dict[str, Any]:
+
+_RULES = TypeAdapter(List[Rule])
+
+
+def _format_errors(e: ValidationError, prefix: Tuple[Any, ...] = (), offset: int = 0) -> List[str]:
+    """Flatten pydantic errors into readable strings, shifting list indexes by `offset`."""
+    msgs: List[str] = []
+    for err in e.errors():
+        loc = list(err.get('loc') or [])
+        if offset and loc and isinstance(loc[0], int):
+            loc[0] += offset
+        path = '.'.join(str(x) for x in (*prefix, *loc))
+        msg = err.get('msg') or 'invalid'
+        typ = err.get('type') or ''
+        if path:
+            msgs.append(f"{path}: {msg} ({typ})")
+        else:
+            msgs.append(msg)
+    return msgs
+
+
+def _validate_chunk(args: Tuple[int, Sequence[Any]]) -> List[str]:
+    offset, rules = args
+    try:
+        _RULES.validate_python(rules)
+        return []
+    except ValidationError as e:
+        return _format_errors(e, ('rules',), offset)
+
+
+def validate_v2(data: Any, jobs: Optional[int] = 1, chunk_size: int = RULE_CHUNK) -> List[str]:
     """
-    Validate a supplied policy. Accepts v2 directly; migrates v1 in-memory first.
-    Returns: { ok: bool, errors: [str], version: 2, migrated?: bool, notes?: [str] }
+    Validate a v2 policy document in one pass and return error strings (empty when valid).
+    jobs > 1 spreads rule chunks over a process pool once there is more than one chunk;
+    jobs=None uses every CPU.
     """
-    notes: List[str] = []
-    migrated = False
+    try:
+        shell = _PolicyShell.model_validate(data)
+    except ValidationError as e:
+        return _format_errors(e)
+    rules = shell.rules
+    chunks = [(i, rules[i:i + chunk_size]) for i in range(0, len(rules), chunk_size)]
+    jobs = min(jobs or os.cpu_count() or 1, len(chunks))
+    if jobs <= 1:
+        errors = [m for c in chunks for m in _validate_chunk(c)]
+    else:
+        with ProcessPoolExecutor(jobs) as pool:
+            errors = [m for msgs in pool.map(_validate_chunk, chunks) for m in msgs]
+    return errors + _duplicate_ids(rules)
+
+
+def _duplicate_ids(rules: List[Any]) -> List[str]:
+    seen: Dict[Any, int] = {}
+    errors = []
+    for i, r in enumerate(rules):
+        rid = r.get('id') if isinstance(r, dict) else None
+        if rid is None:
+            continue
+        try:
+            first = seen.setdefault(rid, i)
+        except TypeError:  # unhashable; the chunk validator already reported it
+            continue
+        if first != i:
+            errors.append(f'rules.{i}.id: duplicate rule id {rid!r} (first used by rules.{first}) (value_error)')
+    return errors
 
+
+def to_v2(policy: Any) -> Tuple[Dict[str, Any], bool]:
+    """Return (v2 document, migrated). v2 input is returned as-is; anything else is migrated from v1."""
     if isinstance(policy, dict) and policy.get('version') == 2:
-        data = policy
-    else:
-        migrated = True
-        data = migrate_v1_to_v2(policy or {})
-        notes.append('Migrated legacy v1 policy to v2 for validation')
+        return policy, False
+    return migrate_v1_to_v2(policy or {}), True
 
-    try:
-        PolicyV2.model_validate(data)
-        return {'ok': True, 'errors': [], 'version': 2, 'migrated': migrated, 'notes': notes}
-    except ValidationError as e:
-        # Flatten errors into readable strings
-        msgs: List[str] = []
-        for err in e.errors():
-            loc = '.'.join(str(x) for x in (err.get('loc') or []))
-            msg = err.get('msg') or 'invalid'
-            typ = err.get('type') or ''
-            if loc:
-                msgs.append(f"{loc}: {msg} ({typ})")
-            else:
-                msgs.append(msg)
-        return {'ok': False, 'errors': msgs, 'version': 2, 'migrated': migrated, 'notes': notes}
\ No newline at end of file
+
+def validate_policy_input(policy: Dict[str, Any], jobs: Optional[int] = 1) -> Dict[str, Any]:
+    """
+    Validate a supplied policy. Accepts v2 directly; migrates v1 in-memory first.
+    Returns: { ok: bool, errors: [str], version: 2, migrated?: bool, notes?: [str] }
+    """
+    data, migrated = to_v2(policy)
+    notes: List[str] = ['Migrated legacy v1 policy to v2 for validation'] if migrated else []
+    errors = validate_v2(data, jobs=jobs)
+    return {'ok': not errors, 'errors': errors, 'version': 2, 'migrated': migrated, 'notes': notes}
@@ -0,0 +1,98 @@
+"""
+Compact in-memory record types for readers that hold many audit or approval records.
+
+A parsed JSON line is a dict: a hash table plus its own copy of every key and string
+value, several hundred bytes per record. These classes keep the common fields in
+__slots__ and intern the low-cardinality strings (status, tool, action, ...), so every
+record shares one "pending" or "refunds.refund" object. A field missing from the line
+holds a shared sentinel rather than None, so to_dict() gives back the same keys;
+fields outside the slots go into `extra` (or are dropped with keep_extra=False, for
+readers that only aggregate). get() and [] make them drop-in for read-only dict use.
+"""
+import sys
+from typing import Any, Dict, FrozenSet, Optional, Tuple, Type, TypeVar, Union
+
+_MISSING = object()
+_R = TypeVar("_R", bound="Record")
+
+
+class Record:
+    __slots__ = ("extra",)
+    FIELDS: Tuple[str, ...] = ()
+    INTERNED: FrozenSet[str] = frozenset()
+
+    extra: Optional[Dict[str, Any]]
+    _KEYS: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._KEYS = frozenset(cls.FIELDS)
+
+    @classmethod
+    def from_dict(cls: Type[_R], d: Dict[str, Any], keep_extra: bool = True) -> _R:
+        rec = cls.__new__(cls)
+        fields, interned = cls._KEYS, cls.INTERNED
+        extra = None
+        n = 0
+        for k, v in d.items():
+            if k in fields:
+                if k in interned and type(v) is str:
+                    v = sys.intern(v)
+                setattr(rec, k, v)
+                n += 1
+            elif keep_extra:
+                if extra is None:
+                    extra = {}
+                extra[k] = v
+        if n < len(fields):
+            for k in cls.FIELDS:
+                if k not in d:
+                    setattr(rec, k, _MISSING)
+        rec.extra = extra
+        return rec
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._KEYS:
+            v = getattr(self, key)
+            return default if v is _MISSING else v
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key: str) -> Any:
+        v = self.get(key, _MISSING)
+        if v is _MISSING:
+            raise KeyError(key)
+        return v
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {}
+        for k in self.FIELDS:
+            v = getattr(self, k)
+            if v is not _MISSING:
+                out[k] = v
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class ApprovalRecord(Record):
+    """One approvals.log line: {status, dry_run_id, approval_id, ts, ts_ms}."""
+    FIELDS = ("status", "dry_run_id", "approval_id", "ts", "ts_ms")
+    INTERNED = frozenset({"status"})
+    __slots__ = FIELDS
+
+
+class AuditRecord(Record):
+    """One audit.log line; the slots cover what enforce records and their rollups carry."""
+    FIELDS = ("action", "tool", "op", "status", "tenant", "amount_cents", "ts", "ts_ms", "trace_id",
+              "rule_id", "approval_id", "sample_rate", "count", "amount_cents_sum")
+    INTERNED = frozenset({"action", "tool", "op", "status", "tenant", "rule_id"})
+    __slots__ = FIELDS
+
+
+RecordLike = Union[Dict[str, Any], Record]
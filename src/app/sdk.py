@@ -0,0 +1,200 @@
+"""
+Embedded guard SDK for latency-critical Python agents.
+
+Decisions are made in-process against a locally cached, compiled copy of the
+server's policy (same evaluation code as guard.evaluate), so an allowed call
+costs microseconds instead of an HTTP round trip. The policy is refreshed in
+the background with a conditional GET (ETag / If-None-Match on
+/policy/effective) and audit events are shipped to /audit/batch in batches.
+Calls that need approval are sent to /guard/enforce so the server creates the
+pending approval exactly as it would for any other client.
+
+Usage:
+    from src.app.sdk import Guard, GuardDenied, guarded
+
+    guard = Guard("http://127.0.0.1:8000")
+
+    @guarded(tool="refunds.refund", op="refund", guard=guard)
+    def refund(charge_id: str, amount_cents: int) -> None: ...
+"""
+import atexit
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+import httpx
+
+from .guard import evaluate_compiled
+from .policy import compile_policy
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class GuardDenied(Exception):
+    """Raised by @guarded when the decision is not 'allowed'; carries the decision dict."""
+
+    def __init__(self, decision: Dict[str, Any]) -> None:
+        super().__init__(f"{decision.get('status')}: {'; '.join(decision.get('reasons') or [])}")
+        self.decision = decision
+
+
+class Guard:
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8000",
+        refresh_s: float = 30.0,
+        flush_s: float = 1.0,
+        batch_size: int = 500,
+        client: Optional[httpx.Client] = None,
+        background: bool = True,
+        tenant: Optional[str] = None,
+    ) -> None:
+        self._http = client or httpx.Client(base_url=base_url, timeout=5.0)
+        self.tenant = tenant
+        if tenant is not None:  # the server then serves and enforces this tenant's policy
+            self._http.headers["X-Aegis-Tenant"] = tenant
+        self.refresh_s = refresh_s
+        self.flush_s = flush_s
+        self.batch_size = batch_size
+        self._etag: Optional[str] = None
+        self._policy: Any = None
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refresh()
+        if background:
+            self._thread = threading.Thread(target=self._run, name="aegis-guard", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # ---- policy ----
+    def refresh(self) -> bool:
+        """Conditional GET of the effective policy; returns True if a new policy was installed."""
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        r = self._http.get("/policy/effective", headers=headers)
+        if r.status_code == 304:
+            return False
+        r.raise_for_status()
+        self._policy = compile_policy(r.json())
+        self._etag = r.headers.get("etag")
+        return True
+
+    # ---- decisions ----
+    def check(
+        self,
+        tool: str,
+        amount_cents: Optional[int] = None,
+        op: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Same contract as enforcer.enforce: {allowed, approval_required, status, reasons, approval_id?}."""
+        res = evaluate_compiled(self._policy, tool, amount_cents=amount_cents, op=op, meta=meta)
+        if res.get("approval_required") or "window" in res:
+            # Needs a server-side pending approval (which also writes the audit record), or
+            # counts against a window_cap_cents total that only the server keeps
+            r = self._http.post("/guard/enforce", json={"tool": tool, "amount_cents": amount_cents, "op": op, "meta": meta})
+            r.raise_for_status()
+            return r.json()
+        allowed = bool(res.get("allowed"))
+        status = "allowed" if allowed else "blocked"
+        ms = time.time_ns() // 1_000_000
+        event = {
+            "action": "enforce",
+            "ok": allowed,
+            "tool": tool,
+            "op": op,
+            "amount_cents": amount_cents,
+            "status": status,
+            "ts": ms // 1000,
+            "ts_ms": ms,
+            "source": "sdk",
+        }
+        if self.tenant is not None:
+            event["tenant"] = self.tenant
+        with self._lock:
+            self._pending.append(event)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        return {"allowed": allowed, "approval_required": False, "status": status, "reasons": list(res.get("reasons", []))}
+
+    # ---- audit shipping ----
+    def flush(self) -> int:
+        """Ship queued audit events in one request; returns how many were sent."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            self._http.post("/audit/batch", json={"events": batch}).raise_for_status()
+        except httpx.HTTPError:
+            with self._lock:  # keep them for the next attempt, oldest first
+                self._pending[:0] = batch
+            raise
+        return len(batch)
+
+    def _run(self) -> None:
+        last_refresh = time.monotonic()
+        while not self._stop.wait(self.flush_s):
+            try:
+                self.flush()
+                if time.monotonic() - last_refresh >= self.refresh_s:
+                    last_refresh = time.monotonic()
+                    self.refresh()
+            except httpx.HTTPError:
+                pass  # server unreachable: keep deciding on the cached policy, retry next tick
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_s + 1)
+            self._thread = None
+        try:
+            self.flush()
+        except httpx.HTTPError:
+            pass
+
+
+_default: Optional[Guard] = None
+
+
+def default_guard() -> Guard:
+    """Process-wide Guard for @guarded without an explicit guard (AEGIS_URL or localhost)."""
+    global _default
+    if _default is None:
+        import os
+        _default = Guard(os.environ.get("AEGIS_URL", "http://127.0.0.1:8000"))
+    return _default
+
+
+def guarded(tool: str, op: Optional[str] = None, amount_arg: str = "amount_cents", guard: Optional[Guard] = None) -> Callable[[F], F]:
+    """Decorator: check the call with the guard first; raise GuardDenied unless allowed.
+    The amount is read from the wrapped function's `amount_arg` parameter when present.
+    """
+    def deco(fn: F) -> F:
+        sig = inspect.signature(fn)
+        has_amount = amount_arg in sig.parameters
+
+        def _check(args: Any, kwargs: Any) -> None:
+            amount = sig.bind_partial(*args, **kwargs).arguments.get(amount_arg) if has_amount else None
+            decision = (guard or default_guard()).check(tool, amount_cents=amount, op=op)
+            if decision["status"] != "allowed":
+                raise GuardDenied(decision)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args: Any, **kwargs: Any) -> Any:
+                _check(args, kwargs)
+                return await fn(*args, **kwargs)
+            return awrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            _check(args, kwargs)
+            return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+
+    return deco
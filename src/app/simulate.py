@@ -0,0 +1,228 @@
+"""
+Policy what-if simulation: replay audit 'enforce' records under the current and a
+candidate policy and report how many calls would flip between allowed, pending
+and blocked.
+
+Work is split across a process pool in two phases:
+  1) the audit log is cut into newline-aligned byte ranges; each worker parses its
+     range and returns per-(tool, op, amount_cents) counts plus one sample record;
+  2) the merged unique keys are evaluated under both policies in chunks.
+Deduplicating before evaluation means cost scales with distinct calls, not volume.
+Sampled records count sample_rate times; AUDIT_MODE=aggregate rollups count `count`
+times at their mean amount, which is approximate for amount-sensitive rules.
+
+Keys carry the record's tenant, which is passed as meta.tenant and (with POLICY_DIR,
+unless a current policy is given) picks that tenant's current policy. Nothing else
+about a call is recorded, so rules whose `when:` tests other meta keys see them as
+absent, and window_cap_cents rules are decided per call without running totals; the
+result lists such rules under `warnings` rather than pretending to replay them.
+"""
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .audit import calls_in
+from .guard import evaluate_compiled
+from .policy import compile_policy, load_policy, tenant_policy_path
+
+Key = Tuple[Optional[str], str, Optional[str], Optional[int]]  # (tenant, tool, op, amount_cents)
+
+_ENFORCE = b'"enforce'  # also matches "enforce_rollup"
+
+# Per-worker compiled policies for phase 2 (set by _init_eval); tenant currents load lazily
+_POLICIES: Tuple[Any, Any] = (None, None)
+_PER_TENANT = False
+_TENANT_CURRENT: Dict[str, Any] = {}
+
+
+def status_of(res: Dict[str, Any]) -> str:
+    if res.get("allowed"):
+        return "allowed"
+    return "pending" if res.get("approval_required") else "blocked"
+
+
+def split_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+    """Byte ranges [start, end) covering the file; workers realign to line starts."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    parts = max(1, min(parts, size))
+    step = -(-size // parts)
+    return [(s, min(s + step, size)) for s in range(0, size, step)]
+
+
+def scan_range(path: str, start: int, end: int) -> Tuple[Counter, Dict[Key, Dict[str, Any]], int]:
+    """Parse enforce records whose line *starts* in [start, end). Returns (counts, samples, records)."""
+    counts: Counter = Counter()
+    samples: Dict[Key, Dict[str, Any]] = {}
+    records = 0
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()  # finish the line that straddles `start`; it belongs to the previous range
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            if _ENFORCE not in line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            tool = rec.get("tool")
+            n = calls_in(rec)
+            if not n or not isinstance(tool, str):
+                continue
+            amount = rec.get("amount_cents")
+            if rec["action"] == "enforce_rollup":
+                total = rec.get("amount_cents_sum")
+                amount = total // n if isinstance(total, int) and total else None
+            tenant = rec.get("tenant")
+            key: Key = (tenant if isinstance(tenant, str) else None, tool, rec.get("op"), amount if isinstance(amount, int) else None)
+            counts[key] += n
+            records += 1
+            if key not in samples:
+                samples[key] = {"trace_id": rec.get("trace_id"), "ts": rec.get("ts"), "recorded_status": rec.get("status")}
+    return counts, samples, records
+
+
+def _scan_task(args: Tuple[str, int, int]) -> Tuple[Counter, Dict[Key, Dict[str, Any]], int]:
+    return scan_range(*args)
+
+
+def _tenant_current(tenant: Optional[str]) -> Optional[str]:
+    path = tenant_policy_path(tenant)
+    return path if path is not None and os.path.exists(path) else None
+
+
+def _init_eval(current: Dict[str, Any], candidate: Dict[str, Any], per_tenant: bool = False) -> None:
+    global _POLICIES, _PER_TENANT
+    _POLICIES = (compile_policy(current), compile_policy(candidate))
+    _PER_TENANT = per_tenant
+    _TENANT_CURRENT.clear()
+
+
+def _current_for(tenant: Optional[str]) -> Any:
+    path = _tenant_current(tenant) if _PER_TENANT else None
+    if path is None:
+        return _POLICIES[0]
+    p = _TENANT_CURRENT.get(path)
+    if p is None:
+        p = _TENANT_CURRENT[path] = compile_policy(load_policy(path))
+    return p
+
+
+def _eval_chunk(keys: List[Key]) -> List[Tuple[Key, str, str]]:
+    cand = _POLICIES[1]
+    out = []
+    for key in keys:
+        tenant, tool, op, amount = key
+        meta = {"tenant": tenant} if tenant is not None else None
+        out.append((
+            key,
+            status_of(evaluate_compiled(_current_for(tenant), tool, amount_cents=amount, op=op, meta=meta)),
+            status_of(evaluate_compiled(cand, tool, amount_cents=amount, op=op, meta=meta)),
+        ))
+    return out
+
+
+def unreplayable(raw: Dict[str, Any]) -> List[str]:
+    """Why some rules of a loaded policy cannot be replayed from audit records (see module doc)."""
+    if not isinstance(raw, dict) or raw.get("version") != 2:
+        return []
+    out = []
+    for i, rule in enumerate(raw.get("rules") or []):
+        if not isinstance(rule, dict):
+            continue
+        name = rule.get("id") or rule.get("match")
+        when = rule.get("when")
+        keys = sorted(k for k in when if k != "tenant") if isinstance(when, dict) else []
+        if keys:
+            out.append(f"rule {i} ({name}): when: tests meta {keys}, which audit records do not keep; evaluated as absent")
+        if rule.get("window_cap_cents") is not None:
+            out.append(f"rule {i} ({name}): window_cap_cents is not replayed; calls are decided against cap_cents only")
+    return out
+
+
+def simulate(
+    candidate_path: str,
+    audit_path: Optional[str] = None,
+    current_path: Optional[str] = None,
+    jobs: Optional[int] = None,
+    max_samples: int = 5,
+    chunk_size: int = 5000,
+) -> Dict[str, Any]:
+    """Diff decisions of the current vs candidate policy over the audit history."""
+    audit_path = audit_path or os.environ.get("AUDIT_PATH", "audit.log")
+    jobs = jobs or os.cpu_count() or 1
+    current = load_policy(current_path)
+    candidate = load_policy(candidate_path)
+
+    counts: Counter = Counter()
+    samples: Dict[Key, Dict[str, Any]] = {}
+    records = 0
+    ranges = split_ranges(audit_path, jobs * 4) if os.path.exists(audit_path) else []
+
+    def _merge(part: Tuple[Counter, Dict[Key, Dict[str, Any]], int]) -> None:
+        nonlocal records
+        c, s, n = part
+        counts.update(c)
+        for k, v in s.items():
+            samples.setdefault(k, v)
+        records += n
+
+    per_tenant = current_path is None
+    keys = []
+    if jobs == 1:
+        for start, end in ranges:
+            _merge(scan_range(audit_path, start, end))
+        keys = list(counts)
+        _init_eval(current, candidate, per_tenant)
+        evaluated = _eval_chunk(keys)
+    else:
+        with ProcessPoolExecutor(jobs, initializer=_init_eval, initargs=(current, candidate, per_tenant)) as pool:
+            for part in pool.map(_scan_task, [(audit_path, s, e) for s, e in ranges]):
+                _merge(part)
+            keys = list(counts)
+            chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+            evaluated = [row for rows in pool.map(_eval_chunk, chunks) for row in rows]
+
+    transitions: Counter = Counter()
+    unique_transitions: Counter = Counter()
+    examples: Dict[str, List[Dict[str, Any]]] = {}
+    for key, cur, cand in evaluated:
+        label = f"{cur}->{cand}"
+        transitions[label] += counts[key]
+        unique_transitions[label] += 1
+        if cur != cand:
+            bucket = examples.setdefault(label, [])
+            if len(bucket) < max_samples:
+                tenant, tool, op, amount = key
+                bucket.append({"tenant": tenant, "tool": tool, "op": op, "amount_cents": amount, "count": counts[key], **samples[key]})
+
+    warnings = [f"candidate {w}" for w in unreplayable(candidate)]
+    currents = {"current": current}
+    if per_tenant:
+        for tenant in sorted({k[0] for k in keys if k[0] is not None}):
+            path = _tenant_current(tenant)
+            if path is not None:
+                currents[f"current[{tenant}]"] = load_policy(path)
+    for label, raw in currents.items():
+        warnings.extend(f"{label} {w}" for w in unreplayable(raw))
+
+    flipped = sum(n for label, n in transitions.items() if label.split("->")[0] != label.split("->")[1])
+    return {
+        "audit_path": audit_path,
+        "records": records,
+        "unique_calls": len(keys),
+        "flipped": flipped,
+        "transitions": dict(sorted(transitions.items())),
+        "unique_transitions": dict(sorted(unique_transitions.items())),
+        "samples": examples,
+        "warnings": warnings,
+    }
@@ -0,0 +1,39 @@
+from typing import Dict, List
+
+
+def render_approvals(approvals: List[Dict]) -> str:
+    """Render the approvals table served at /ui/approvals."""
+    rows = []
+    for r in approvals:
+        did = r.get("dry_run_id", "")
+        pick = f"<input type='checkbox' class='pick' value='{did}' />" if r.get("status") == "pending" else ""
+        rows.append(
+            f"<tr>"
+            f"<td>{pick}</td>"
+            f"<td>{did}</td>"
+            f"<td>{r.get('status','')}</td>"
+            f"<td>{r.get('ts','')}</td>"
+            f"<td>{r.get('approval_id','')}</td>"
+            f"<td>"
+            f"<input id='code-{did}' placeholder='code' />"
+            f"<button onclick=\"fetch('/approvals/complete',{{method:'POST',headers:{{'Content-Type':'application/json'}},body:JSON.stringify({{dry_run_id:'{did}',approval_code:document.getElementById('code-{did}').value}})}}).then(()=>location.reload())\">Complete</button>"
+            f"</td>"
+            f"</tr>"
+        )
+    html = (
+        "<!doctype html><html><head><meta charset='utf-8'><title>Approvals</title></head>"
+        "<body><h1>Approvals</h1>"
+        "<p><input id='bulk-code' placeholder='code' /> "
+        "<button onclick=\"bulk('approved')\">Approve selected</button> "
+        "<button onclick=\"bulk('denied')\">Deny selected</button></p>"
+        "<script>function bulk(decision){"
+        "const ids=[...document.querySelectorAll('.pick:checked')].map(e=>e.value);"
+        "fetch('/approvals/complete/batch',{method:'POST',headers:{'Content-Type':'application/json'},"
+        "body:JSON.stringify({dry_run_ids:ids,approval_code:document.getElementById('bulk-code').value,decision:decision})})"
+        ".then(()=>location.reload())}</script>"
+        "<table border='1' cellpadding='6' cellspacing='0'>"
+        "<thead><tr><th><input type='checkbox' onclick=\"document.querySelectorAll('.pick').forEach(e=>e.checked=this.checked)\" /></th><th>dry_run_id</th><th>status</th><th>ts</th><th>approval_id</th><th>complete</th></tr></thead>"
+        "<tbody>" + "".join(rows) + "</tbody></table>"
+        "</body></html>"
+    )
+    return html
@@ -0,0 +1,235 @@
+"""
+Cumulative spend limits for v2 allow rules:
+
+    - match: "refunds.*"
+      decision: allow
+      cap_cents: 5000            # per call
+      window_cap_cents: 20000    # total allowed per window...
+      window: 1d                 # ...of this length (s/m/h/d, up to 31d; default 1d)
+      window_by: [tool, principal]   # one total per tool name and principal (default)
+
+The principal is the caller identity the server was given by a trusted gateway (the
+X-Aegis-Principal header), never meta.principal, which the caller controls; without
+one, calls share the rule's total. Likewise the tenant part of the key is only set
+when the tenant has its own policy file, so made-up tenant names share the default's.
+
+Each (tenant, rule, window, tool?, principal?) key has a ring of BUCKETS counters,
+one per window/BUCKETS slice of time, plus a running total. Advancing the ring clears
+at most BUCKETS slots, so a check costs the same regardless of traffic; the price is
+that spend leaves the window one bucket (1/60th of it) at a time.
+
+/guard/check only reads the totals. enforce() checks and adds atomically (reserve) and
+writes the key into the audit record, so the totals are rebuilt from audit.log at startup
+by scanning it backwards until records are older than MAX_WINDOW_S (31 days). Tenant
+policies load lazily, so the longest window in use is not known at that point. Only
+allowed calls count; calls escalated to an approval do not.
+
+At most MAX_KEYS totals are kept. When the map is full, totals whose window has gone
+quiet are dropped (at most once per PRUNE_EVERY_S); if none can be, a call needing a
+new total is escalated to review rather than evicting someone else's. Totals live in
+process memory: with several server workers, each enforces its own copy of the cap.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ids import SLACK_MS
+from .logscan import line_ts, lines_backward
+
+BUCKETS = 60
+MAX_WINDOW_S = 31 * 86400
+MAX_KEYS = 100_000
+PRUNE_EVERY_S = 1.0
+FULL = -1  # reserve()'s total when no new key could be tracked
+DEFAULT_WINDOW = '1d'
+WINDOW_BY = ('tool', 'principal')
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_WINDOW_RE = re.compile(r'([1-9][0-9]*)([smhd])\Z')
+
+Key = Tuple[Any, ...]
+
+
+def parse_window(text: str) -> int:
+    """'15m' -> 900. Raises ValueError for anything else or windows over MAX_WINDOW_S."""
+    m = _WINDOW_RE.match(text) if isinstance(text, str) else None
+    if m is None:
+        raise ValueError(f"window must look like 30s, 15m, 12h or 1d, got {text!r}")
+    seconds = int(m.group(1)) * _UNITS[m.group(2)]
+    if seconds > MAX_WINDOW_S:
+        raise ValueError('window must be at most 31d')
+    return seconds
+
+
+class SlidingWindow:
+    """Ring of bucket totals covering the last `window_s` seconds."""
+
+    __slots__ = ('width', 'counts', 'head', 'total')
+
+    def __init__(self, window_s: int, buckets: int = BUCKETS) -> None:
+        self.width = window_s / buckets
+        self.counts = [0] * buckets
+        self.head: Optional[int] = None  # bucket epoch of the newest slot
+        self.total = 0
+
+    def _advance(self, epoch: int) -> None:
+        head = self.head
+        if head is None or epoch - head >= len(self.counts):
+            self.counts = [0] * len(self.counts)
+            self.total = 0
+        elif epoch > head:
+            n = len(self.counts)
+            for e in range(head + 1, epoch + 1):
+                i = e % n
+                self.total -= self.counts[i]
+                self.counts[i] = 0
+        else:
+            return
+        self.head = epoch
+
+    def spent(self, now: float) -> int:
+        self._advance(int(now // self.width))
+        return self.total
+
+    def add(self, amount: int, now: float) -> None:
+        epoch = int(now // self.width)
+        if self.head is None or epoch > self.head:
+            self._advance(epoch)
+        elif epoch <= self.head - len(self.counts):
+            return  # already outside the window
+        self.counts[epoch % len(self.counts)] += amount
+        self.total += amount
+
+
+_WINDOWS: Dict[Key, SlidingWindow] = {}
+_LOCK = threading.Lock()
+_PRUNED_AT = [float('-inf')]
+
+
+def key_for(spec: Dict[str, Any], tool: str, meta: Optional[Dict[str, Any]], principal: Optional[str] = None) -> Key:
+    """Counter key for a rule's window spec (see engine_v2.CompiledRule.window) and one call.
+    `principal` must come from the server's side (see module doc), not from `meta`."""
+    m = meta if isinstance(meta, dict) else {}
+    by = spec['by']
+    return (
+        _tenant(m.get('tenant')),
+        spec['rule'],
+        spec['window_s'],
+        tool if 'tool' in by else None,
+        principal if 'principal' in by else None,
+    )
+
+
+def _tenant(tenant: Any) -> Optional[str]:
+    from .policy import tenant_policy_path
+
+    path = tenant_policy_path(tenant)
+    return tenant if path is not None and os.path.exists(path) else None
+
+
+def _window(key: Key, now: float) -> Optional[SlidingWindow]:
+    w = _WINDOWS.get(key)
+    if w is None:
+        if len(_WINDOWS) >= MAX_KEYS:
+            if now - _PRUNED_AT[0] < PRUNE_EVERY_S:
+                return None
+            _PRUNED_AT[0] = now
+            _prune(now)
+            if len(_WINDOWS) >= MAX_KEYS:
+                return None
+        w = _WINDOWS[key] = SlidingWindow(key[2])
+    return w
+
+
+def _prune(now: float) -> None:
+    for k in [k for k, w in _WINDOWS.items() if not w.spent(now)]:
+        del _WINDOWS[k]
+
+
+def spent(key: Key, now: Optional[float] = None) -> int:
+    with _LOCK:
+        w = _WINDOWS.get(key)
+        return 0 if w is None else w.spent(time.time() if now is None else now)
+
+
+def reserve(key: Key, amount: int, cap: int, now: Optional[float] = None) -> Tuple[bool, int]:
+    """Add `amount` unless that would take the window total over `cap`; returns (added, total before).
+    A key that cannot be tracked because MAX_KEYS totals are live returns (False, FULL)."""
+    now = time.time() if now is None else now
+    with _LOCK:
+        w = _window(key, now)
+        if w is None:
+            return False, FULL
+        total = w.spent(now)
+        if total + amount > cap:
+            return False, total
+        w.add(amount, now)
+        return True, total
+
+
+def exceeded(res: Dict[str, Any], amount_cents: int, total: int) -> Dict[str, Any]:
+    """Escalate an allow decision whose window cap would be exceeded to review."""
+    spec = res['window']
+    if total == FULL:
+        reason = f"Too many live window totals (over {MAX_KEYS}) to track this call against '{spec['rule']}'"
+    else:
+        reason = (f"Amount {amount_cents} would bring the {spec['window']} total for '{spec['rule']}' to "
+                  f"{total + amount_cents}, over window_cap_cents {spec['cap_cents']}")
+    return {
+        'allowed': False,
+        'approval_required': True,
+        'reasons': [reason],
+        'rule_index': res.get('rule_index'),
+        'rule_id': res.get('rule_id'),
+    }
+
+
+def apply(
+    res: Dict[str, Any], tool: str, amount_cents: Optional[int], meta: Optional[Dict[str, Any]], principal: Optional[str] = None
+) -> Dict[str, Any]:
+    """Read-only window check for an evaluate() result: escalates when the cap would be
+    exceeded, else tags the result with its counter key for enforce() to reserve."""
+    spec = res.get('window')
+    if spec is None or amount_cents is None:
+        return res
+    key = key_for(spec, tool, meta, principal)
+    total = spent(key)
+    if total + amount_cents > spec['cap_cents']:
+        return exceeded(res, amount_cents, total)
+    res['window_key'] = key
+    return res
+
+
+def rebuild(audit_path: Optional[str] = None, now: Optional[float] = None) -> int:
+    """Reload window totals from allowed enforce records in the audit log; returns records counted."""
+    path = audit_path or os.environ.get('AUDIT_PATH', 'audit.log')
+    now = time.time() if now is None else now
+    horizon = now - MAX_WINDOW_S - SLACK_MS / 1000  # ts is stamped before the writer appends, so lines may trail
+    records: List[Tuple[int, Key, int]] = []
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            for line in lines_backward(f, os.fstat(f.fileno()).st_size):
+                line_time = line_ts(line)
+                if line_time is not None and line_time < horizon:
+                    break
+                if b'"window_key"' not in line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                key, amount, ts = rec.get('window_key'), rec.get('amount_cents'), rec.get('ts')
+                if rec.get('status') == 'allowed' and isinstance(key, list) and len(key) == 5 and isinstance(amount, int) and isinstance(ts, int):
+                    records.append((ts, tuple(key), amount))
+    with _LOCK:
+        _WINDOWS.clear()
+        _PRUNED_AT[0] = float('-inf')
+        for ts, key, amount in reversed(records):
+            if ts > now - key[2]:
+                w = _window(key, now)
+                if w is not None:
+                    w.add(amount, ts)
+    return len(records)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from itertools import groupby
+from typing import Dict, List, Tuple
+
+from . import chain
+
+# Background JSONL appender shared by audit.log and approvals.log.
+# Callers hand over finished lines and get a Future that resolves once they are
+# on disk. One daemon thread per file drains everything queued so far and writes
+# it with a single append (group commit), so concurrent callers share one write.
+# A writer that stays idle for IDLE_SECONDS retires; the next append starts a new one.
+# Lines queued with chained=True are hash-chained (see chain.py) here, once per batch,
+# so the hashing stays off the callers' threads.
+
+IDLE_SECONDS = 5.0
+
+_Batch = Tuple[List[str], "Future[int]", bool]
+
+_WRITERS: Dict[str, "AppendWriter"] = {}
+_LOCK = threading.Lock()
+
+
+class AppendWriter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._q: "queue.SimpleQueue[_Batch]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f"append-writer:{path}", daemon=True)
+        self._thread.start()
+
+    def _put(self, lines: List[str], chained: bool) -> "Future[int]":
+        fut: "Future[int]" = Future()
+        self._q.put((lines, fut, chained))
+        return fut
+
+    def _retire(self) -> bool:
+        # Submissions enqueue under _LOCK, so an empty queue here means nobody can still be handing us work
+        with _LOCK:
+            if not self._q.empty():
+                return False
+            if _WRITERS.get(self.path) is self:
+                del _WRITERS[self.path]
+            return True
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._q.get(timeout=IDLE_SECONDS)
+            except queue.Empty:
+                if self._retire():
+                    return
+                continue
+            batch = [first]
+            while True:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for chained, run in groupby(batch, key=lambda b: b[2]):
+                    lines = [line for item in run for line in item[0]]
+                    if chained:
+                        chain.append(self.path, lines)
+                    else:
+                        with open(self.path, "a", encoding="utf-8") as f:
+                            f.write("".join(lines))
+            except Exception as e:  # surface I/O errors to every waiter
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            for lines, fut, _ in batch:
+                fut.set_result(len(lines))
+
+
+def _reset() -> None:
+    # A forked child inherits the registry but not the writer threads behind it
+    global _LOCK
+    _LOCK = threading.Lock()
+    _WRITERS.clear()
+
+
+os.register_at_fork(after_in_child=_reset)
+
+
+def append_lines(path: str, lines: List[str], chained: bool = False) -> "Future[int]":
+    """Queue newline-terminated lines for `path`; the Future yields the count written.
+    chained=True seals them onto the file's hash chain (one JSON object per line)."""
+    with _LOCK:
+        w = _WRITERS.get(path)
+        if w is None:
+            w = _WRITERS[path] = AppendWriter(path)
+        return w._put(lines, chained)
+
+
+async def wait(*futures: "Future[int]") -> None:
+    """Await writer futures from async code without blocking the event loop."""
+    await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
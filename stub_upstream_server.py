@@ -0,0 +1,30 @@
+"""
+Stand-in upstream MCP server (stdio) for exercising mcp_proxy.py locally.
+Exposes a few tools named like real ones; each just echoes its arguments.
+"""
+from typing import Optional
+
+from fastmcp import FastMCP
+
+upstream = FastMCP("stub-upstream")
+
+
+def refund(amount_cents: Optional[int] = None, op: Optional[str] = None) -> dict:
+    return {"executed": "refunds.refund", "amount_cents": amount_cents, "op": op}
+
+
+def payment_link(amount_cents: Optional[int] = None, op: Optional[str] = None) -> dict:
+    return {"executed": "payment_links.create", "amount_cents": amount_cents, "op": op}
+
+
+def nuke() -> dict:
+    return {"executed": "admin.nuke"}
+
+
+upstream.tool(refund, name="refunds.refund")
+upstream.tool(payment_link, name="payment_links.create")
+upstream.tool(nuke, name="admin.nuke")
+
+
+if __name__ == "__main__":
+    upstream.run(show_banner=False)
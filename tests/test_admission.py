@@ -0,0 +1,105 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from src.app.admission import Admission, admitted
+from src.app.main import create_app
+
+
+def test_gate_queues_then_sheds():
+    async def scenario():
+        gate = Admission(max_inflight=1, max_queue=1, queue_timeout_s=5)
+        assert await gate.acquire() is True
+        waiter = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        assert gate.stats()['waiting'] == 1
+        assert await gate.acquire() is False  # queue full: shed at once
+        gate.release()                        # the slot passes to the waiter
+        assert await waiter is True
+        assert gate.inflight == 1
+        gate.release()
+        return gate.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['inflight'] == 0 and stats['waiting'] == 0 and stats['admitted'] == 2
+    assert stats['shed'] == {'queue_full': 1, 'timeout': 0}
+    assert stats['queue_wait_ms']['count'] == 1 and sum(stats['queue_wait_ms']['histogram'].values()) == 1
+
+
+def test_queue_timeout_sheds_fail_closed():
+    async def scenario():
+        gate = Admission(max_inflight=1, max_queue=4, queue_timeout_s=0.01, shed_status='pending')
+        await gate.acquire()
+
+        async def call():
+            return {'status': 'allowed'}
+
+        res = await admitted(gate, call)
+        gate.release()
+        return gate, res
+
+    gate, res = asyncio.run(scenario())
+    assert res['shed'] is True and res['status'] == 'pending' and res['allowed'] is False
+    assert gate.stats()['shed']['timeout'] == 1 and gate.inflight == 0 and not gate._waiters
+
+
+def test_overloaded_server_sheds_without_audit(tmp_path, monkeypatch):
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+    monkeypatch.setenv('ADMISSION_MAX_INFLIGHT', '0')
+    monkeypatch.setenv('ADMISSION_MAX_QUEUE', '0')
+    client = TestClient(create_app())
+    r = client.post('/guard/enforce', json={'tool': 'payments.create', 'amount_cents': 1})
+    assert r.status_code == 200 and r.headers['retry-after'] == '1'
+    assert r.json()['status'] == 'blocked' and r.json()['shed'] is True
+    assert not (tmp_path / 'audit.log').exists()
+    metrics = client.get('/metrics/admission').json()
+    assert metrics['shed']['queue_full'] == 1 and metrics['admitted'] == 0
+
+
+def test_enforce_is_admitted_normally(tmp_path, monkeypatch, app_client):
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+    before = app_client.get('/metrics/admission').json()['admitted']
+    r = app_client.post('/guard/enforce', json={'tool': 'payments.create', 'amount_cents': 1})
+    assert r.json()['shed'] is False and 'retry-after' not in r.headers
+    metrics = app_client.get('/metrics/admission').json()
+    assert metrics['admitted'] == before + 1 and metrics['inflight'] == 0
+
+
+def test_slow_policy_load_does_not_stall_the_loop(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    import httpx
+
+    from src.app import guard
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+    monkeypatch.setenv('ADMISSION_MAX_INFLIGHT', '1')
+    monkeypatch.setenv('ADMISSION_MAX_QUEUE', '0')
+    entered, release = threading.Event(), threading.Event()
+    load = guard.load_compiled_policy
+
+    def slow_load():
+        entered.set()
+        release.wait(5)  # a big policy being re-parsed and compiled
+        return load()
+
+    monkeypatch.setattr(guard, 'load_compiled_policy', slow_load)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app()), base_url='http://t') as c:
+            body = {'tool': 'payments.create', 'amount_cents': 1}
+            t0 = time.perf_counter()
+            slow = asyncio.ensure_future(c.post('/guard/enforce', json=body))
+            await asyncio.to_thread(entered.wait, 5)
+            health = await c.get('/health')
+            shed = await c.post('/guard/enforce', json=body)
+            elapsed = time.perf_counter() - t0
+            release.set()
+            return health, shed, await slow, elapsed
+
+    health, shed, slow, elapsed = asyncio.run(scenario())
+    assert elapsed < 2 and health.status_code == 200
+    assert shed.json()['shed'] is True and slow.json()['shed'] is False
@@ -1,3 +1,4 @@
+import json
 import os
 
 import pytest
@@ -111,4 +112,106 @@ def test_ui_page_serves_html(tmp_path, monkeypatch):
     r = client.get("/ui/approvals")
     assert r.status_code == 200  # will FAIL until endpoint exists
     assert "text/html" in r.headers.get("content-type", "").lower()
-    assert "<table" in r.text.lower()
\ No newline at end of file
+    assert "<table" in r.text.lower()
+
+def test_complete_batch(tmp_path, monkeypatch):
+    approvals_path, audit_path = _setup_env(tmp_path, monkeypatch)
+    from mcp_server import require_approval
+    for i in range(5):
+        require_approval(f"dry-b-{i}")
+    require_approval("dry-b-0", approval_code="123456")  # already approved
+
+    from src.app.main import app
+    client = TestClient(app)
+    ids = [f"dry-b-{i}" for i in range(5)] + ["dry-b-1", "dry-nope"]
+    r = client.post("/approvals/complete/batch", json={"dry_run_ids": ids, "approval_code": "000000"})
+    assert r.status_code == 403 and r.json()["ok"] is False  # a wrong code completes nothing
+    lines_before = approvals_path.read_text().count("\n")
+
+    r = client.post("/approvals/complete/batch", json={"dry_run_ids": ids, "approval_code": "123456"})
+    body = r.json()
+    assert r.status_code == 200 and body["ok"] is True and body["status"] == "approved"
+    assert [c["dry_run_id"] for c in body["completed"]] == ["dry-b-1", "dry-b-2", "dry-b-3", "dry-b-4"]
+    assert body["skipped"] == [{"dry_run_id": "dry-b-0", "reason": "already approved"},
+                               {"dry_run_id": "dry-nope", "reason": "unknown dry_run_id"}]
+    assert approvals_path.read_text().count("\n") == lines_before + 4
+    traces = {c["trace_id"] for c in body["completed"]}
+    audit = [json.loads(x) for x in audit_path.read_text().splitlines()]
+    assert {a["trace_id"] for a in audit if a.get("approval_id")} == traces
+
+    # a second batch finds nothing left to complete; deny works the same way
+    again = client.post("/approvals/complete/batch", json={"dry_run_ids": ids[1:5], "approval_code": "123456", "decision": "denied"}).json()
+    assert again["completed"] == [] and {s["reason"] for s in again["skipped"]} == {"already approved"}
+    require_approval("dry-b-9")
+    denied = client.post("/approvals/complete/batch", json={"dry_run_ids": ["dry-b-9"], "approval_code": "123456", "decision": "denied"}).json()
+    assert denied["completed"][0]["dry_run_id"] == "dry-b-9" and "trace_id" not in denied["completed"][0]
+    assert not [a for a in client.get("/approvals").json()["approvals"] if a["status"] == "pending"]
+
+
+def test_complete_batch_mcp_tool(tmp_path, monkeypatch):
+    import asyncio
+
+    from fastmcp import Client
+
+    import mcp_server
+    _setup_env(tmp_path, monkeypatch)
+    for i in range(300):
+        mcp_server.require_approval(f"dry-m-{i}")
+
+    async def run():
+        async with Client(mcp_server.mcp) as c:
+            ids = [f"dry-m-{i}" for i in range(300)]
+            return await asyncio.gather(*(c.call_tool("complete_approvals", {"dry_run_ids": ids, "approval_code": "123456"})
+                                          for _ in range(3)))
+
+    results = [json.loads(r.content[0].text) for r in asyncio.run(run())]
+    assert sorted(len(r["completed"]) for r in results) == [0, 0, 300]  # racing batches complete each id once
+
+
+def test_status_index_holds_pending_and_rolls_back_failed_writes(tmp_path, monkeypatch):
+    from concurrent.futures import Future
+
+    from src.app import approvals
+    approvals_path, _ = _setup_env(tmp_path, monkeypatch)
+    monkeypatch.setattr(approvals, "RECENT_DONE", 3)
+    lines = [("pending", i) for i in range(10)] + [("approved", i) for i in range(8)] + [("pending", 18)]
+    approvals_path.write_text("".join(json.dumps({"status": s, "dry_run_id": f"d{i}", "approval_id": f"a{n}", "ts": n}) + "\n"
+                                      for n, (s, i) in enumerate(lines)))
+    recs, skipped, fut = approvals.submit_completions(["d8", "d9"], "approved", str(approvals_path))
+    fut.result()
+    index = approvals._STATUS[str(approvals_path)]
+    assert index.pending == {"d18"} and len(index.done) == 3  # d8, d9 and the newest completed id
+    assert [s["reason"] for s in approvals.submit_completions(["d9", "d0"], "denied", str(approvals_path))[1]] == [
+        "already approved", "unknown dry_run_id"]  # d0 aged out of the recent window
+
+    def failing(path, lines, chained=False):
+        f = Future()
+        f.set_exception(OSError("disk full"))
+        return f
+
+    monkeypatch.setattr(approvals, "append_lines", failing)
+    recs, _, fut = approvals.submit_completions(["d18"], "approved", str(approvals_path))
+    assert [r["dry_run_id"] for r in recs] == ["d18"] and isinstance(fut.exception(), OSError)
+    assert index.status("d18") == "pending"  # never written, so still pending
+
+
+def test_failed_batch_larger_than_recent_done_is_pending_again(tmp_path, monkeypatch):
+    from concurrent.futures import Future
+
+    from src.app import approvals
+    approvals_path, _ = _setup_env(tmp_path, monkeypatch)
+    monkeypatch.setattr(approvals, "RECENT_DONE", 3)
+    ids = [f"d{i}" for i in range(6)]
+    approvals_path.write_text("".join(json.dumps({"status": "pending", "dry_run_id": d, "approval_id": f"a{i}", "ts": i}) + "\n"
+                                      for i, d in enumerate(ids)))
+
+    def failing(path, lines, chained=False):
+        f = Future()
+        f.set_exception(OSError("disk full"))
+        return f
+
+    monkeypatch.setattr(approvals, "append_lines", failing)
+    recs, _, fut = approvals.submit_completions(ids, "approved", str(approvals_path))
+    assert len(recs) == 6 and isinstance(fut.exception(), OSError)
+    index = approvals._STATUS[str(approvals_path)]
+    assert index.pending == set(ids)  # d0-d2 had already been pushed out of `done` by the batch itself
@@ -0,0 +1,91 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.app import archive  # noqa: E402
+
+RECORDS = [
+    {'action': 'enforce', 'tool': 'refunds.create', 'op': 'refund', 'amount_cents': 500, 'status': 'pending', 'ts': 100},
+    {'action': 'enforce', 'tool': 'refunds.create', 'op': 'refund', 'amount_cents': 700, 'status': 'pending', 'ts': 200, 'tenant': 'acme'},
+    {'action': 'enforce', 'tool': 'refunds.void', 'amount_cents': 300, 'status': 'allowed', 'ts': 300, 'sample_rate': 10},
+    {'action': 'enforce_rollup', 'tool': 'refunds.void', 'op': None, 'status': 'allowed', 'count': 4, 'amount_cents_sum': 90, 'since': 250, 'ts': 310},
+    {'action': 'enforce', 'tool': 'admin.drop', 'status': 'blocked', 'ts': 400},
+    {'action': 'approval_complete', 'note': 'ok', 'ts': 500},
+]
+
+
+def _write(path, records, tail=''):
+    with open(path, 'a') as f:
+        for r in records:
+            f.write(json.dumps(r) + '\n')
+        f.write(tail)
+
+
+QUERIES = [
+    (['tool', 'status'], {}, None, None),
+    (['status'], {'tool': 'refunds.*'}, 150, None),
+    (['tenant'], {'action': 'enforce'}, None, 400),
+    (['action'], {'status': 'pending', 'tool': 'refunds.create'}, None, None),
+]
+
+
+@pytest.mark.parametrize('fmt', ['npz', 'parquet'])
+def test_archive_matches_jsonl_scan(tmp_path, fmt):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    log = tmp_path / 'audit.log'
+    _write(log, RECORDS, tail='not json\n{"action": "enforce", "tool": "half')  # last line still being written
+    out = str(tmp_path / 'archive')
+    res = archive.archive(str(log), out, fmt=fmt, max_rows=4)
+    assert res['rows'] == 6 and len(res['segments']) == 2
+    assert res['offset'] == log.stat().st_size - len('{"action": "enforce", "tool": "half')
+
+    rows = archive.query(out, ['tool', 'status'])
+    assert rows[0] == {'tool': 'refunds.void', 'status': 'allowed', 'records': 2, 'calls': 14, 'amount_cents': 3090}
+    for group_by, where, since, until in QUERIES:
+        assert archive.query(out, group_by, where, since, until) == archive.scan_jsonl(str(log), group_by, where, since, until)
+
+
+def test_archive_is_incremental(tmp_path):
+    log = tmp_path / 'audit.log'
+    _write(log, RECORDS[:2])
+    out = str(tmp_path / 'archive')
+    archive.archive(str(log), out, fmt='npz')
+    assert archive.archive(str(log), out, fmt='npz')['rows'] == 0
+    _write(log, RECORDS[2:])
+    res = archive.archive(str(log), out, fmt='npz')
+    assert res['rows'] == 4 and res['segments'][0]['start'] > 0
+    assert archive.query(out, ['status'], {'tool': 'refunds.create'}) == [
+        {'status': 'pending', 'records': 2, 'calls': 2, 'amount_cents': 1200}]
+    # segments outside the time range are skipped without being read
+    (tmp_path / 'archive' / res['segments'][0]['file']).unlink()
+    assert archive.query(out, ['tool'], since=0, until=250)[0]['calls'] == 2
+    with pytest.raises(ValueError, match='unknown column'):
+        archive.query(out, ['trace_id'])
+
+
+def test_cli_archive_and_query(tmp_path):
+    log = tmp_path / 'audit.log'
+    _write(log, RECORDS)
+    out = tmp_path / 'archive'
+    proc = subprocess.run([sys.executable, 'tools/cli.py', 'audit-archive', str(log), str(out), '--format', 'npz'],
+                          capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    proc = subprocess.run([sys.executable, 'tools/cli.py', 'audit-query', str(out), '--by', 'tool',
+                           '--where', 'status=pending', '--json'], capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout) == [{'tool': 'refunds.create', 'records': 2, 'calls': 2, 'amount_cents': 1200}]
+
+
+def test_group_ids_do_not_wrap_past_int64():
+    codes = [np.array([1, 0, 1]), np.array([0, 0, 0]), np.array([1, 1, 1])]
+    radices = [2 ** 32] * 3  # mixed-radix ids would wrap: rows 0 and 1 would share one
+    key, decode = archive._group_ids(codes, radices, 3)
+    assert key[0] == key[2] != key[1]
+    assert decode(int(key[0])) == [1, 0, 1] and decode(int(key[1])) == [0, 0, 1]
+    key, decode = archive._group_ids(codes, [2, 1, 2], 3)
+    assert key[0] == key[2] != key[1] and decode(int(key[1])) == [0, 0, 1]
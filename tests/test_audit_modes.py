@@ -0,0 +1,91 @@
+import json
+import time
+
+import pytest
+
+from src.app import audit
+from src.app.audit import calls_in, flush_rollups, submit_many
+from src.app.enforcer import enforce
+from src.app.simulate import simulate
+
+POLICY = 'version: 2\nrules:\n  - {match: "refunds.*", decision: allow, cap_cents: 5000}\n  - {match: "admin.*", decision: deny}\n'
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    p = tmp_path / 'policy.yml'
+    p.write_text(POLICY, encoding='utf-8')
+    monkeypatch.setenv('POLICY_PATH', str(p))
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+    monkeypatch.setattr(audit, '_SAMPLED', {})
+    monkeypatch.setattr(audit, '_ROLLUP', {})
+    return tmp_path
+
+
+def _records(env):
+    path = env / 'audit.log'
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_sample_mode_keeps_one_in_n_allowed(env, monkeypatch):
+    monkeypatch.setenv('AUDIT_MODE', 'sample')
+    monkeypatch.setenv('AUDIT_SAMPLE_N', '10')
+    for _ in range(25):
+        enforce('refunds.create', 100)
+    enforce('refunds.create', 9000)  # pending: always written
+    enforce('admin.drop')            # blocked: always written
+    recs = _records(env)
+    allowed = [r for r in recs if r['status'] == 'allowed']
+    assert len(allowed) == 3 and all(r['sample_rate'] == 10 for r in allowed)
+    assert sorted(r['status'] for r in recs if r['status'] != 'allowed') == ['blocked', 'pending']
+    assert sum(calls_in(r) for r in recs) == 32  # 25 allowed, within one sample period
+
+
+def test_aggregate_mode_rolls_up_counts_and_amounts(env, monkeypatch):
+    monkeypatch.setenv('AUDIT_MODE', 'aggregate')
+    monkeypatch.setenv('AUDIT_ROLLUP_S', '3600')
+    for amount in (100, 200, 300):
+        enforce('refunds.create', amount, op='refund')
+    submit_many([{'action': 'enforce', 'tool': 'refunds.sdk', 'status': 'allowed', 'amount_cents': 50}] * 4)
+    enforce('admin.drop')
+    assert [r['status'] for r in _records(env)] == ['blocked']
+    assert flush_rollups().result() == 2
+    rollups = {r['tool']: r for r in _records(env) if r['action'] == 'enforce_rollup'}
+    assert rollups['refunds.create']['count'] == 3 and rollups['refunds.create']['amount_cents_sum'] == 600
+    assert rollups['refunds.create']['op'] == 'refund'
+    assert rollups['refunds.sdk']['count'] == 4 and rollups['refunds.sdk']['amount_cents_sum'] == 200
+    assert flush_rollups().result() == 0
+
+    # totals stay reconstructable for readers of the log
+    candidate = env / 'candidate.yml'
+    candidate.write_text('version: 2\nrules:\n  - {match: "*", decision: deny}\n', encoding='utf-8')
+    res = simulate(str(candidate), audit_path=str(env / 'audit.log'), current_path=str(env / 'policy.yml'), jobs=1)
+    assert res['transitions']['allowed->blocked'] == 7
+
+
+def test_rollups_flush_on_a_timer(env, monkeypatch):
+    monkeypatch.setenv('AUDIT_MODE', 'aggregate')
+    monkeypatch.setenv('AUDIT_ROLLUP_S', '0.05')
+    enforce('refunds.create', 100)
+    deadline = time.time() + 5
+    while not _records(env) and time.time() < deadline:
+        time.sleep(0.02)
+    assert [r['action'] for r in _records(env)] == ['enforce_rollup']
+
+
+@pytest.mark.parametrize('name,value', [('AUDIT_SAMPLE_N', '0'), ('AUDIT_SAMPLE_N', '-5'), ('AUDIT_SAMPLE_N', 'ten'),
+                                        ('AUDIT_MODE', 'sampled'), ('AUDIT_ROLLUP_S', '0')])
+def test_bad_settings_are_rejected_at_startup(env, monkeypatch, name, value):
+    from fastapi.testclient import TestClient
+
+    from src.app.main import create_app
+
+    monkeypatch.setenv('AUDIT_MODE', 'sample')
+    monkeypatch.setenv(name, value)
+    with pytest.raises(ValueError, match=name):
+        with TestClient(create_app()):
+            pass
+    monkeypatch.setenv(name, {'AUDIT_MODE': 'sample', 'AUDIT_SAMPLE_N': '2', 'AUDIT_ROLLUP_S': '5'}[name])
+    assert audit.config()[0] == 'sample'
+    enforce('refunds.create', 100)  # and the hot path works again once fixed
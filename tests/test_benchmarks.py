@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+import bench_policy  # noqa: E402
+from compare import compare  # noqa: E402
+from harness import latency_result, measure, throughput_result  # noqa: E402
+
+
+def test_measure_reports_stats():
+    stats = measure(lambda: None, min_time=0.01, repeat=2)
+    assert stats["number"] >= 1 and stats["min_us"] >= 0 and stats["ops_per_sec"] > 0
+
+
+def test_compare_flags_regressions_in_both_directions():
+    base = {"results": [
+        latency_result("lat", {"n": 1}, {"min_us": 10.0}),
+        throughput_result("tp", {"n": 1}, 1000, 1.0),
+    ]}
+    head = {"results": [
+        latency_result("lat", {"n": 1}, {"min_us": 13.0}),   # 30% slower
+        throughput_result("tp", {"n": 1}, 1000, 1.05),      # ~5% less throughput
+        latency_result("new", {}, {"min_us": 1.0}),
+    ]}
+    rows, regressed = compare(base, head, threshold=0.2)
+    assert regressed == ['lat{"n": 1}']
+    assert {r["scenario"] for r in rows} == {'lat{"n": 1}', 'tp{"n": 1}', "new{}"}
+
+
+def test_synthetic_policy_is_valid_and_reproducible():
+    from src.app.policy_v2 import validate_policy_input
+    p = bench_policy.synthetic_v2(50)
+    assert p == bench_policy.synthetic_v2(50)
+    assert validate_policy_input(p)["ok"] is True
+    assert p["rules"][-1]["match"] == "*"
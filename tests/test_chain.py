@@ -0,0 +1,102 @@
+import json
+import multiprocessing
+import subprocess
+import sys
+
+from src.app import audit, chain
+
+
+def _fill(path, monkeypatch, n, every=50):
+    monkeypatch.setenv('AUDIT_PATH', str(path))
+    monkeypatch.setenv('AUDIT_CHECKPOINT_N', str(every))
+    for i in range(0, n, 40):
+        audit.submit_many([{'action': 'enforce', 'status': 'pending', 'i': j, 'pad': 'x' * 300}
+                           for j in range(i, min(n, i + 40))])[1].result()
+        audit.write({'action': 'note', 'i': i})
+
+
+def test_chain_and_checkpoints_verify(tmp_path, monkeypatch):
+    p = tmp_path / 'audit.log'
+    p.write_text('{"action": "enforce", "ts": 1}\n')  # written before chaining was turned on
+    _fill(p, monkeypatch, 20_000)
+    lines = p.read_bytes().splitlines()
+    cps = [json.loads(x) for x in lines if b'audit_checkpoint' in x]
+    assert cps and all(c['records'] == 50 for c in cps)
+    assert all(chain.split(x) is not None for x in lines[1:])
+    rec = json.loads(lines[5])
+    assert set(rec) >= {'trace_id', 'chain'} and audit.find_trace(rec['trace_id'])['chain'] == rec['chain']
+
+    single = chain.verify(str(p), jobs=1)
+    parallel = chain.verify(str(p), jobs=4)  # several ranges, segments cut at their edges
+    assert single == parallel
+    assert single['ok'] and single['unchained'] == 1
+    assert single['records'] + single['checkpoints'] == len(lines) - 1 and single['checkpoints'] == len(cps)
+
+
+def test_tampering_is_detected(tmp_path, monkeypatch):
+    p = tmp_path / 'audit.log'
+    _fill(p, monkeypatch, 2_000)
+    good = p.read_bytes()
+    lines = good.splitlines(keepends=True)
+
+    edited = list(lines)
+    edited[700] = edited[700].replace(b'"status": "pending"', b'"status": "allowed"')
+    p.write_bytes(b''.join(edited))
+    res = chain.verify(str(p), jobs=2)
+    assert not res['ok'] and [e['offset'] for e in res['errors']] == [len(b''.join(lines[:700]))]
+
+    for bad in (lines[:300] + lines[301:], lines[:300] + [b'{"action": "enforce", "status": "allowed"}\n'] + lines[300:]):
+        p.write_bytes(b''.join(bad))
+        assert not chain.verify(str(p), jobs=2)['ok']
+
+    # rewriting a whole tail consistently still breaks the checkpoint when it needs a key
+    monkeypatch.setenv('AUDIT_CHAIN_KEY', 'k1')
+    p.unlink()
+    chain._STATES.clear()
+    _fill(p, monkeypatch, 500)
+    assert chain.verify(str(p))['ok']
+    monkeypatch.setenv('AUDIT_CHAIN_KEY', 'k2')
+    assert not chain.verify(str(p))['ok']
+
+
+def _append(path, n):
+    for i in range(n):
+        audit.write({'action': 'note', 'worker': True, 'i': i})
+
+
+def test_processes_share_one_chain_and_incremental_verify(tmp_path, monkeypatch):
+    p = tmp_path / 'audit.log'
+    state = tmp_path / 'state.json'
+    _fill(p, monkeypatch, 1_000)
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_append, args=(str(p), 300)) for _ in range(2)]
+    for proc in procs:
+        proc.start()
+    _append(str(p), 300)
+    for proc in procs:
+        proc.join()
+    first = chain.verify(str(p), jobs=2, state_path=str(state))
+    assert first['ok'] and first['records'] + first['checkpoints'] == len(p.read_bytes().splitlines())
+
+    saved = json.loads(state.read_text())['offset']
+    _fill(p, monkeypatch, 200)
+    again = chain.verify(str(p), jobs=2, state_path=str(state))
+    assert again['ok'] and again['from_offset'] == saved > 0
+    assert again['records'] < 300  # only what came after the last checkpoint verified before
+
+    # history before the saved checkpoint changed: the incremental run notices
+    data = p.read_bytes()
+    p.write_bytes(data[:100] + data[101:])
+    assert not chain.verify(str(p), state_path=str(state))['ok']
+
+
+def test_cli_audit_verify(tmp_path, monkeypatch):
+    p = tmp_path / 'audit.log'
+    _fill(p, monkeypatch, 300)
+    proc = subprocess.run([sys.executable, 'tools/cli.py', 'audit-verify', str(p), '--jobs', '2', '--incremental'],
+                          capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stderr.startswith('OK:') and (tmp_path / 'audit.log.verified').exists()
+    p.write_bytes(p.read_bytes().replace(b'"i": 7,', b'"i": 8,', 1))
+    proc = subprocess.run([sys.executable, 'tools/cli.py', 'audit-verify', str(p), '--json'], capture_output=True, text=True)
+    assert proc.returncode == 1 and json.loads(proc.stdout)['errors'][0]['error'].startswith('hash mismatch')
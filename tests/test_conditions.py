@@ -0,0 +1,94 @@
+import pickle
+import random
+
+from src.app.conditions import compile_when
+from src.app.engine_v2 import compile_v2
+
+
+def test_compile_when_semantics():
+    p = compile_when({'agent': 'bot', 'tier': {'in': ['gold', 'plat']}, 'risk': {'gte': 0, 'lt': 50}})
+    assert p({'agent': 'bot', 'tier': 'gold', 'risk': 10})
+    assert not p({'agent': 'bot', 'tier': 'gold', 'risk': 50})
+    assert not p({'agent': 'bot', 'tier': 'silver', 'risk': 10})
+    assert not p({'tier': 'gold', 'risk': 10})          # missing key never matches
+    assert not p({'agent': 'bot', 'tier': ['gold'], 'risk': 10})  # unhashable value
+    assert not compile_when({'risk': {'gt': 0}})({'risk': True})  # bools are not numbers
+    assert compile_when({}) is None and compile_when(None) is None
+
+
+def _reference(rules, tool, meta):
+    import fnmatch
+    for i, r in enumerate(rules):
+        if r['decision'] not in ('allow', 'deny', 'review') or not fnmatch.fnmatchcase(tool, r['match']):
+            continue
+        if all(_cond_holds(meta, k, c) for k, c in (r.get('when') or {}).items()):
+            return i
+    return None
+
+
+def _cond_holds(meta, key, cond):
+    if key not in meta:
+        return False
+    v = meta[key]
+    if not isinstance(cond, dict):
+        return v == cond
+    if 'in' in cond and v not in cond['in']:
+        return False
+    if 'gte' in cond and not (isinstance(v, int) and v >= cond['gte']):
+        return False
+    return True
+
+
+def test_conditional_plan_equals_linear_scan():
+    rng = random.Random(11)
+    tenants = ['t%d' % i for i in range(6)]
+    whens = [None, {'tenant': 't1'}, {'tenant': 't2'}, {'tenant': {'in': ['t3', 't4']}}, {'tier': 'gold'},
+             {'tenant': 't1', 'tier': 'gold'}, {'score': {'gte': 5}}, {'tenant': 't2', 'score': {'gte': 5}}]
+    for _ in range(300):
+        rules = []
+        for _ in range(rng.randrange(1, 10)):
+            r = {'match': rng.choice(['*', 'a.*', 'a.b', 'b*']), 'decision': rng.choice(['allow', 'deny', 'review', 'x'])}
+            w = rng.choice(whens)
+            if w:
+                r['when'] = w
+            rules.append(r)
+        compiled = compile_v2({'version': 2, 'rules': rules})
+        for tool in ('a.b', 'a.c', 'b', 'zz'):
+            for _ in range(4):
+                meta = {k: v for k, v in (('tenant', rng.choice(tenants)), ('tier', rng.choice(['gold', 'std'])),
+                                          ('score', rng.randrange(10))) if rng.random() < 0.8}
+                expect = _reference(rules, tool, meta)
+                idx = compiled.first_match(tool, meta)
+                got = None if idx is None else compiled.rules[idx]
+                want = None if expect is None else rules[expect]
+                assert (got is None) == (want is None), (rules, tool, meta)
+                if want is not None:
+                    assert (got.match, got.decision, got.when) == (want['match'], want['decision'], want.get('when')), (rules, tool, meta)
+
+
+def test_tenant_rules_collapse_into_one_indexed_step():
+    rules = [{'match': 'refunds.*', 'decision': 'allow', 'when': {'tenant': f't{i}'}} for i in range(1000)]
+    rules.append({'match': '*', 'decision': 'review'})
+    compiled = compile_v2({'version': 2, 'rules': rules})
+    assert compiled.first_match('refunds.create', {'tenant': 't777'}) == 777
+    steps, fallback = compiled._memo['refunds.create']
+    assert len(steps) == 1 and fallback == 1000
+    assert compiled.first_match('refunds.create', {'tenant': 'nobody'}) == 1000
+    clone = pickle.loads(pickle.dumps(compiled))  # artifacts pickle rules; predicates are rebuilt
+    assert clone.evaluate('refunds.create', meta={'tenant': 't3'})['allowed'] is True
+
+
+def test_meta_reaches_check_and_enforce(tmp_path, monkeypatch, app_client):
+    p = tmp_path / 'policy.yml'
+    p.write_text('version: 2\nrules:\n'
+                 '  - {match: "refunds.*", decision: allow, when: {tier: {in: [gold]}}}\n'
+                 '  - {match: "*", decision: review}\n', encoding='utf-8')
+    monkeypatch.setenv('POLICY_PATH', str(p))
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+    r = app_client.post('/guard/check', json={'tool': 'refunds.create', 'meta': {'tier': 'gold'}})
+    assert r.json()['allowed'] is True
+    r = app_client.post('/guard/check', json={'tool': 'refunds.create'})
+    assert r.json()['approval_required'] is True
+    r = app_client.post('/guard/enforce', json={'tool': 'refunds.create', 'meta': {'tier': 'gold'}})
+    assert r.json()['status'] == 'allowed'
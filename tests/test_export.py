@@ -0,0 +1,54 @@
+import csv
+import gzip
+import io
+import json
+
+from src.app import export
+
+
+def _log(path, n, start=1_000_000, step=10):
+    with open(path, 'w') as f:
+        for i in range(n):
+            f.write(json.dumps({'action': 'enforce', 'tool': f't{i % 7}', 'status': 'allowed', 'amount_cents': i,
+                                'ts': start + i * step, 'trace_id': f'{i:08d}', 'meta': {'i': i}}) + '\n')
+
+
+def test_seek_finds_since_without_scanning(tmp_path):
+    p = tmp_path / 'audit.log'
+    _log(p, 50_000)
+    size = p.stat().st_size
+    with open(p, 'rb') as f:
+        off = export.seek_ts(f, 1_000_000 + 40_000 * 10, size)
+        f.seek(off)
+        line = f.readline()
+    # lands at most one chunk (of ~len(line)-byte, 10s-apart records) before the slack-adjusted target
+    target = 1_000_000 + 40_000 * 10 - export.SLACK_S
+    assert target - 10 * (export.CHUNK // len(line) + 1) <= json.loads(line)['ts'] <= target
+    assert off > size // 2
+
+
+def test_export_ndjson_range(tmp_path, monkeypatch, app_client):
+    p = tmp_path / 'audit.log'
+    _log(p, 20_000)
+    with open(p, 'a') as f:
+        f.write('{"action": "enforce", "ts": 1000100')  # a record still being written
+    monkeypatch.setenv('AUDIT_PATH', str(p))
+    r = app_client.get('/audit/export', params={'since': 1_000_100, 'until': 1_000_200})
+    assert r.status_code == 200 and r.headers['content-type'] == 'application/gzip'
+    assert r.headers['content-disposition'] == 'attachment; filename="audit-1000100-1000200.ndjson.gz"'
+    lines = gzip.decompress(r.content).splitlines()
+    assert [json.loads(x)['ts'] for x in lines] == list(range(1_000_100, 1_000_200, 10))
+
+    everything = gzip.decompress(app_client.get('/audit/export').content)
+    assert everything == p.read_bytes().rsplit(b'\n', 1)[0] + b'\n'
+    assert app_client.get('/audit/export', params={'format': 'xml'}).status_code == 422
+
+
+def test_export_csv(tmp_path, monkeypatch, app_client):
+    p = tmp_path / 'audit.log'
+    _log(p, 5)
+    monkeypatch.setenv('AUDIT_PATH', str(p))
+    r = app_client.get('/audit/export', params={'format': 'csv', 'until': 1_000_030})
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(r.content).decode())))
+    assert [row['trace_id'] for row in rows] == ['00000000', '00000001', '00000002']
+    assert rows[1]['amount_cents'] == '1' and rows[1]['op'] == '' and json.loads(rows[1]['extra']) == {'meta': {'i': 1}}
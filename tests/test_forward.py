@@ -0,0 +1,103 @@
+import json
+
+import httpx
+import pytest
+import yaml
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from src.app.forward import ForwardPool, load_upstreams
+
+# Stand-in upstream tool server (served in-process through httpx.ASGITransport)
+upstream = FastAPI()
+
+
+@upstream.post("/refunds/{rid}")
+async def _refund(rid: str, request: Request) -> dict:
+    return {
+        "rid": rid,
+        "body": await request.json(),
+        "q": dict(request.query_params),
+        "leaked_aegis_headers": [k for k in request.headers if k.startswith("x-aegis-")],
+    }
+
+
+@upstream.get("/refunds/cookies")
+async def _cookies(request: Request) -> Response:
+    r = JSONResponse({"x_tag": request.headers.getlist("x-tag")})
+    r.set_cookie("a", "1")
+    r.set_cookie("b", "2")
+    return r
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("APPROVALS_PATH", str(tmp_path / "approvals.log"))
+    monkeypatch.setenv("AUDIT_PATH", str(tmp_path / "audit.log"))
+    cfg = tmp_path / "upstreams.yml"
+    cfg.write_text(yaml.safe_dump({"upstreams": {"payments": {"url": "http://payments.test", "match": ["refunds.*"], "max_connections": 4,
+                                                                 "paths": {"refunds.refund": ["/refunds/"]}}}}), encoding="utf-8")
+
+    from src.app.main import create_app
+    app = create_app()
+    with TestClient(app) as c:
+        app.state.forward_pool = ForwardPool(load_upstreams(str(cfg)), transport=httpx.ASGITransport(app=upstream))
+        yield c
+
+
+def test_allowed_call_is_forwarded_to_upstream(client, tmp_path):
+    r = client.post(
+        "/forward/refunds.refund/refunds/r_1?source=test",
+        json={"amount": 12000},
+        headers={"x-aegis-amount-cents": "12000", "x-aegis-op": "refund"},
+    )
+    assert r.status_code == 200
+    assert r.headers["x-aegis-status"] == "allowed"
+    body = r.json()
+    assert body == {"rid": "r_1", "body": {"amount": 12000}, "q": {"source": "test"}, "leaked_aegis_headers": []}
+    audit = [json.loads(ln) for ln in (tmp_path / "audit.log").read_text(encoding="utf-8").splitlines()]
+    assert audit[-1]["status"] == "allowed" and audit[-1]["tool"] == "refunds.refund"
+
+
+def test_over_cap_is_held_pending_and_not_forwarded(client):
+    r = client.post(
+        "/forward/refunds.refund/refunds/r_2",
+        json={"amount": 20000},
+        headers={"x-aegis-amount-cents": "20000", "x-aegis-op": "refund"},
+    )
+    assert r.status_code == 202
+    body = r.json()
+    assert body["status"] == "pending" and body["approval_id"]
+
+
+def test_unrouted_tool_and_bad_header(client):
+    assert client.post("/forward/users.export/x", json={}).status_code == 404
+    r = client.post("/forward/refunds.refund/refunds/r_3", json={}, headers={"x-aegis-amount-cents": "lots"})
+    assert r.status_code == 400
+
+
+def test_pool_reuses_one_client_per_upstream():
+    pool = ForwardPool(load_upstreams("/nonexistent.yml"))
+    assert pool.route("refunds.refund") is None
+    from src.app.forward import Upstream, UpstreamsConfig
+    pool = ForwardPool(UpstreamsConfig(upstreams={"a": Upstream(url="http://a.test", match=["x.*"], paths={"x.y": ["/y"]})}))
+    assert pool.route("x.y") == "a"
+    assert pool.allows("a", "x.y", "y") and pool.allows("a", "x.y", "y/1")
+    assert not pool.allows("a", "x.y", "yz") and not pool.allows("a", "x.y", "y/../z") and not pool.allows("a", "x.z", "y")
+    assert pool.client("a") is pool.client("a")
+
+
+def test_path_must_be_bound_to_the_tool(client, tmp_path):
+    for path in ("admin/users", "refundsX/r_1", "refunds/../admin", "refunds/r_1/../../admin"):
+        r = client.post(f"/forward/refunds.refund/{path}", json={}, headers={"x-aegis-amount-cents": "100"})
+        assert r.status_code == 403 and "not bound" in r.json()["detail"], path
+    # refunds.* routes here, but only refunds.refund has paths
+    assert client.post("/forward/refunds.void/refunds/r_1", json={}).status_code == 403
+    assert not (tmp_path / "audit.log").exists()  # refused before enforcement
+
+
+def test_repeated_headers_are_forwarded(client):
+    r = client.get("/forward/refunds.refund/refunds/cookies", headers=[("x-tag", "1"), ("x-tag", "2")])
+    assert r.status_code == 200 and r.json() == {"x_tag": ["1", "2"]}
+    assert sorted(c.split(";")[0] for c in r.headers.get_list("set-cookie")) == ["a=1", "b=2"]
@@ -64,4 +64,68 @@ def test_v2_fallback_review(tmp_path, monkeypatch):
 
     from src.app.guard import evaluate
     res = evaluate('users.export')
-    assert res['allowed'] is False and res['approval_required'] is True
\ No newline at end of file
+    assert res['allowed'] is False and res['approval_required'] is True
+
+def _reference_match(tool, rule):
+    import fnmatch
+    import re
+    kind, pat = rule.get('match_type') or 'glob', rule['match']
+    if kind == 'exact':
+        return tool == pat
+    if kind == 'prefix':
+        return tool.startswith(pat)
+    if kind == 'regex':
+        return re.fullmatch(pat, tool) is not None
+    return fnmatch.fnmatchcase(tool, pat)
+
+
+def test_combined_matcher_equals_linear_scan():
+    import random
+
+    from src.app.engine_v2 import compile_v2
+
+    rng = random.Random(7)
+    names = ['refunds.create', 'refunds.x', 'admin.nuke', 'a', 'ab', 'abc', 'payment_links.create', '', 'A']
+    pats = [
+        ('*', None), ('a*', None), ('ab*', 'glob'), ('a?c', None), ('[ab]*', None), ('*create', None),
+        ('refunds.*', None), ('refunds.create', None), ('abc', 'exact'), ('a', 'prefix'), ('refunds.', 'prefix'),
+        ('admin\\.\\w+', 'regex'), ('a|ab', 'regex'), ('(a)(b)?', 'regex'), ('(?i)a', 'regex'), ('.*', 'regex'),
+    ]
+    for _ in range(300):
+        rules = []
+        for _ in range(rng.randrange(1, 8)):
+            pat, kind = rng.choice(pats)
+            rule = {'match': pat, 'decision': rng.choice(['allow', 'deny', 'review', 'bogus'])}
+            if kind:
+                rule['match_type'] = kind
+            rules.append(rule)
+        compiled = compile_v2({'version': 2, 'rules': rules})
+        for tool in names:
+            expect = next((i for i, r in enumerate(rules) if r['decision'] != 'bogus' and _reference_match(tool, r)), None)
+            idx = compiled.first_match(tool)
+            got = compiled.rules[idx] if idx is not None else None
+            if expect is None:
+                assert got is None, (rules, tool)
+            else:
+                assert (got.match, got.decision) == (rules[expect]['match'], rules[expect]['decision']), (rules, tool)
+
+
+def test_match_type_validation_and_evaluation(tmp_path, monkeypatch):
+    from src.app.guard import evaluate
+    from src.app.policy_v2 import validate_v2
+
+    bad = {'version': 2, 'rules': [{'match': 'a(', 'match_type': 'regex', 'decision': 'allow'}]}
+    assert 'valid regex' in validate_v2(bad)[0]
+    assert 'match_type' in validate_v2({'version': 2, 'rules': [{'match': 'a', 'match_type': 'fuzzy', 'decision': 'allow'}]})[0]
+
+    p = _write(tmp_path, 'policy.yml', textwrap.dedent('''\
+    version: 2
+    rules:
+      - {match: "billing.", match_type: prefix, decision: deny}
+      - {match: "refunds\\\\.(create|update)", match_type: regex, decision: allow}
+      - {match: "*", decision: review}
+    '''))
+    monkeypatch.setenv('POLICY_PATH', p)
+    assert evaluate('billing.charges.delete')['approval_required'] is False
+    assert evaluate('refunds.create')['allowed'] is True
+    assert evaluate('refunds.create2')['approval_required'] is True
@@ -0,0 +1,112 @@
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+
+from src.app import ids
+from src.app.audit import find_trace, submit_many
+
+
+def test_ids_are_monotonic_across_threads_and_clock_steps(monkeypatch):
+    out = [[] for _ in range(4)]
+
+    def mint(bucket):
+        for _ in range(5000):
+            bucket.append(ids.new_id())
+
+    threads = [threading.Thread(target=mint, args=(b,)) for b in out]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(b == sorted(b) for b in out)
+    assert len({i for b in out for i in b}) == 20_000
+
+    first, ms = ids.stamp()
+    assert ids.id_ms(first) == ms and len(first) == 26
+    monkeypatch.setattr(time, 'time_ns', lambda: (ms - 5000) * 1_000_000)  # clock steps back 5s
+    later = ids.new_id()
+    assert later > first and ids.id_ms(later) == ms
+    assert ids.id_ms(str(uuid.uuid4())) is None
+
+
+def _child(q):
+    q.put([ids.new_id() for _ in range(2000)])
+
+
+def test_forked_children_do_not_repeat_the_parent():
+    ids.new_id()  # parent state that a child must not continue from
+    ctx = multiprocessing.get_context('fork')
+    q = ctx.Queue()
+    procs = [ctx.Process(target=_child, args=(q,)) for _ in range(2)]
+    for p in procs:
+        p.start()
+    mine = [ids.new_id() for _ in range(2000)]
+    theirs = [q.get(timeout=30) for _ in procs]
+    for p in procs:
+        p.join()
+    assert len(set(mine).union(*theirs)) == 6000
+
+
+def test_find_line_bisects_to_the_record(tmp_path, monkeypatch):
+    path = tmp_path / 'audit.log'
+    monkeypatch.setenv('AUDIT_PATH', str(path))
+    clock = [1_700_000_000_000]
+
+    def tick():
+        clock[0] += 1000
+        return clock[0] * 1_000_000
+
+    monkeypatch.setattr(time, 'time_ns', tick)
+    monkeypatch.setattr(ids, '_last_ms', -1)  # forget the real clock earlier tests minted on
+    with open(path, 'w') as f:
+        for i in range(200):  # older records without ULIDs
+            f.write(json.dumps({'action': 'legacy', 'trace_id': str(uuid.uuid4()), 'i': i}) + '\n')
+    legacy = json.loads(path.read_text().splitlines()[7])['trace_id']
+    trace_ids, fut = submit_many([{'action': 'enforce', 'i': i, 'pad': 'x' * 100} for i in range(30_000)])
+    fut.result()
+    assert path.stat().st_size > 4 * (1 << 20)
+
+    reads = []
+    real_open = open
+
+    class Counting:
+        def __init__(self, f):
+            self.f = f
+
+        def __getattr__(self, name):
+            return getattr(self.f, name)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def read(self, n=-1):
+            data = self.f.read(n)
+            reads.append(len(data))
+            return data
+
+    monkeypatch.setattr('builtins.open', lambda *a, **k: Counting(real_open(*a, **k)) if a[0] == str(path) else real_open(*a, **k))
+    for i in (0, 12_345, 29_999):
+        reads.clear()
+        rec = find_trace(trace_ids[i])
+        assert rec['i'] == i and rec['ts_ms'] == ids.id_ms(trace_ids[i])
+        assert sum(reads) < path.stat().st_size // 10  # a window around the ID, not a full scan
+    monkeypatch.undo()
+    assert find_trace(legacy, str(path))['i'] == 7  # non-ULID ids are found by a linear scan
+    assert find_trace(ids.new_id(), str(path)) is None
+    assert find_trace('"x', str(path)) is None
+
+
+def test_lookup_endpoints(tmp_path, monkeypatch, app_client):
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+    trace_id = app_client.post('/audit', json={'action': 'note', 'note': 'hello'}).json()['trace_id']
+    assert app_client.get(f'/audit/{trace_id}').json()['note'] == 'hello'
+    approval_id = app_client.post('/guard/enforce', json={'tool': 'payments.create', 'amount_cents': 10**9}).json()['approval_id']
+    rec = app_client.get(f'/approvals/{approval_id}').json()
+    assert rec['status'] == 'pending' and rec['dry_run_id'].startswith('enf-') and isinstance(rec['ts_ms'], int)
+    assert app_client.get(f'/approvals/{ids.new_id()}').status_code == 404
@@ -0,0 +1,18 @@
+import io
+
+from src.app import logscan
+
+
+def test_lines_backward_across_blocks(monkeypatch):
+    monkeypatch.setattr(logscan, '_BLOCK', 7)  # lines straddle block edges
+    data = b''.join(b'{"ts": %d}\n' % i for i in range(20))
+    lines = list(logscan.lines_backward(io.BytesIO(data), len(data)))
+    assert lines[0] == b'' and [logscan.line_ts(ln) for ln in lines[1:]] == list(range(19, -1, -1))
+
+
+def test_closed_end_leaves_out_a_torn_line(tmp_path):
+    p = tmp_path / 'audit.log'
+    p.write_bytes(b'{"ts": 1}\n{"ts": 2}\n{"ts": 3')
+    assert logscan.closed_end(str(p), 0) == 20
+    assert logscan.closed_end(str(p), 20) == 20
+    assert logscan.line_ts(b'{"action": "x"}') is None
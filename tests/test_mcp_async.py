@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from fastmcp import Client
+
+import mcp_server
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setenv("APPROVALS_PATH", str(tmp_path / "approvals.log"))
+    monkeypatch.setenv("AUDIT_PATH", str(tmp_path / "audit.log"))
+    monkeypatch.setenv("APPROVAL_CODE", "123456")
+
+
+def _lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+def test_registered_tool_names():
+    async def run():
+        async with Client(mcp_server.mcp) as c:
+            return {t.name for t in await c.list_tools()}
+
+    names = asyncio.run(run())
+    assert names == {"policy_get", "audit_write", "require_approval", "complete_approvals", "guard_check", "firewall_enforce"}
+
+
+def test_pipelined_enforce_calls_all_complete_and_audit(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    n = 64
+
+    async def run():
+        async with Client(mcp_server.mcp) as c:
+            calls = []
+            for i in range(n):
+                amount = 12000 if i % 2 == 0 else 20000  # under / over the default refund cap
+                calls.append(c.call_tool("firewall_enforce", {"tool": "refunds.refund", "amount_cents": amount, "op": "refund"}))
+            return await asyncio.gather(*calls)
+
+    results = [r.data for r in asyncio.run(run())]
+    assert [r["status"] for r in results].count("allowed") == n // 2
+    pending = [r for r in results if r["status"] == "pending"]
+    assert len(pending) == n // 2 and all(r["approval_id"] for r in pending)
+
+    audit = _lines(tmp_path / "audit.log")
+    assert len(audit) == n and all(a["action"] == "enforce" for a in audit)
+    approvals = _lines(tmp_path / "approvals.log")
+    assert {a["approval_id"] for a in approvals} == {r["approval_id"] for r in pending}
+
+
+def test_async_require_approval_two_phase(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+
+    async def run():
+        async with Client(mcp_server.mcp) as c:
+            r1 = await c.call_tool("require_approval", {"dry_run_id": "dry-async"})
+            r2 = await c.call_tool("require_approval", {"dry_run_id": "dry-async", "approval_code": "123456"})
+            return r1.data, r2.data
+
+    r1, r2 = asyncio.run(run())
+    assert r1["status"] == "pending" and r1["approval_required"] is True
+    assert r2["status"] == "approved" and r2["ok"] is True and r2["trace_id"]
+    assert any(a["action"] == "approval" for a in _lines(tmp_path / "audit.log"))
+
+
+def test_enforce_async_writes_no_audit_when_approval_append_fails(tmp_path, monkeypatch):
+    from concurrent.futures import Future
+
+    import pytest
+
+    from src.app import enforcer
+    _setup(tmp_path, monkeypatch)
+
+    def failing(entry):
+        fut: Future = Future()
+        fut.set_exception(OSError("disk full"))
+        return entry, fut
+
+    audited: list = []
+    monkeypatch.setattr(enforcer, "submit_approval", failing)
+    monkeypatch.setattr(enforcer, "audit_submit", lambda event: audited.append(event))
+    with pytest.raises(OSError):
+        asyncio.run(enforcer.enforce_async("refunds.refund", amount_cents=20000, op="refund"))
+    assert audited == []  # the approval append is awaited first, as in enforce()
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import sys
+
+import pytest
+from fastmcp import Client
+from fastmcp.client.transports import StdioTransport
+
+DENY_POLICY = """
+max_refund_cents: 15000
+max_payment_link_cents: 25000
+allow_tools:
+  - "refunds.*"
+  - "payment_links.create"
+deny_tools:
+  - "admin.*"
+""".strip()
+
+
+@pytest.fixture
+def proxy_transport(tmp_path):
+    policy = tmp_path / "policy.yml"
+    policy.write_text(DENY_POLICY, encoding="utf-8")
+    env = {
+        "POLICY_PATH": str(policy),
+        "AUDIT_PATH": str(tmp_path / "audit.log"),
+        "APPROVALS_PATH": str(tmp_path / "approvals.log"),
+        "PYTHONPATH": ".",
+    }
+    return StdioTransport(command=sys.executable, args=["mcp_proxy.py", "--", sys.executable, "stub_upstream_server.py"], env=env)
+
+
+def _decision(result):
+    return json.loads(result.content[0].text)
+
+
+def test_proxy_forwards_list_and_enforces_calls(proxy_transport, tmp_path):
+    async def run():
+        async with Client(proxy_transport) as c:
+            names = {t.name for t in await c.list_tools()}
+            # pipelined: all calls in flight at once
+            under, over, nuke = await asyncio.gather(
+                c.call_tool("refunds.refund", {"amount_cents": 12000, "op": "refund"}, raise_on_error=False),
+                c.call_tool("refunds.refund", {"amount_cents": 20000, "op": "refund"}, raise_on_error=False),
+                c.call_tool("admin.nuke", {}, raise_on_error=False),
+            )
+            return names, under, over, nuke
+
+    names, under, over, nuke = asyncio.run(run())
+    assert names == {"refunds.refund", "payment_links.create", "admin.nuke"}
+
+    # allowed → executed by the upstream
+    assert under.is_error is False
+    assert under.data["executed"] == "refunds.refund"
+
+    # pending → answered by the proxy with the decision, never reaches upstream
+    assert over.is_error is True
+    assert _decision(over)["status"] == "pending" and _decision(over)["approval_id"]
+
+    assert nuke.is_error is True
+    assert _decision(nuke)["status"] == "blocked"
+
+    audit = [json.loads(ln) for ln in (tmp_path / "audit.log").read_text(encoding="utf-8").splitlines()]
+    assert sorted(a["status"] for a in audit) == ["allowed", "blocked", "pending"]
+
+
+def test_proxy_requires_upstream_command(monkeypatch):
+    import mcp_proxy
+    monkeypatch.delenv("MCP_UPSTREAM_CMD", raising=False)
+    assert mcp_proxy.main([]) == 2
+
+
+class _Sink:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(data)
+
+
+@pytest.mark.parametrize("method", ["tools/call", r"tools\/call", r"tools\u002fcall", r"\u0074ools/call"])
+def test_escaped_method_is_still_enforced(tmp_path, monkeypatch, method):
+    import mcp_proxy
+    policy = tmp_path / "policy.yml"
+    policy.write_text(DENY_POLICY, encoding="utf-8")
+    monkeypatch.setenv("POLICY_PATH", str(policy))
+    monkeypatch.setenv("AUDIT_PATH", str(tmp_path / "audit.log"))
+    monkeypatch.setenv("APPROVALS_PATH", str(tmp_path / "approvals.log"))
+    client, upstream = _Sink(), _Sink()
+    line = ('{"jsonrpc":"2.0","id":1,"method":"%s","params":{"name":"admin.nuke","arguments":{}}}\n' % method).encode()
+
+    async def run():
+        proxy = mcp_proxy.EnforcingProxy(client, upstream)
+        proxy.on_client_line(line)
+        proxy.on_client_line(b'[' + line.strip() + b']\n')  # escaped batch
+        proxy.on_client_line(b'{"jsonrpc":"2.0","id":2,"method":"tools/call","method":"ping"}\n')  # duplicate key
+        proxy.on_client_line(b'{"jsonrpc":"2.0","id":3,"method":"tools\\/list"}\n')  # escaped but harmless
+        await asyncio.gather(*proxy._inflight)
+
+    asyncio.run(run())
+    assert upstream.lines == [b'{"jsonrpc":"2.0","id":3,"method":"tools\\/list"}\n']
+    replies = [json.loads(x) for x in client.lines]
+    assert [r["error"]["code"] for r in replies if "error" in r] == [-32600, -32700]
+    blocked = [r for r in replies if "result" in r]
+    assert len(blocked) == 1 and json.loads(blocked[0]["result"]["content"][0]["text"])["status"] == "blocked"
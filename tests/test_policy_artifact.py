@@ -0,0 +1,91 @@
+import subprocess
+import sys
+
+from src.app import policy
+from src.app.engine_v2 import CompiledPolicyV2
+
+V2 = '''\
+version: 2
+rules:
+  - match: "refunds.*"
+    decision: allow
+    cap_cents: 15000
+  - match: "*"
+    decision: review
+'''
+
+
+def test_loader_prefers_matching_artifact(tmp_path, monkeypatch):
+    p = tmp_path / 'policy.yml'
+    p.write_text(V2, encoding='utf-8')
+    out, _ = policy.write_artifact(str(p))
+    assert out == str(p) + 'c'
+    policy._COMPILED.clear()
+
+    def _no_yaml(stream):
+        raise AssertionError('YAML should not be parsed when the artifact matches')
+
+    monkeypatch.setattr(policy, 'load_yaml', _no_yaml)
+    compiled = policy.load_compiled_policy(str(p))
+    assert isinstance(compiled, CompiledPolicyV2)
+    assert compiled.evaluate('refunds.create', 100)['allowed'] is True
+    assert compiled.evaluate('refunds.create', 20000)['approval_required'] is True
+
+
+def test_stale_or_foreign_artifact_is_ignored(tmp_path):
+    p = tmp_path / 'policy.yml'
+    p.write_text(V2, encoding='utf-8')
+    policy.write_artifact(str(p))
+    p.write_text(V2.replace('decision: review', 'decision: deny'), encoding='utf-8')
+    policy._COMPILED.clear()
+    assert policy.load_compiled_policy(str(p)).evaluate('x')['approval_required'] is False
+
+    (tmp_path / 'policy.ymlc').write_bytes(b'not an artifact')
+    policy._COMPILED.clear()
+    assert policy.load_compiled_policy(str(p)).evaluate('x')['approval_required'] is False
+
+
+def test_cli_compile_rejects_invalid_policy(tmp_path):
+    p = tmp_path / 'bad.yml'
+    p.write_text('version: 2\nrules:\n  - match: "*"\n    decision: approve\n', encoding='utf-8')
+    res = subprocess.run([sys.executable, 'tools/cli.py', 'compile', str(p)], capture_output=True, text=True)
+    assert res.returncode == 1 and 'rules.0.decision' in res.stderr
+    assert not (tmp_path / 'bad.ymlc').exists()
+
+
+class _Boom:
+    def __reduce__(self):
+        return (open, ('pwned', 'w'))
+
+
+def test_artifact_round_trips_without_pickle(tmp_path, monkeypatch):
+    import pickle
+
+    p = tmp_path / 'policy.yml'
+    p.write_text(V2.replace('  - match: "*"', '''  - id: vip
+    match: "payouts.*"
+    when: {tier: {in: [gold]}}
+    decision: allow
+    ops: [payout]
+    window_cap_cents: 500
+    window_by: [tool]
+  - match: "admin\\\\..*"
+    match_type: regex
+    decision: deny
+  - match: "*"'''), encoding='utf-8')
+    _, fresh = policy.write_artifact(str(p))
+    data = p.read_bytes()
+    loaded, _ = policy.load_artifact(str(p) + 'c', str(p), data)
+    calls = [('payouts.x', 100, 'payout', {'tier': 'gold'}), ('payouts.x', 100, 'payout', None), ('admin.x', None, None, None),
+             ('refunds.a', 20000, None, None)]
+    for tool, amount, op, meta in calls:
+        assert loaded.evaluate(tool, amount, op, meta) == fresh.evaluate(tool, amount, op, meta)
+    assert loaded.rules[1].window['by'] == ('tool',) and loaded.rules[1].ops == frozenset({'payout'})
+
+    # a pickle where the include list goes is rejected without being unpickled
+    monkeypatch.chdir(tmp_path)
+    blob = pickle.dumps([_Boom()])
+    head = policy._ARTIFACT_HEADER.pack(policy.ARTIFACT_MAGIC, policy.ARTIFACT_VERSION, b'\0' * 32, len(blob))
+    (tmp_path / 'policy.ymlc').write_bytes(head + blob + blob)
+    assert policy.load_artifact(str(p) + 'c', str(p), data) is None
+    assert not (tmp_path / 'pwned').exists()
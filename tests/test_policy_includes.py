@@ -0,0 +1,73 @@
+import pytest
+
+from src.app import policy
+
+ROOT = '''\
+version: 2
+include:
+  - teams/*.yml
+  - shared.yml
+rules:
+  - {match: "*", decision: review, reason: root fallback}
+'''
+
+
+def _tree(tmp_path):
+    (tmp_path / 'teams').mkdir()
+    (tmp_path / 'teams' / 'a.yml').write_text('rules:\n  - {match: "payments.*", decision: allow, cap_cents: 500}\n')
+    (tmp_path / 'teams' / 'b.yml').write_text('rules:\n  - {match: "payments.refund", decision: deny}\n')
+    (tmp_path / 'shared.yml').write_text('rules:\n  - {match: "admin.", match_type: prefix, decision: deny}\n')
+    root = tmp_path / 'policy.yml'
+    root.write_text(ROOT)
+    return str(root)
+
+
+def test_includes_splice_rules_in_order(tmp_path):
+    root = _tree(tmp_path)
+    compiled = policy.load_compiled_policy(root)
+    assert [r.match for r in compiled.rules] == ['payments.*', 'payments.refund', 'admin.', '*']
+    assert compiled.evaluate('payments.refund', 100)['allowed'] is True  # teams/a.yml sorts first
+    assert compiled.evaluate('admin.nuke')['approval_required'] is False
+    assert compiled.evaluate('other')['reasons'] == ['root fallback']
+    effective = policy.load_policy(root)
+    assert 'include' not in effective and len(effective['rules']) == 4
+
+
+def test_changed_fragment_is_the_only_one_reparsed(tmp_path, monkeypatch):
+    root = _tree(tmp_path)
+    policy.load_compiled_policy(root)
+    parsed = []
+    real = policy.load_yaml
+
+    def spy(data):
+        parsed.append(data)
+        return real(data)
+
+    monkeypatch.setattr(policy, 'load_yaml', spy)
+    (tmp_path / 'teams' / 'b.yml').write_text('rules:\n  - {match: "payments.refund", decision: review, reason: b2}\n')
+    compiled = policy.load_compiled_policy(root)
+    assert compiled.evaluate('payments.refund', 100)['allowed'] is True
+    assert len(parsed) == 2 and b'b2' in parsed[1]  # the root (tiny, for its include list) and b.yml
+
+    (tmp_path / 'teams' / 'c.yml').write_text('rules:\n  - {match: "reports.*", decision: deny}\n')
+    assert policy.load_compiled_policy(root).evaluate('reports.x')['approval_required'] is False
+
+
+def test_bad_fragments_raise(tmp_path):
+    root = _tree(tmp_path)
+    (tmp_path / 'shared.yml').write_text('include: [policy.yml]\nrules: []\n')
+    with pytest.raises(ValueError, match='include cycle'):
+        policy.load_compiled_policy(root)
+    (tmp_path / 'shared.yml').write_text('rules:\n  - {match: "*", decision: approve}\n')
+    with pytest.raises(ValueError, match=r'shared.yml: rules.0.decision'):
+        policy.load_compiled_policy(root)
+
+
+def test_artifact_tracks_included_files(tmp_path):
+    root = _tree(tmp_path)
+    policy.write_artifact(root)
+    policy._COMPILED.clear()
+    assert policy.load_artifact(root + 'c', root, open(root, 'rb').read()) is not None
+    (tmp_path / 'teams' / 'a.yml').write_text('rules:\n  - {match: "payments.*", decision: deny}\n')
+    assert policy.load_artifact(root + 'c', root, open(root, 'rb').read()) is None
+    assert policy.load_compiled_policy(root).evaluate('payments.x')['approval_required'] is False
@@ -0,0 +1,99 @@
+import json
+import random
+import subprocess
+import sys
+
+from src.app.engine_v2 import compile_v2
+from src.app.optimize import analyze, differential_check, disjoint, optimize, reorder
+
+
+def _r(match, match_type=None, when=None, decision='allow'):
+    rule = {'match': match, 'decision': decision}
+    if match_type:
+        rule['match_type'] = match_type
+    if when:
+        rule['when'] = when
+    return rule
+
+
+def test_disjointness_proofs():
+    assert disjoint(_r('payments.*'), _r('admin.*'))
+    assert disjoint(_r('*.read'), _r('*.write'))
+    assert disjoint(_r('a.b'), _r('a.c', 'exact'))
+    assert disjoint(_r('ns.', 'prefix'), _r(r'other\.\w+', 'regex'))
+    assert disjoint(_r('x.*', when={'tenant': 't1'}), _r('x.y', when={'tenant': {'in': ['t2', 't3']}}))
+    assert disjoint(_r('*', when={'risk': 10}), _r('*', when={'risk': {'gt': 50}}))
+    assert not disjoint(_r('payments.*'), _r('*.refund'))
+    assert not disjoint(_r('a|b', 'regex'), _r('b.*'))
+    assert not disjoint(_r('x.*', when={'tenant': 't1'}), _r('x.*', when={'tier': 'gold'}))
+
+
+def test_shadowed_and_unreachable_rules():
+    rules = [_r('admin.', 'prefix', decision='deny'), _r('admin.*.drop'), _r('payments.*', when={'tier': 'gold'}),
+             _r('payments.refund', when={'tier': 'gold', 'agent': 'bot'}), _r('payments.refund'),
+             _r('x', when={'n': {'gt': 5, 'lt': 3}}), _r('*'), _r('anything')]
+    found = analyze(rules)
+    assert found['shadowed'] == {1: 0, 3: 2, 7: 6}
+    assert found['unreachable'] == [5]
+
+
+def _random_policy(rng):
+    pats = [('*', None), ('a.*', None), ('a.b', None), ('a.', 'prefix'), ('b*', None), ('*.b', None), ('a?b', None),
+            ('a.b', 'exact'), (r'a\.(b|c)', 'regex'), ('c|a.b', 'regex'), ('[ab].*', None), ('zz', None)]
+    whens = [None, None, {'t': 1}, {'t': {'in': [1, 2]}}, {'n': {'gte': 5}}, {'t': 2, 'n': {'lt': 5}}]
+    rules = []
+    for _ in range(rng.randrange(1, 12)):
+        match, mt = rng.choice(pats)
+        rule = _r(match, mt, rng.choice(whens), rng.choice(['allow', 'deny', 'review']))
+        if rng.random() < 0.3:
+            rule['cap_cents'] = rng.choice([0, 100])
+        rules.append(rule)
+    return rules
+
+
+def test_reordering_is_equivalent_on_random_policies():
+    rng = random.Random(5)
+    tools = ['a.b', 'a.c', 'a.', 'axb', 'b', 'b.b', 'c', 'zz', 'q.b', 'a.b.c']
+    for _ in range(300):
+        rules = _random_policy(rng)
+        hits = [rng.randrange(100) for _ in rules]
+        order = reorder(len(rules), analyze(rules)['after'], hits)
+        assert sorted(order) == list(range(len(rules)))
+        assert differential_check(rules, order, samples=200, seed=rng.randrange(1000), tools=tools) == []
+        before = compile_v2({'version': 2, 'rules': rules})
+        after = compile_v2({'version': 2, 'rules': [rules[i] for i in order]})
+        for tool in tools:
+            for meta in ({}, {'t': 1}, {'t': 2, 'n': 1}, {'n': 9}):
+                want, got = before.first_match(tool, meta), after.first_match(tool, meta)
+                assert (None if want is None else before.positions[want]) == (None if got is None else order[after.positions[got]])
+
+
+def test_differential_check_catches_a_bad_order():
+    rules = [_r('payments.refund', decision='deny'), _r('payments.*')]
+    assert differential_check(rules, [1, 0], samples=200, tools=['payments.refund'])
+
+
+def test_hot_disjoint_rules_move_up(tmp_path):
+    rules = [{'id': 'admin', 'match': 'admin.*', 'decision': 'deny'},
+             {'match': 'payments.*', 'decision': 'allow'},
+             {'match': 'reports.*', 'decision': 'allow'},
+             {'match': '*', 'decision': 'review'}]
+    audit = tmp_path / 'audit.log'
+    with open(audit, 'w') as f:
+        for _ in range(30):
+            f.write(json.dumps({'action': 'enforce', 'tool': 'reports.daily', 'rule_index': 2}) + '\n')
+        for _ in range(5):
+            f.write(json.dumps({'action': 'enforce', 'tool': 'payments.x'}) + '\n')  # no rule_index: replayed
+        f.write(json.dumps({'action': 'enforce', 'tool': 'admin.x', 'rule_id': 'admin'}) + '\n')
+    res = optimize({'version': 2, 'rules': rules}, audit_path=str(audit))
+    assert res['order'] == [2, 1, 0, 3] and res['cold'] == [3] and res['mismatches'] == []
+    assert res['scan_cost']['after'] < res['scan_cost']['before']
+
+    p = tmp_path / 'policy.yml'
+    p.write_text(json.dumps({'version': 2, 'rules': rules}), encoding='utf-8')
+    out = tmp_path / 'opt.yml'
+    proc = subprocess.run([sys.executable, 'tools/cli.py', 'optimize', str(p), '--audit', str(audit), '-o', str(out)],
+                          capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert '2 of 4 rules moved' in proc.stderr and 'decide identically' in proc.stderr
+    assert 'reports.*' in out.read_text().split('payments.*')[0]
@@ -0,0 +1,92 @@
+import json
+import threading
+
+from src.app.engine_v2 import compile_v2
+from src.app.policy_v2 import validate_v2
+
+POLICY = '''\
+version: 2
+rules:
+  - {id: vip-refunds, match: "refunds.*", decision: allow, cap_cents: 500, when: {tier: gold}}
+  - {id: refunds, match: "refunds.*", decision: review}
+  - {match: "reports.*", decision: allow}
+  - {match: "never.*", decision: approve}
+  - {id: admin, match: "admin.", match_type: prefix, decision: deny}
+'''
+
+
+def _setup(tmp_path, monkeypatch):
+    p = tmp_path / 'policy.yml'
+    p.write_text(POLICY, encoding='utf-8')
+    monkeypatch.setenv('POLICY_PATH', str(p))
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+
+
+def test_decisions_carry_source_rule_index():
+    rules = [{'match': 'x', 'decision': 'bogus'}, {'id': 'a', 'match': 'a*', 'decision': 'deny'}, {'match': '*', 'decision': 'allow'}]
+    compiled = compile_v2({'version': 2, 'rules': rules})
+    assert compiled.evaluate('abc')['rule_index'] == 1 and compiled.evaluate('abc')['rule_id'] == 'a'
+    assert compiled.evaluate('zz')['rule_index'] == 2 and compiled.evaluate('zz')['rule_id'] is None
+    empty = compile_v2({'version': 2, 'rules': []}).evaluate('zz')
+    assert empty['rule_index'] is None and empty['approval_required'] is True
+
+
+def test_hit_counters_merge_across_threads():
+    compiled = compile_v2({'version': 2, 'rules': [{'match': 'a', 'decision': 'allow'}, {'match': 'b', 'decision': 'deny'}]})
+
+    def worker():
+        for _ in range(500):
+            compiled.evaluate('a')
+            compiled.evaluate('zz')
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = compiled.stats()
+    assert [r['hits'] for r in stats['rules']] == [2000, 0]
+    assert stats['default_hits'] == 2000 and stats['evaluations'] == 4000
+    assert stats['dead_rules'] == [1]
+
+
+def test_duplicate_ids_are_rejected():
+    errors = validate_v2({'version': 2, 'rules': [{'id': 'x', 'match': 'a', 'decision': 'allow'},
+                                                 {'id': 'x', 'match': 'b', 'decision': 'deny'}]})
+    assert errors == ["rules.1.id: duplicate rule id 'x' (first used by rules.0) (value_error)"]
+
+
+def test_check_explain_enforce_and_stats(tmp_path, monkeypatch, app_client):
+    _setup(tmp_path, monkeypatch)
+    r = app_client.post('/guard/check', json={'tool': 'refunds.create', 'amount_cents': 900, 'meta': {'tier': 'gold'}})
+    body = r.json()
+    assert body['rule_index'] == 0 and body['rule_id'] == 'vip-refunds' and body['explain'] is None
+    assert body['approval_required'] is True  # over the cap
+
+    r = app_client.post('/guard/check?explain=true', json={'tool': 'refunds.create', 'amount_cents': 100, 'meta': {'tier': 'std'}})
+    trace = r.json()['explain']
+    assert r.json()['rule_id'] == 'refunds'
+    assert trace['conditions_checked'] == [{'rule_index': 0, 'rule_id': 'vip-refunds', 'when': {'tier': 'gold'}, 'held': False}]
+    assert trace['unconditional_match'] == 1 and trace['matched']['decision'] == 'review' and 'cap' not in trace
+
+    r = app_client.post('/guard/check?explain=true', json={'tool': 'refunds.create', 'amount_cents': 900, 'meta': {'tier': 'gold'}})
+    assert r.json()['explain']['cap'] == {'cap_cents': 500, 'ops': None, 'applies': True, 'amount_cents': 900, 'exceeded': True}
+
+    r = app_client.post('/guard/enforce', json={'tool': 'admin.drop'})
+    assert r.json()['status'] == 'blocked' and r.json()['rule_index'] == 4 and r.json()['rule_id'] == 'admin'
+    events = [json.loads(line) for line in (tmp_path / 'audit.log').read_text().splitlines()]
+    assert events[-1]['rule_index'] == 4 and events[-1]['rule_id'] == 'admin'
+
+    stats = app_client.get('/policy/stats').json()
+    assert [r['hits'] for r in stats['rules']] == [2, 1, 0, 1]
+    assert stats['dead_rules'] == [2] and stats['inactive_rules'] == [3] and stats['default_hits'] == 0
+
+
+def test_stats_need_v2(tmp_path, monkeypatch, app_client):
+    p = tmp_path / 'policy.yml'
+    p.write_text('allow_tools: ["a"]\n', encoding='utf-8')
+    monkeypatch.setenv('POLICY_PATH', str(p))
+    assert app_client.get('/policy/stats').status_code == 409
+    r = app_client.post('/guard/check?explain=true', json={'tool': 'a'})
+    assert r.json()['allowed'] is True and r.json()['explain']['engine'] == 'v1' and r.json()['rule_index'] is None
@@ -117,4 +117,29 @@ def test_validate_flags_unknown_fields():
     assert body.get("ok") is False
     errs = "\n".join(body.get("errors") or [])
     # should mention the bad key name 'caps_cents' or say unknown/extra fields
-    assert ("caps_cents" in errs) or ("unknown" in errs.lower()) or ("extra" in errs.lower())
\ No newline at end of file
+    assert ("caps_cents" in errs) or ("unknown" in errs.lower()) or ("extra" in errs.lower())
+
+def test_chunked_validation_reports_global_rule_index():
+    from src.app.policy_v2 import validate_v2
+    rules = [{"match": f"t{i}", "decision": "allow"} for i in range(25)]
+    rules[17] = {"match": "t17", "decision": "approve"}
+    rules[3]["caps_cents"] = 1
+    policy = {"version": 2, "rules": rules}
+    serial = validate_v2(policy, jobs=1, chunk_size=10)
+    assert [e.split(":")[0] for e in serial] == ["rules.3.caps_cents", "rules.17.decision"]
+    assert validate_v2(policy, jobs=2, chunk_size=10) == serial
+    assert validate_v2({"version": 2, "rules": "nope"})[0].startswith("rules:")
+
+
+def test_cli_validate_with_jobs(tmp_path):
+    import subprocess
+    import sys
+
+    import yaml
+    p = tmp_path / "p.yml"
+    p.write_text(yaml.safe_dump(VALID_V2), encoding="utf-8")
+    out = subprocess.run([sys.executable, "tools/cli.py", "validate", str(p), "--jobs", "2"], capture_output=True, text=True)
+    assert out.returncode == 0 and yaml.safe_load(out.stdout) == VALID_V2
+    p.write_text(yaml.safe_dump(INVALID_DECISION), encoding="utf-8")
+    out = subprocess.run([sys.executable, "tools/cli.py", "validate", str(p), "-q"], capture_output=True, text=True)
+    assert out.returncode == 1 and out.stderr.startswith("rules.0.decision:")
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from src.app.approvals import list_approvals, list_pending, read_approval_records, read_approvals
+from src.app.records import ApprovalRecord, AuditRecord
+
+
+def test_records_round_trip_and_share_strings():
+    line = {"status": "pending", "dry_run_id": "dry-1", "approval_id": "a1", "ts": 1, "note": None}
+    a = ApprovalRecord.from_dict(json.loads(json.dumps(line)))
+    b = ApprovalRecord.from_dict(json.loads(json.dumps(dict(line, dry_run_id="dry-2"))))
+    assert a.status is b.status  # interned
+    assert a.to_dict() == line  # absent ts_ms stays absent, explicit null stays null
+    assert a.get("ts_ms") is None and a.get("ts_ms", 0) == 0 and "ts_ms" not in a and "note" in a
+    assert a["dry_run_id"] == "dry-1" and a.get("note", 5) is None
+    with pytest.raises(KeyError):
+        a["ts_ms"]
+    assert not hasattr(a, "__dict__")
+
+    rec = {"action": "enforce", "tool": "refunds.refund", "status": "allowed", "amount_cents": 5, "meta": {"k": 1}}
+    full, slim = AuditRecord.from_dict(rec), AuditRecord.from_dict(rec, keep_extra=False)
+    assert full.to_dict() == rec and full.get("meta") == {"k": 1}
+    assert slim.to_dict() == {k: v for k, v in rec.items() if k != "meta"} and slim.get("meta") is None
+
+
+def test_approval_readers_use_records(tmp_path):
+    p = tmp_path / "approvals.log"
+    lines = [
+        {"status": "pending", "dry_run_id": "d1", "approval_id": "a1", "ts": 1},
+        {"status": "pending", "dry_run_id": "d2", "approval_id": "a2", "ts": 2, "ts_ms": 2000},
+        {"status": "approved", "dry_run_id": "d1", "approval_id": "a3", "ts": 3},
+    ]
+    p.write_text("".join(json.dumps(x) + "\n" for x in lines) + "not json\n\n")
+    assert read_approvals(str(p)) == lines and all(type(r) is dict for r in read_approvals(str(p)))
+    recs = read_approval_records(str(p))
+    assert all(isinstance(r, ApprovalRecord) for r in recs) and [r.to_dict() for r in recs] == lines
+    assert list_approvals(str(p)) == [lines[2], lines[1]]
+    assert list_pending(str(p)) == [lines[1]]
@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+RECORDS = [
+    {"tool": "refunds.refund", "amount_cents": 12000, "op": "refund"},
+    {"tool": "refunds.refund", "amount_cents": 20000, "op": "refund"},
+    {"request_id": "user-001", "title": "not a guard request"},
+    {"action": "approval", "ok": True, "note": "audit record that is not an enforce"},
+    {"action": "enforce", "tool": "users.export", "status": "pending", "ts": 1},
+]
+
+
+def _replay(tmp_path, *args):
+    path = tmp_path / "requests.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in RECORDS) + "\nnot json\n", encoding="utf-8")
+    out = subprocess.run(
+        [sys.executable, "tools/replay.py", str(path), "--json", *args],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout)
+
+
+@pytest.mark.parametrize("target", ["asgi", "mcp"])
+def test_replay_in_process_reports_latency_and_decisions(tmp_path, target):
+    rep = _replay(tmp_path, "--target", target, "--count", "30", "--concurrency", "4")
+    assert rep["records"] == 3 and rep["skipped_lines"] == 3
+    assert rep["sent"] == 30 and rep["completed"] == 30 and rep["errors"] == {}
+    # records cycle: allowed, pending (over cap), pending (not in allow list)
+    assert rep["decisions"] == {"allowed": 10, "pending": 20}
+    lat = rep["latency_ms"]
+    assert 0 < lat["p50"] <= lat["p95"] <= lat["p99"] <= lat["p999"] <= lat["max"]
+
+
+def test_replay_open_loop_rate(tmp_path):
+    rep = _replay(tmp_path, "--target", "asgi", "--endpoint", "check", "--count", "20", "--rate", "200")
+    assert rep["mode"] == "rate=200.0/s" and rep["completed"] == 20
+    assert rep["seconds"] >= 19 / 200
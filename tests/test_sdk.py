@@ -0,0 +1,91 @@
+import json
+
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+
+from src.app.sdk import Guard, GuardDenied, guarded
+
+V2 = {
+    "version": 2,
+    "rules": [
+        {"match": "refunds.*", "decision": "allow", "cap_cents": 15000, "ops": ["refund"]},
+        {"match": "admin.*", "decision": "deny", "reason": "Admin operations disabled"},
+        {"match": "*", "decision": "review"},
+    ],
+}
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    policy = tmp_path / "policy.yml"
+    policy.write_text(yaml.safe_dump(V2), encoding="utf-8")
+    monkeypatch.setenv("POLICY_PATH", str(policy))
+    monkeypatch.setenv("AUDIT_PATH", str(tmp_path / "audit.log"))
+    monkeypatch.setenv("APPROVALS_PATH", str(tmp_path / "approvals.log"))
+    from src.app.main import app
+    return TestClient(app), tmp_path
+
+
+def _audit(tmp_path):
+    p = tmp_path / "audit.log"
+    return [json.loads(ln) for ln in p.read_text(encoding="utf-8").splitlines()] if p.exists() else []
+
+
+def test_local_decisions_are_batched_to_the_server(env):
+    http, tmp_path = env
+    g = Guard(client=http, background=False)
+    assert g.check("refunds.refund", amount_cents=100, op="refund")["status"] == "allowed"
+    assert g.check("admin.nuke")["status"] == "blocked"
+    assert _audit(tmp_path) == []  # nothing shipped yet
+
+    assert g.flush() == 2
+    recs = _audit(tmp_path)
+    assert [r["status"] for r in recs] == ["allowed", "blocked"]
+    assert all(r["source"] == "sdk" and r["trace_id"] for r in recs)
+
+
+def test_audit_batch_keeps_only_sdk_fields(env):
+    http, tmp_path = env
+    forged = {"action": "enforce", "ok": True, "tool": "refunds.refund", "amount_cents": 5, "ts": 0, "ts_ms": 0,
+              "status": "pending", "window_key": ["refunds.refund"], "chain": "0" * 32, "trace_id": "x"}
+    r = http.post("/audit/batch", json={"events": [forged]})
+    assert r.status_code == 201
+    (rec,) = _audit(tmp_path)
+    assert rec["status"] == "allowed" and rec["client_ts_ms"] == 0 and rec["ts"] > 1_700_000_000
+    assert rec["trace_id"] == r.json()["trace_ids"][0]
+    assert "window_key" not in rec and rec.get("chain") != "0" * 32
+    for bad in ({"action": "enforce_rollup", "ok": True, "tool": "t", "count": 10**9}, {"action": "enforce", "tool": "t"}):
+        assert http.post("/audit/batch", json={"events": [bad]}).status_code == 422
+
+
+def test_review_goes_to_server_and_creates_pending_approval(env):
+    http, tmp_path = env
+    g = Guard(client=http, background=False)
+    res = g.check("refunds.refund", amount_cents=20000, op="refund")
+    assert res["status"] == "pending" and res["approval_id"]
+    assert res["approval_id"] in (tmp_path / "approvals.log").read_text(encoding="utf-8")
+
+
+def test_refresh_uses_conditional_get(env):
+    http, tmp_path = env
+    g = Guard(client=http, background=False)
+    assert g.refresh() is False  # unchanged → 304
+
+    (tmp_path / "policy.yml").write_text(yaml.safe_dump({"version": 2, "rules": [{"match": "*", "decision": "deny"}]}), encoding="utf-8")
+    assert g.refresh() is True
+    assert g.check("refunds.refund", amount_cents=1, op="refund")["status"] == "blocked"
+
+
+def test_guarded_decorator(env):
+    http, _ = env
+    g = Guard(client=http, background=False)
+
+    @guarded(tool="refunds.refund", op="refund", guard=g)
+    def refund(charge_id: str, amount_cents: int) -> str:
+        return f"refunded {charge_id}"
+
+    assert refund("ch_1", amount_cents=500) == "refunded ch_1"
+    with pytest.raises(GuardDenied) as exc:
+        refund("ch_2", 99999)
+    assert exc.value.decision["status"] == "pending"
@@ -0,0 +1,88 @@
+import json
+import subprocess
+import sys
+
+import yaml
+
+from src.app.simulate import scan_range, simulate, split_ranges
+
+CURRENT = {"version": 2, "rules": [
+    {"match": "refunds.*", "decision": "allow", "cap_cents": 15000, "ops": ["refund"]},
+    {"match": "*", "decision": "review"},
+]}
+CANDIDATE = {"version": 2, "rules": [
+    {"match": "refunds.*", "decision": "allow", "cap_cents": 10000, "ops": ["refund"]},
+    {"match": "admin.*", "decision": "deny"},
+    {"match": "*", "decision": "review"},
+]}
+
+
+def _setup(tmp_path):
+    cur = tmp_path / "current.yml"
+    cand = tmp_path / "candidate.yml"
+    cur.write_text(yaml.safe_dump(CURRENT), encoding="utf-8")
+    cand.write_text(yaml.safe_dump(CANDIDATE), encoding="utf-8")
+    lines = []
+    for i in range(200):
+        lines.append({"action": "enforce", "tool": "refunds.refund", "op": "refund", "amount_cents": 12000, "status": "allowed", "ts": i, "trace_id": f"t{i}"})
+        lines.append({"action": "enforce", "tool": "refunds.refund", "op": "refund", "amount_cents": 5000, "status": "allowed", "ts": i})
+        lines.append({"action": "approval", "ok": True, "note": "dry_run_id=x", "ts": i})
+        if i % 4 == 0:
+            lines.append({"action": "enforce", "tool": "admin.nuke", "status": "pending", "ts": i})
+    audit = tmp_path / "audit.log"
+    audit.write_text("".join(json.dumps(r) + "\n" for r in lines) + "{broken\n", encoding="utf-8")
+    return str(cur), str(cand), str(audit)
+
+
+def test_ranges_cover_every_record_exactly_once(tmp_path):
+    _, _, audit = _setup(tmp_path)
+    total = 0
+    for start, end in split_ranges(audit, 7):
+        total += scan_range(audit, start, end)[2]
+    assert total == 450
+
+
+def test_simulate_reports_flips_with_samples(tmp_path):
+    cur, cand, audit = _setup(tmp_path)
+    res = simulate(cand, audit_path=audit, current_path=cur, jobs=1)
+    assert res["records"] == 450 and res["unique_calls"] == 3
+    assert res["transitions"] == {"allowed->allowed": 200, "allowed->pending": 200, "pending->blocked": 50}
+    assert res["flipped"] == 250
+    sample = res["samples"]["allowed->pending"][0]
+    assert sample["amount_cents"] == 12000 and sample["count"] == 200 and sample["trace_id"] == "t0"
+    # the process pool gives the same answer
+    assert simulate(cand, audit_path=audit, current_path=cur, jobs=2) == res
+
+
+def test_cli_simulate_json(tmp_path):
+    cur, cand, audit = _setup(tmp_path)
+    out = subprocess.run(
+        [sys.executable, "tools/cli.py", "simulate", cand, "--audit", audit, "--current", cur, "--jobs", "2", "--json"],
+        capture_output=True, text=True, check=True,
+    )
+    assert json.loads(out.stdout)["flipped"] == 250
+
+
+def test_tenants_are_keyed_and_unreplayable_rules_warned(tmp_path, monkeypatch):
+    tenants = tmp_path / "tenants"
+    tenants.mkdir()
+    (tenants / "acme.yml").write_text(yaml.safe_dump({"version": 2, "rules": [{"match": "*", "decision": "deny"}]}), encoding="utf-8")
+    monkeypatch.setenv("POLICY_DIR", str(tenants))
+    monkeypatch.setenv("POLICY_PATH", str(tmp_path / "current.yml"))
+    (tmp_path / "current.yml").write_text(yaml.safe_dump(CURRENT), encoding="utf-8")
+    cand = tmp_path / "candidate.yml"
+    cand.write_text(yaml.safe_dump({"version": 2, "rules": [
+        {"match": "refunds.*", "when": {"tenant": "acme"}, "decision": "allow"},
+        {"match": "refunds.*", "when": {"agent": "bot"}, "decision": "deny"},
+        {"match": "refunds.*", "decision": "allow", "window_cap_cents": 100},
+    ]}), encoding="utf-8")
+    audit = tmp_path / "audit.log"
+    rec = {"action": "enforce", "tool": "refunds.refund", "op": "refund", "amount_cents": 50}
+    audit.write_text("".join(json.dumps(dict(rec, **extra)) + "\n" for extra in ({"status": "allowed"}, {"status": "blocked", "tenant": "acme"})))
+
+    res = simulate(str(cand), audit_path=str(audit), jobs=1)
+    assert res["unique_calls"] == 2
+    # acme was decided by its own (deny-all) policy; the candidate's tenant rule allows it
+    assert res["transitions"] == {"allowed->allowed": 1, "blocked->allowed": 1}
+    assert res["samples"]["blocked->allowed"][0]["tenant"] == "acme"
+    assert [w.split(":")[0] for w in res["warnings"]] == ["candidate rule 1 (refunds.*)", "candidate rule 2 (refunds.*)"]
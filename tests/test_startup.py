@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+import yaml
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Modules that must stay off the cold-start path of the HTTP app (loaded lazily on first use)
+LAZY_MODULES = ["src.app.policy_v2", "src.app.ui", "yaml"]
+
+
+def _imported_modules(module: str) -> set:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return {ln.rsplit("|", 1)[-1].strip() for ln in proc.stderr.splitlines() if ln.startswith("import time:")}
+
+
+def test_import_main_defers_rarely_used_modules():
+    mods = _imported_modules("src.app.main")
+    assert "src.app.main" in mods
+    for name in LAZY_MODULES:
+        assert name not in mods, f"{name} is imported eagerly by src.app.main"
+
+
+def test_create_app_returns_independent_apps():
+    from src.app.main import create_app
+    a, b = create_app(), create_app()
+    assert isinstance(a, FastAPI) and a is not b
+    with TestClient(a) as client:  # runs the lifespan (policy pre-compile)
+        assert client.get("/health").json() == {"status": "ok"}
+
+
+def test_compiled_policy_is_cached_until_file_changes(tmp_path, monkeypatch):
+    from src.app.policy import load_compiled_policy
+    p = tmp_path / "policy.yml"
+    p.write_text(yaml.safe_dump({"version": 2, "rules": [{"match": "*", "decision": "allow"}]}), encoding="utf-8")
+    monkeypatch.setenv("POLICY_PATH", str(p))
+
+    first = load_compiled_policy()
+    assert load_compiled_policy() is first
+
+    p.write_text(yaml.safe_dump({"version": 2, "rules": [{"match": "*", "decision": "deny"}, {"match": "x", "decision": "allow"}]}), encoding="utf-8")
+    second = load_compiled_policy()
+    assert second is not first
+    assert second.evaluate("anything")["allowed"] is False
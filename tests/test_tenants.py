@@ -0,0 +1,66 @@
+import json
+
+from src.app import policy
+from src.app.guard import evaluate
+
+
+def _setup(tmp_path, monkeypatch):
+    d = tmp_path / 'tenants'
+    d.mkdir()
+    (d / 'acme.yml').write_text('version: 2\nrules:\n  - {id: acme-refunds, match: "refunds.*", decision: allow}\n', encoding='utf-8')
+    (d / 'globex.yml').write_text('version: 2\nrules:\n  - {match: "refunds.*", decision: deny}\n', encoding='utf-8')
+    default = tmp_path / 'policy.yml'
+    default.write_text('version: 2\nrules:\n  - {match: "*", decision: review}\n', encoding='utf-8')
+    (tmp_path / 'escape.yml').write_text('version: 2\nrules:\n  - {match: "*", decision: allow}\n', encoding='utf-8')
+    monkeypatch.setenv('POLICY_PATH', str(default))
+    monkeypatch.setenv('POLICY_DIR', str(d))
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+    return d
+
+
+def test_tenant_selects_its_policy(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    assert evaluate('refunds.create', meta={'tenant': 'acme'})['allowed'] is True
+    assert evaluate('refunds.create', meta={'tenant': 'globex'})['approval_required'] is False
+    assert evaluate('refunds.create')['approval_required'] is True
+    # unknown tenants, malformed names and path tricks all get the default policy
+    for tenant in ('initech', '../escape', '.hidden', 'a/b', 42):
+        assert evaluate('refunds.create', meta={'tenant': tenant})['approval_required'] is True, tenant
+
+
+def test_lru_bounds_compiled_policies(tmp_path, monkeypatch):
+    d = _setup(tmp_path, monkeypatch)
+    for i in range(20):
+        (d / f't{i}.yml').write_text('version: 2\nrules:\n  - {match: "*", decision: allow}\n  - {match: "x", decision: deny}\n')
+    monkeypatch.setenv('POLICY_CACHE_SIZE', '5')
+    policy._COMPILED.clear()
+    for i in range(20):
+        assert evaluate('anything', meta={'tenant': f't{i}'})['allowed'] is True
+    assert len(policy._COMPILED) == 5
+    assert list(policy._COMPILED)[-1].endswith('t19.yml')
+    evaluate('anything', meta={'tenant': 't15'})  # a hit moves to the most recent end
+    assert list(policy._COMPILED)[-1].endswith('t15.yml')
+
+    monkeypatch.setenv('POLICY_CACHE_SIZE', '100')
+    monkeypatch.setenv('POLICY_CACHE_RULES', '7')  # 2 rules per tenant policy
+    for i in range(20):
+        evaluate('anything', meta={'tenant': f't{i}'})
+    assert len(policy._COMPILED) == 3
+
+
+def test_tenant_header_over_http(tmp_path, monkeypatch, app_client):
+    _setup(tmp_path, monkeypatch)
+    r = app_client.post('/guard/check', json={'tool': 'refunds.create'}, headers={'X-Aegis-Tenant': 'acme'})
+    assert r.json()['allowed'] is True and r.json()['rule_id'] == 'acme-refunds'
+    # the header wins over meta.tenant
+    r = app_client.post('/guard/enforce', json={'tool': 'refunds.create', 'meta': {'tenant': 'acme'}},
+                        headers={'X-Aegis-Tenant': 'globex'})
+    assert r.json()['status'] == 'blocked'
+    last = json.loads((tmp_path / 'audit.log').read_text().splitlines()[-1])
+    assert last['tenant'] == 'globex'
+    stats = app_client.get('/policy/stats', headers={'X-Aegis-Tenant': 'acme'}).json()
+    assert stats['rules'][0]['hits'] == 1
+    effective = app_client.get('/policy/effective', headers={'X-Aegis-Tenant': 'globex'}).json()
+    assert effective['rules'][0]['decision'] == 'deny'
+    assert app_client.get('/policy/effective').json()['rules'][0]['decision'] == 'review'
@@ -0,0 +1,130 @@
+import json
+import threading
+
+import pytest
+
+from src.app import windows
+from src.app.enforcer import enforce
+from src.app.guard import evaluate
+from src.app.policy_v2 import validate_v2
+
+POLICY = '''\
+version: 2
+rules:
+  - {id: refunds, match: "refunds.*", decision: allow, cap_cents: 5000, window_cap_cents: 10000, window: 1h}
+  - {match: "payouts.*", decision: allow, window_cap_cents: 100, window_by: []}
+  - {match: "*", decision: review}
+'''
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    p = tmp_path / 'policy.yml'
+    p.write_text(POLICY, encoding='utf-8')
+    monkeypatch.setenv('POLICY_PATH', str(p))
+    monkeypatch.setenv('AUDIT_PATH', str(tmp_path / 'audit.log'))
+    monkeypatch.setenv('APPROVALS_PATH', str(tmp_path / 'approvals.log'))
+    monkeypatch.setattr(windows, '_WINDOWS', {})
+    return tmp_path
+
+
+def test_sliding_window_expires_by_bucket():
+    w = windows.SlidingWindow(60, buckets=6)  # 10s buckets
+    w.add(5, 100.0)
+    w.add(7, 125.0)
+    assert w.spent(125.0) == 12
+    assert w.spent(159.9) == 12
+    assert w.spent(160.0) == 7   # the bucket holding t=100 left the window
+    assert w.spent(1000.0) == 0
+    w.add(3, 990.0)              # late record, still inside the window
+    w.add(4, 900.0)              # too old: ignored
+    assert w.spent(1000.0) == 3
+
+
+def test_window_cap_escalates_cumulative_spend(env):
+    bob = {'principal': 'bob'}
+    assert enforce('refunds.create', 4000, principal='bob')['status'] == 'allowed'
+    assert enforce('refunds.create', 4000, principal='bob')['status'] == 'allowed'
+    res = evaluate('refunds.create', 4000, principal='bob')  # /guard/check is read-only
+    assert res['approval_required'] is True and 'over window_cap_cents 10000' in res['reasons'][0]
+    assert enforce('refunds.create', 2000, principal='bob')['status'] == 'allowed'
+    res = enforce('refunds.create', 1, principal='bob')
+    assert res['status'] == 'pending' and res['rule_id'] == 'refunds'
+    # totals are per principal and per tool by default
+    assert enforce('refunds.create', 4000, principal='alice')['status'] == 'allowed'
+    assert enforce('refunds.other', 4000, principal='bob')['status'] == 'allowed'
+    # window_by: [] shares one total across every caller
+    assert enforce('payouts.a', 60, principal='bob')['status'] == 'allowed'
+    assert enforce('payouts.b', 60, principal='alice')['status'] == 'pending'
+    # a caller-chosen meta.principal or unknown tenant does not get a fresh total
+    assert enforce('refunds.create', 4000, meta=bob)['status'] == 'allowed'
+    assert enforce('refunds.create', 4000, meta={'principal': 'mallory', 'tenant': 'nope'})['status'] == 'allowed'
+    assert enforce('refunds.create', 4000, meta={'principal': 'eve'})['status'] == 'pending'
+
+
+def test_totals_are_rebuilt_from_the_audit_log(env):
+    for _ in range(2):
+        enforce('refunds.create', 4000, principal='bob')
+    records = [json.loads(line) for line in (env / 'audit.log').read_text().splitlines()]
+    assert records[-1]['window_key'] == [None, 'refunds', 3600, 'refunds.create', 'bob']
+    # an old record beyond the window must not count
+    old = dict(records[-1], ts=records[-1]['ts'] - 7200)
+    with open(env / 'audit.log', 'a') as f:
+        f.write(json.dumps(old) + '\n')
+    windows._WINDOWS.clear()
+    assert windows.rebuild() == 3
+    assert enforce('refunds.create', 4000, principal='bob')['status'] == 'pending'
+    assert enforce('refunds.create', 2000, principal='bob')['status'] == 'allowed'
+
+
+def test_concurrent_enforce_never_overspends(env):
+    results = []
+
+    def worker():
+        for _ in range(10):
+            results.append(enforce('payouts.x', 7)['status'])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count('allowed') == 14  # 14 * 7 = 98 <= 100
+
+
+def test_window_fields_are_validated():
+    errors = validate_v2({'version': 2, 'rules': [
+        {'match': 'a', 'decision': 'allow', 'window': '1h'},
+        {'match': 'a', 'decision': 'allow', 'window_cap_cents': 1, 'window': '45d'},
+        {'match': 'a', 'decision': 'allow', 'window_cap_cents': 1, 'window_by': ['agent']},
+    ]})
+    assert errors[0] == 'rules.0: Value error, window and window_by need window_cap_cents (value_error)'
+    assert errors[1].startswith('rules.1.window: Value error, window must be at most 31d')
+    assert errors[2].startswith('rules.2.window_by.0:')
+
+
+def test_key_map_is_bounded(env, monkeypatch):
+    monkeypatch.setattr(windows, 'MAX_KEYS', 3)
+    monkeypatch.setattr(windows, '_PRUNED_AT', [float('-inf')])
+    for p in ('a', 'b', 'c'):
+        assert enforce('refunds.create', 10, principal=p)['status'] == 'allowed'
+    res = enforce('refunds.create', 10, principal='d')  # full, nothing expired: no new total
+    assert res['status'] == 'pending' and 'Too many live window totals' in res['reasons'][0]
+    assert len(windows._WINDOWS) == 3
+    assert enforce('refunds.create', 10, principal='a')['status'] == 'allowed'  # existing totals still work
+    # once old totals have expired, the next prune makes room
+    assert windows.reserve(('x', 'refunds', 3600, None, 'e'), 1, 100, now=windows.time.time() + 7200) == (True, 0)
+    assert len(windows._WINDOWS) == 1
+
+
+def test_principal_comes_from_the_gateway_header(env):
+    from fastapi.testclient import TestClient
+
+    from src.app.main import app
+
+    c = TestClient(app)
+    body = {'tool': 'refunds.create', 'amount_cents': 4000}
+    for _ in range(2):
+        assert c.post('/guard/enforce', json=body, headers={'x-aegis-principal': 'bob'}).json()['status'] == 'allowed'
+    assert c.post('/guard/enforce', json=body, headers={'x-aegis-principal': 'bob'}).json()['status'] == 'pending'
+    assert c.post('/guard/enforce', json=dict(body, meta={'principal': 'bob'})).json()['status'] == 'allowed'
@@ -1,50 +1,284 @@
 #!/usr/bin/env python3
 """
-Tiny helper CLI for local ops (validate/migrate). Keeps parity with HTTP endpoints.
+Tiny helper CLI for local ops (validate/migrate/compile/simulate/optimize/audit-archive/audit-query/audit-verify). Keeps parity with HTTP endpoints.
 Examples:
   python tools/cli.py validate examples/policy_v2.yml
+  python tools/cli.py validate generated.yml --jobs 8 --quiet
   python tools/cli.py migrate policy.yml > policy.v2.yml
+  python tools/cli.py compile policy.yml            # -> policy.ymlc
+  python tools/cli.py simulate candidate.yml --audit audit.log --jobs 8
+  python tools/cli.py optimize policy.yml --audit audit.log -o policy.opt.yml
+  python tools/cli.py audit-archive audit.log audit.archive
+  python tools/cli.py audit-query audit.archive --by tool --where status=pending --where tool='refunds.*' --since 7d
+  python tools/cli.py audit-verify audit.log --jobs 8 --incremental
 """
+import argparse
+import json
+import os
 import sys
-from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-import yaml
+from src.app.policy import dump_yaml, load_yaml
+from src.app.policy_v2 import to_v2, validate_v2
 
-from src.app.policy_v2 import migrate_v1_to_v2, validate_policy_input
 
-
-def _read_yaml(p: str) -> Dict[str, Any]:
+def _read_bytes(p: str) -> bytes:
     if p == '-' or p == '/dev/stdin':
-        return yaml.safe_load(sys.stdin.read()) or {}
-    return yaml.safe_load(Path(p).read_text(encoding='utf-8')) or {}
+        return sys.stdin.buffer.read()
+    with open(p, 'rb') as f:
+        return f.read()
 
-def main() -> int:
-    if len(sys.argv) < 3:
-        sys.stderr.write("Usage: cli.py <validate|migrate> <path|->\n")
-        return 2
-    cmd, path = sys.argv[1], sys.argv[2]
-    data = _read_yaml(path)
-    if cmd == 'validate':
-        res = validate_policy_input(data)
-        if not res['ok']:
-            for e in res['errors']:
-                sys.stderr.write(e + "\n")
-            return 1
-        # echo validated (and migrated if needed) normalized policy
-        sys.stdout.write(yaml.safe_dump(data if data.get('version') == 2 else migrate_v1_to_v2(data)))
+
+def _validated_v2(args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    """Read, migrate if needed and validate once (included fragments too); print errors and return None when invalid."""
+    data = _read_bytes(args.path)
+    out, _ = to_v2(load_yaml(data) or {})
+    errors = validate_v2(out, jobs=args.jobs)
+    if not errors and out.get('include'):
+        from src.app.includes import walk
+        try:
+            walk(args.path, data, dict(out))
+        except ValueError as e:
+            errors = str(e).splitlines()
+    for e in errors:
+        sys.stderr.write(e + "\n")
+    return None if errors else out
+
+
+def _cmd_validate(args: argparse.Namespace) -> int:
+    out = _validated_v2(args)
+    if out is None:
+        return 1
+    # echo validated (and migrated if needed) normalized policy
+    if not args.quiet:
+        sys.stdout.write(dump_yaml(out))
+    return 0
+
+
+def _cmd_migrate(args: argparse.Namespace) -> int:
+    out = _validated_v2(args)
+    if out is None:
+        return 1
+    sys.stdout.write(dump_yaml(out))
+    return 0
+
+
+def _cmd_compile(args: argparse.Namespace) -> int:
+    from src.app.policy import write_artifact
+
+    try:
+        out, compiled = write_artifact(args.path, out=args.out, jobs=args.jobs)
+    except ValueError as e:
+        sys.stderr.write(f"{e}\n")
+        return 1
+    rules = len(getattr(compiled, 'rules', ()))
+    sys.stderr.write(f"wrote {out}" + (f" ({rules} rules)" if rules else "") + "\n")
+    return 0
+
+
+def _cmd_simulate(args: argparse.Namespace) -> int:
+    from src.app.simulate import simulate
+
+    res = simulate(args.path, audit_path=args.audit, current_path=args.current, jobs=args.jobs, max_samples=args.samples)
+    if args.json:
+        sys.stdout.write(json.dumps(res, indent=2) + "\n")
         return 0
-    if cmd == 'migrate':
-        out = data if data.get('version') == 2 else migrate_v1_to_v2(data)
-        res = validate_policy_input(out)
-        if not res['ok']:
-            for e in res['errors']:
-                sys.stderr.write(e + "\n")
-            return 1
-        sys.stdout.write(yaml.safe_dump(out))
+    sys.stdout.write(f"{res['records']} enforce records ({res['unique_calls']} unique calls) from {res['audit_path']}\n")
+    sys.stdout.write(f"{res['flipped']} would change decision under {args.path}\n")
+    for label, n in res['transitions'].items():
+        mark = '' if label.split('->')[0] == label.split('->')[1] else '  *'
+        sys.stdout.write(f"  {label:<20} {n:>10}  ({res['unique_transitions'][label]} unique){mark}\n")
+    for label, rows in res['samples'].items():
+        sys.stdout.write(f"samples {label}:\n")
+        for r in rows:
+            sys.stdout.write(f"  {json.dumps(r)}\n")
+    for w in res['warnings']:
+        sys.stderr.write(f"warning: {w}\n")
+    return 0
+
+
+def _cmd_optimize(args: argparse.Namespace) -> int:
+    from src.app.optimize import optimize
+
+    doc = _validated_v2(args)
+    if doc is None:
+        return 1
+    if doc.get('include'):
+        sys.stderr.write("optimize works on a single file; rules from include: fragments cannot be reordered across files\n")
+        return 1
+    stats = json.loads(_read_bytes(args.stats)) if args.stats else None
+    audit = args.audit or os.environ.get('AUDIT_PATH', 'audit.log')
+    res = optimize(doc, audit_path=audit, stats=stats, samples=args.check, seed=args.seed)
+    if res['mismatches']:
+        sys.stderr.write(f"differential check failed on {len(res['mismatches'])} of {res['checked']} calls; not writing\n")
+        for m in res['mismatches'][:5]:
+            sys.stderr.write(f"  {json.dumps(m)}\n")
+        return 1
+    if args.json:
+        sys.stdout.write(json.dumps({k: v for k, v in res.items() if k != 'policy'}, indent=2) + "\n")
+    elif args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(dump_yaml(res['policy']))
+    else:
+        sys.stdout.write(dump_yaml(res['policy']))
+    cost = res['scan_cost']
+    sys.stderr.write(
+        f"{res['moved']} of {len(res['order'])} rules moved using {res['hits']} hits; "
+        f"mean rules scanned {cost['before']:.2f} -> {cost['after']:.2f}; "
+        f"{res['checked']} random calls decide identically\n"
+    )
+    for j, i in res['shadowed'].items():
+        sys.stderr.write(f"rules.{j}: shadowed by rules.{i}; it can never match\n")
+    for j in res['unreachable']:
+        sys.stderr.write(f"rules.{j}: its when: clause can never hold\n")
+    if res['cold']:
+        sys.stderr.write(f"{len(res['cold'])} rules had no recorded hits: {res['cold'][:20]}\n")
+    return 0
+
+
+def _archive_module() -> Any:
+    try:
+        from src.app import archive
+    except ImportError as e:
+        sys.stderr.write(f"the audit archive needs numpy (pyarrow optional for Parquet): {e}\n")
+        return None
+    return archive
+
+
+def _cmd_audit_archive(args: argparse.Namespace) -> int:
+    archive = _archive_module()
+    if archive is None:
+        return 1
+    audit = args.audit or os.environ.get('AUDIT_PATH', 'audit.log')
+    out = args.out or audit + '.archive'
+    try:
+        res = archive.archive(audit, out, fmt=args.format, max_rows=args.segment_rows)
+    except (ValueError, OSError) as e:
+        sys.stderr.write(f"{e}\n")
+        return 1
+    sys.stderr.write(f"archived {res['rows']} records into {len(res['segments'])} new segments in {out} (offset {res['offset']})\n")
+    return 0
+
+
+def _cmd_audit_query(args: argparse.Namespace) -> int:
+    archive = _archive_module()
+    if archive is None:
+        return 1
+    try:
+        bad = [w for w in args.where if '=' not in w]
+        if bad:
+            raise ValueError(f"--where takes COL=VALUE, got {bad[0]!r}")
+        where = dict(w.split('=', 1) for w in args.where)
+        group_by = [c for c in args.by.split(',') if c]
+        since, until = archive.parse_time(args.since), archive.parse_time(args.until)
+        if args.jsonl:
+            rows = archive.scan_jsonl(args.archive, group_by, where, since, until)
+        else:
+            rows = archive.query(args.archive, group_by, where, since, until)
+    except ValueError as e:
+        sys.stderr.write(f"{e}\n")
+        return 1
+    if args.json:
+        sys.stdout.write(json.dumps(rows, indent=2) + "\n")
         return 0
-    sys.stderr.write("Unknown command. Use validate|migrate.\n")
-    return 2
+    cols = group_by + ['records', 'calls', 'amount_cents']
+    sys.stdout.write("\t".join(cols) + "\n")
+    for r in rows:
+        sys.stdout.write("\t".join('-' if r[c] is None else str(r[c]) for c in cols) + "\n")
+    return 0
+
+
+def _cmd_audit_verify(args: argparse.Namespace) -> int:
+    from src.app import chain
+
+    audit = args.audit or os.environ.get('AUDIT_PATH', 'audit.log')
+    if not os.path.exists(audit):
+        sys.stderr.write(f"{audit}: no such file\n")
+        return 1
+    state = args.state or (audit + '.verified' if args.incremental else None)
+    res = chain.verify(audit, jobs=args.jobs or None, state_path=state)
+    if args.json:
+        sys.stdout.write(json.dumps(res, indent=2) + "\n")
+    else:
+        for e in res['errors']:
+            sys.stderr.write(f"{audit}: byte {e['offset']}: {e['error']}\n")
+        sys.stderr.write(f"{'OK' if res['ok'] else 'FAILED'}: {res['records']} records, {res['checkpoints']} checkpoints"
+                         f" verified from byte {res['from_offset']} ({res['open_records']} since the last checkpoint,"
+                         f" {res['unchained']} written before chaining)\n")
+    return 0 if res['ok'] else 1
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(prog='cli.py', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest='cmd', metavar='<validate|migrate|compile|simulate|optimize|audit-archive|audit-query|audit-verify>')
+
+    p = sub.add_parser('validate', help='validate a policy (v1 is migrated first) and echo it as v2')
+    p.add_argument('path', help="policy file or '-' for stdin")
+    p.add_argument('--jobs', type=int, default=1, help='processes for rule validation (0 = CPU count)')
+    p.add_argument('--quiet', '-q', action='store_true', help='only report errors; do not echo the policy')
+    p.set_defaults(func=_cmd_validate)
+
+    p = sub.add_parser('migrate', help='migrate a v1 policy to v2')
+    p.add_argument('path', help="policy file or '-' for stdin")
+    p.add_argument('--jobs', type=int, default=1, help='processes for rule validation (0 = CPU count)')
+    p.set_defaults(func=_cmd_migrate)
+
+    p = sub.add_parser('compile', help='validate and compile a policy into a binary artifact the server loads instead of the YAML')
+    p.add_argument('path', help='policy file')
+    p.add_argument('-o', '--out', default=None, help='artifact path (default: <path>c, which the loader looks for)')
+    p.add_argument('--jobs', type=int, default=1, help='processes for rule validation (0 = CPU count)')
+    p.set_defaults(func=_cmd_compile)
+
+    p = sub.add_parser('simulate', help='replay audit history under a candidate policy and diff decisions')
+    p.add_argument('path', help='candidate policy file')
+    p.add_argument('--audit', default=None, help='audit log (default: AUDIT_PATH or audit.log)')
+    p.add_argument('--current', default=None, help='current policy (default: POLICY_PATH or policy.yml)')
+    p.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    p.add_argument('--samples', type=int, default=5, help='sample records per changed transition')
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=_cmd_simulate)
+
+    p = sub.add_parser('optimize', help='reorder a v2 policy hottest-rule-first where provably equivalent; flag shadowed rules')
+    p.add_argument('path', help="policy file or '-' for stdin")
+    p.add_argument('--audit', default=None, help='audit log to count rule hits from (default: AUDIT_PATH or audit.log)')
+    p.add_argument('--stats', default=None, help='saved GET /policy/stats response to count rule hits from')
+    p.add_argument('-o', '--out', default=None, help='write the optimized policy here (default: stdout)')
+    p.add_argument('--check', type=int, default=2000, help='random calls for the differential check against the original')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--jobs', type=int, default=1, help='processes for rule validation (0 = CPU count)')
+    p.add_argument('--json', action='store_true', help='print the report (order, shadowed, ...) instead of the policy')
+    p.set_defaults(func=_cmd_optimize)
+
+    p = sub.add_parser('audit-archive', help='append the closed part of the audit log to a columnar archive (npz, or Parquet with pyarrow)')
+    p.add_argument('audit', nargs='?', default=None, help='audit log (default: AUDIT_PATH or audit.log)')
+    p.add_argument('out', nargs='?', default=None, help='archive directory (default: <audit>.archive)')
+    p.add_argument('--format', choices=['auto', 'npz', 'parquet'], default='auto', help='segment format (auto: Parquet when pyarrow is installed)')
+    p.add_argument('--segment-rows', type=int, default=1_000_000, help='records per segment file')
+    p.set_defaults(func=_cmd_audit_archive)
+
+    p = sub.add_parser('audit-query', help='group-by counts and amount sums over an audit archive')
+    p.add_argument('archive', help='archive directory (or the audit log itself with --jsonl)')
+    p.add_argument('--by', default='tool,status', help='comma-separated columns: action,tool,op,status,tenant')
+    p.add_argument('--where', action='append', default=[], metavar='COL=VALUE', help='filter; VALUE may be a glob (repeatable)')
+    p.add_argument('--since', default=None, help='epoch seconds or a span back from now (7d, 12h, 2w)')
+    p.add_argument('--until', default=None, help='epoch seconds or a span back from now (exclusive)')
+    p.add_argument('--jsonl', action='store_true', help='scan a raw JSONL audit log instead (slow; for checking)')
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=_cmd_audit_query)
+
+    p = sub.add_parser('audit-verify', help="check the audit log's hash chain and checkpoint Merkle roots")
+    p.add_argument('audit', nargs='?', default=None, help='audit log (default: AUDIT_PATH or audit.log)')
+    p.add_argument('--jobs', type=int, default=0, help='worker processes (0 = CPU count)')
+    p.add_argument('--incremental', action='store_true', help='resume after the last checkpoint verified by a previous run (state in <audit>.verified)')
+    p.add_argument('--state', default=None, help='state file for --incremental (implies it)')
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=_cmd_audit_verify)
+
+    args = ap.parse_args()
+    if not getattr(args, 'func', None):
+        sys.stderr.write("Usage: cli.py <validate|migrate|compile|simulate|optimize|audit-archive|audit-query|audit-verify> <path|->\n")
+        return 2
+    return args.func(args)
 
 if __name__ == '__main__':
-    raise SystemExit(main())
\ No newline at end of file
+    raise SystemExit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Traffic replay load generator for guard decisions.
+
+Replays recorded requests (JSONL; one {tool, amount_cents?, op?, meta?} per line —
+audit.log 'enforce' records work too, other lines are skipped) against:
+  http       a running server            (--url http://127.0.0.1:8000)
+  asgi       the HTTP app in-process     (httpx.ASGITransport, no sockets)
+  mcp        the MCP server in-process   (FastMCP in-memory client)
+  mcp-stdio  mcp_server.py over stdio    (spawned subprocess)
+Load is either closed-loop (--concurrency N in flight) or open-loop (--rate R/s;
+latency is measured from each request's scheduled send time, so a stalled
+server shows up in the tail instead of silently slowing the generator).
+Prints throughput, p50/p95/p99/p999 latency and the decision distribution.
+
+In-process targets write audit/approvals to a scratch dir unless --keep-logs.
+
+Examples:
+  PYTHONPATH=. python tools/replay.py requests.jsonl --target asgi --count 5000 --concurrency 32
+  PYTHONPATH=. python tools/replay.py audit.log --target http --url http://127.0.0.1:8000 --rate 200 --duration 30
+  PYTHONPATH=. python tools/replay.py requests.jsonl --target mcp --endpoint check --json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+TARGETS = ("http", "asgi", "mcp", "mcp-stdio")
+
+
+def load_requests(path: str) -> "tuple[List[Dict[str, Any]], int]":
+    """Return (requests, skipped_lines). Accepts replay records and audit 'enforce' records."""
+    reqs: List[Dict[str, Any]] = []
+    skipped = 0
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    with stream as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            tool = obj.get("tool") if isinstance(obj, dict) else None
+            if not isinstance(tool, str) or obj.get("action", "enforce") != "enforce":
+                skipped += 1
+                continue
+            amount = obj.get("amount_cents")
+            reqs.append({
+                "tool": tool,
+                "amount_cents": amount if isinstance(amount, int) else None,
+                "op": obj.get("op"),
+                "meta": obj.get("meta") if isinstance(obj.get("meta"), dict) else None,
+            })
+    return reqs, skipped
+
+
+def decision_status(res: Dict[str, Any]) -> str:
+    """Normalise enforce ({status}) and check ({allowed, approval_required}) responses."""
+    if "status" in res:
+        return str(res["status"])
+    if res.get("allowed"):
+        return "allowed"
+    return "pending" if res.get("approval_required") else "blocked"
+
+
+class HttpTarget:
+    def __init__(self, endpoint: str, url: Optional[str] = None) -> None:
+        import httpx
+
+        self.path = f"/guard/{endpoint}"
+        if url:
+            self.client = httpx.AsyncClient(base_url=url, timeout=30.0, limits=httpx.Limits(max_connections=1000))
+        else:
+            from src.app.main import create_app
+            self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app()), base_url="http://replay")
+
+    async def __aenter__(self) -> "HttpTarget":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.client.aclose()
+
+    async def send(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        body = req if self.path.endswith("enforce") else {k: req[k] for k in ("tool", "amount_cents", "op")}
+        r = await self.client.post(self.path, json=body)
+        r.raise_for_status()
+        return r.json()
+
+
+class McpTarget:
+    def __init__(self, endpoint: str, stdio: bool = False) -> None:
+        from fastmcp import Client
+
+        self.tool = "firewall_enforce" if endpoint == "enforce" else "guard_check"
+        if stdio:
+            from fastmcp.client.transports import StdioTransport
+            self.client = Client(StdioTransport(command=sys.executable, args=["mcp_server.py"], env=dict(os.environ)))
+        else:
+            import mcp_server
+            self.client = Client(mcp_server.mcp)
+
+    async def __aenter__(self) -> "McpTarget":
+        await self.client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.client.__aexit__(*exc)
+
+    async def send(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        args = {k: v for k, v in req.items() if v is not None and (self.tool == "firewall_enforce" or k != "meta")}
+        res = await self.client.call_tool(self.tool, args)
+        return res.data
+
+
+def _pct(sorted_samples: List[float], q: float) -> Optional[float]:
+    if not sorted_samples:
+        return None
+    idx = min(len(sorted_samples) - 1, max(0, math.ceil(q * len(sorted_samples)) - 1))  # nearest rank
+    return round(sorted_samples[idx] * 1000.0, 3)
+
+
+async def replay(target: Any, reqs: List[Dict[str, Any]], count: int, concurrency: int, rate: Optional[float], duration: Optional[float]) -> Dict[str, Any]:
+    latencies: List[float] = []
+    decisions: Counter = Counter()
+    errors: Counter = Counter()
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def one(i: int, scheduled: float) -> None:
+        try:
+            res = await target.send(reqs[i % len(reqs)])
+            decisions[decision_status(res)] += 1
+        except Exception as e:
+            errors[type(e).__name__] += 1
+            return
+        latencies.append(time.perf_counter() - scheduled)
+
+    start = time.perf_counter()
+    sent = 0
+    if rate:
+        # Open loop: fire on schedule regardless of how many are still in flight
+        tasks = []
+        interval = 1.0 / rate
+        while sent < count and (deadline is None or time.perf_counter() < deadline):
+            scheduled = start + sent * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(one(sent, scheduled)))
+            sent += 1
+        await asyncio.gather(*tasks)
+    else:
+        # Closed loop: `concurrency` workers, each sends its next request when the previous returns
+        async def worker() -> None:
+            nonlocal sent
+            while sent < count and (deadline is None or time.perf_counter() < deadline):
+                i = sent
+                sent += 1
+                await one(i, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    done = len(latencies)
+    return {
+        "sent": sent,
+        "completed": done,
+        "errors": dict(errors),
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(done / elapsed, 1) if elapsed > 0 else None,
+        "latency_ms": {
+            "p50": _pct(latencies, 0.50),
+            "p95": _pct(latencies, 0.95),
+            "p99": _pct(latencies, 0.99),
+            "p999": _pct(latencies, 0.999),
+            "max": round(latencies[-1] * 1000.0, 3) if latencies else None,
+        },
+        "decisions": dict(decisions),
+    }
+
+
+def _make_target(args: argparse.Namespace) -> Any:
+    if args.target == "http":
+        return HttpTarget(args.endpoint, url=args.url)
+    if args.target == "asgi":
+        return HttpTarget(args.endpoint)
+    return McpTarget(args.endpoint, stdio=args.target == "mcp-stdio")
+
+
+async def _run(args: argparse.Namespace, reqs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async with _make_target(args) as target:
+        return await replay(target, reqs, args.count, args.concurrency, args.rate, args.duration)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", nargs="?", default="requests.jsonl", help="recorded requests (JSONL, '-' for stdin)")
+    ap.add_argument("--target", choices=TARGETS, default="asgi")
+    ap.add_argument("--url", default=None, help="base URL for --target http")
+    ap.add_argument("--endpoint", choices=("enforce", "check"), default="enforce")
+    ap.add_argument("--count", type=int, default=None, help="requests to send (default: one pass over the file)")
+    ap.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    ap.add_argument("--concurrency", type=int, default=16, help="closed-loop in-flight requests")
+    ap.add_argument("--rate", type=float, default=None, help="open-loop requests/second (overrides --concurrency)")
+    ap.add_argument("--keep-logs", action="store_true", help="in-process targets write to the real AUDIT_PATH/APPROVALS_PATH")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    if args.target == "http" and not args.url:
+        ap.error("--target http needs --url")
+    reqs, skipped = load_requests(args.path)
+    if not reqs:
+        sys.stderr.write(f"No replayable requests in {args.path} ({skipped} lines skipped)\n")
+        return 1
+    if args.count is None:
+        args.count = len(reqs) if args.duration is None else sys.maxsize
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.target != "http" and not args.keep_logs:
+            os.environ["AUDIT_PATH"] = os.path.join(scratch, "audit.log")
+            os.environ["APPROVALS_PATH"] = os.path.join(scratch, "approvals.log")
+        report = asyncio.run(_run(args, reqs))
+    report.update({"target": args.target, "endpoint": args.endpoint, "records": len(reqs), "skipped_lines": skipped,
+                   "mode": f"rate={args.rate}/s" if args.rate else f"concurrency={args.concurrency}"})
+
+    if args.json:
+        sys.stdout.write(json.dumps(report, indent=2) + "\n")
+    else:
+        lat = report["latency_ms"]
+        sys.stdout.write(
+            f"{report['target']}/{report['endpoint']} {report['mode']}: {report['completed']}/{report['sent']} ok "
+            f"in {report['seconds']}s = {report['throughput_rps']} req/s\n"
+            f"latency ms  p50={lat['p50']}  p95={lat['p95']}  p99={lat['p99']}  p999={lat['p999']}  max={lat['max']}\n"
+            f"decisions   {json.dumps(report['decisions'], sort_keys=True)}\n"
+        )
+        if report["errors"]:
+            sys.stdout.write(f"errors      {json.dumps(report['errors'], sort_keys=True)}\n")
+    return 0 if not report["errors"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())